@@ -0,0 +1,504 @@
+import os
+import math
+import time
+import shutil
+import platform
+import subprocess
+import tempfile
+import statistics
+
+import torch
+import numpy as np
+import pandas as pd
+import SimpleITK as sitk
+import lightning.pytorch as pl
+from torch.utils.data import DataLoader
+
+from gandlf_synth.version import __version__
+from gandlf_synth.models.configs.config_abc import AbstractModelConfig
+from gandlf_synth.models.modules.module_factory import ModuleFactory
+from gandlf_synth.data.datasets_factory import DatasetFactory, InferenceDatasetFactory
+from gandlf_synth.data.dataloaders_factory import DataloaderFactory
+from gandlf_synth.utils.managers_utils import (
+    prepare_logger,
+    prepare_postprocessing_transforms,
+    prepare_transforms,
+    get_inference_batch_size,
+)
+from gandlf_synth.utils.instrumentation_utils import StepTimingCallback
+from gandlf_synth.utils.io_utils import (
+    EXTENSION_MAP,
+    prepare_images_for_saving,
+    save_single_image,
+)
+
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+
+def _summarize_durations(durations: Sequence[float]) -> Dict[str, Optional[float]]:
+    """
+    Summarize a set of durations with their mean, median and extremes.
+
+    Args:
+        durations (Sequence[float]): The durations, in seconds.
+
+    Returns:
+        Dict[str, Optional[float]]: The summary of the durations, None if there
+    are no durations.
+    """
+    if len(durations) == 0:
+        return dict.fromkeys(
+            ("mean_seconds", "median_seconds", "min_seconds", "max_seconds")
+        )
+    return {
+        "mean_seconds": statistics.fmean(durations),
+        "median_seconds": statistics.median(durations),
+        "min_seconds": min(durations),
+        "max_seconds": max(durations),
+    }
+
+
+class _PredictLatencyCallback(pl.Callback):
+    """
+    Records the latency of every predict step, synchronizing the device so the
+    asynchronous kernels are accounted for.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.latencies: List[float] = []
+        self._start_time = 0.0
+
+    @staticmethod
+    def _synchronize(pl_module: "pl.LightningModule") -> None:
+        if pl_module.device.type == "cuda":
+            torch.cuda.synchronize(pl_module.device)
+
+    def on_predict_batch_start(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._synchronize(pl_module)
+        self._start_time = time.perf_counter()
+
+    def on_predict_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._synchronize(pl_module)
+        self.latencies.append(time.perf_counter() - self._start_time)
+
+
+class BenchmarkManager:
+    LOGGER_NAME = "benchmark_manager"
+    # models whose inference reconstructs the input images instead of sampling them
+    RECONSTRUCTION_MODELS = ("vqvae",)
+
+    """
+    Class to manage the benchmarking of a model configuration on a synthetic dataset.
+    Random NIfTI images of the configured shape are generated in a temporary
+    directory, then the throughput of the dataloader, the duration of the stages of
+    the training step, the latency of the predict step and the throughput of the
+    image writing are measured. The first steps of the training and inference are
+    treated as warmup and excluded from the results.
+    """
+
+    def __init__(
+        self,
+        global_config: dict,
+        model_config: Type[AbstractModelConfig],
+        output_dir: str,
+        n_samples: int = 32,
+        n_steps: int = 20,
+        n_warmup_steps: int = 3,
+        image_shape: Optional[Sequence[int]] = None,
+    ) -> None:
+        """
+        Initialize the BenchmarkManager.
+
+        Args:
+            global_config (dict): The global configuration dictionary.
+            model_config (Type[AbstractModelConfig]): The model configuration class.
+            output_dir (str): The directory where the log will be saved.
+            n_samples (int, optional): The number of synthetic images. Defaults to 32.
+            n_steps (int, optional): The number of timed training steps. Defaults to 20.
+            n_warmup_steps (int, optional): The number of training and predict steps
+        run before the timed ones. Defaults to 3.
+            image_shape (Optional[Sequence[int]], optional): The shape of the synthetic
+        images, before the preprocessing of the config. Defaults to the tensor shape
+        of the model.
+        """
+        assert n_samples > 0, "The number of synthetic images must be positive."
+        assert n_steps > 0, "The number of timed training steps must be positive."
+        self.global_config = global_config
+        self.model_config = model_config
+        self.output_dir = output_dir
+        self.n_samples = n_samples
+        self.n_steps = n_steps
+        self.n_warmup_steps = n_warmup_steps
+        self.image_shape = (
+            list(image_shape)
+            if image_shape
+            else list(self.model_config.tensor_shape)[: self.model_config.n_dimensions]
+        )
+        assert len(self.image_shape) == self.model_config.n_dimensions, (
+            f"Expected a {self.model_config.n_dimensions}D image shape, "
+            f"got {self.image_shape}."
+        )
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.logger = prepare_logger(self.LOGGER_NAME, self.output_dir)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    def _generate_synthetic_dataset(self, data_dir: str) -> pd.DataFrame:
+        """
+        Generate the synthetic images, with one file per channel.
+
+        Args:
+            data_dir (str): The directory where the images are saved.
+
+        Returns:
+            pd.DataFrame: The dataframe with the synthetic images.
+        """
+        rng = np.random.default_rng(0)
+        extension = EXTENSION_MAP["rad"]
+        rows = []
+        for sample_idx in range(self.n_samples):
+            row = {}
+            for channel_idx in range(self.model_config.n_channels):
+                image_path = os.path.join(
+                    data_dir, f"sample_{sample_idx}_channel_{channel_idx}{extension}"
+                )
+                # SimpleITK reverses the order of the array axes
+                image = rng.random(self.image_shape[::-1], dtype=np.float32)
+                sitk.WriteImage(sitk.GetImageFromArray(image), image_path)
+                row[f"Channel_{channel_idx}"] = image_path
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def _benchmark_dataloader(self, dataloader: DataLoader) -> Dict[str, float]:
+        """
+        Measure the throughput of the training dataloader over one pass of the data.
+        The first batch, which includes the startup of the workers, is timed separately.
+
+        Args:
+            dataloader (torch.utils.data.DataLoader): The training dataloader.
+
+        Returns:
+            Dict[str, float]: The dataloader results.
+        """
+        batches = iter(dataloader)
+        start_time = time.perf_counter()
+        next(batches)
+        first_batch_time = time.perf_counter() - start_time
+        n_loaded_samples, start_time = 0, time.perf_counter()
+        for batch in batches:
+            images = batch[0] if isinstance(batch, (list, tuple)) else batch
+            n_loaded_samples += images.shape[0]
+        loading_time = time.perf_counter() - start_time
+        return {
+            "n_batches": len(dataloader),
+            "first_batch_seconds": first_batch_time,
+            "samples_per_second": (
+                n_loaded_samples / loading_time if n_loaded_samples > 0 else None
+            ),
+        }
+
+    def _initialize_trainer(
+        self, callback: pl.Callback, work_dir: str, **trainer_kwargs
+    ) -> pl.Trainer:
+        """
+        Initialize a single-device trainer without logging nor checkpointing.
+
+        Args:
+            callback (pl.Callback): The callback recording the timings.
+            work_dir (str): The temporary directory of the run.
+            **trainer_kwargs: Additional arguments of the trainer.
+
+        Returns:
+            pl.Trainer: The trainer.
+        """
+        return pl.Trainer(
+            devices=1,
+            logger=False,
+            enable_checkpointing=False,
+            enable_progress_bar=False,
+            enable_model_summary=False,
+            callbacks=[callback],
+            precision=self.global_config["compute"].get("precision", 32),
+            default_root_dir=work_dir,
+            **trainer_kwargs,
+        )
+
+    def _benchmark_training(
+        self, module: pl.LightningModule, train_dataframe: pd.DataFrame, work_dir: str
+    ) -> Dict[str, Any]:
+        """
+        Measure the durations of the stages of the training steps. The synthetic
+        images are repeated so a single epoch covers all the steps.
+
+        Args:
+            module (pl.LightningModule): The module to train.
+            train_dataframe (pd.DataFrame): The dataframe with the synthetic images.
+            work_dir (str): The temporary directory of the run.
+
+        Returns:
+            Dict[str, Any]: The training results.
+        """
+        n_total_steps = self.n_warmup_steps + self.n_steps
+        n_required_samples = n_total_steps * self.global_config["batch_size"]
+        train_dataframe = pd.concat(
+            [train_dataframe] * math.ceil(n_required_samples / len(train_dataframe)),
+            ignore_index=True,
+        )
+        train_dataset = DatasetFactory().get_dataset(
+            train_dataframe,
+            prepare_transforms(
+                self.global_config.get("data_preprocessing"),
+                self.global_config.get("data_augmentations"),
+                "train",
+                self.model_config.tensor_shape,
+            ),
+            self.model_config.labeling_paradigm,
+        )
+        step_timing_callback = StepTimingCallback(synchronize=True)
+        trainer = self._initialize_trainer(
+            step_timing_callback,
+            work_dir,
+            max_epochs=1,
+            limit_train_batches=n_total_steps,
+            limit_val_batches=0,
+            num_sanity_val_steps=0,
+        )
+        trainer.fit(
+            module,
+            DataloaderFactory(params=self.global_config).get_training_dataloader(
+                train_dataset
+            ),
+        )
+        step_timings = step_timing_callback.step_timings[self.n_warmup_steps :]
+        return {
+            "n_steps": len(step_timings),
+            "batch_size": self.global_config["batch_size"],
+            **{
+                stage: _summarize_durations(
+                    [timings[stage] for timings in step_timings]
+                )
+                for stage in StepTimingCallback.STAGES + ("total",)
+            },
+        }
+
+    def _benchmark_prediction(
+        self, module: pl.LightningModule, dataframe: pd.DataFrame, work_dir: str
+    ) -> Dict[str, Any]:
+        """
+        Measure the latency of the predict steps over the inference dataloader,
+        after running the warmup steps on its first batches.
+
+        Args:
+            module (pl.LightningModule): The module to run the inference with.
+            dataframe (pd.DataFrame): The dataframe with the synthetic images, used
+        by the reconstruction models.
+            work_dir (str): The temporary directory of the run.
+
+        Returns:
+            Dict[str, Any]: The predict results, with the predicted images.
+        """
+        dataset = InferenceDatasetFactory(
+            global_config=self.global_config,
+            model_config=self.model_config,
+            dataframe_reconstruction=(
+                dataframe
+                if self.model_config.model_name in self.RECONSTRUCTION_MODELS
+                else None
+            ),
+        ).get_inference_dataset()
+        batch_size = get_inference_batch_size(self.global_config)
+        dataloader_config = dict(self.global_config["dataloader_config"]["inference"])
+        dataloader_config["shuffle"] = False
+        dataloader = DataLoader(dataset, batch_size=batch_size, **dataloader_config)
+
+        predict_latency_callback = _PredictLatencyCallback()
+        if self.n_warmup_steps > 0:
+            self._initialize_trainer(
+                predict_latency_callback,
+                work_dir,
+                limit_predict_batches=self.n_warmup_steps,
+            ).predict(module, dataloader, return_predictions=False)
+            predict_latency_callback.latencies.clear()
+        predictions = self._initialize_trainer(
+            predict_latency_callback, work_dir
+        ).predict(module, dataloader)
+        images = [
+            prediction[0] if isinstance(prediction, (list, tuple)) else prediction
+            for prediction in predictions
+        ]
+        latencies = predict_latency_callback.latencies
+        n_images = sum(batch_images.shape[0] for batch_images in images)
+        return {
+            "n_batches": len(latencies),
+            "batch_size": batch_size,
+            "images_per_second": (
+                n_images / sum(latencies) if len(latencies) > 0 else None
+            ),
+            **_summarize_durations(latencies),
+            "images": images,
+        }
+
+    def _benchmark_image_writing(
+        self, images: List[torch.Tensor], output_dir: str
+    ) -> Dict[str, float]:
+        """
+        Measure the throughput of writing the predicted images, the same way
+        as the inference does.
+
+        Args:
+            images (List[torch.Tensor]): The batches of predicted images.
+            output_dir (str): The directory where the images are written.
+
+        Returns:
+            Dict[str, float]: The image writing results.
+        """
+        modality = self.global_config["modality"]
+        n_written_images, start_time = 0, time.perf_counter()
+        for batch_images in images:
+            n_dimensions = 2 if batch_images.dim() == 4 else 3
+            for image in prepare_images_for_saving(batch_images, n_dimensions):
+                save_single_image(
+                    image,
+                    os.path.join(output_dir, f"generated_image_{n_written_images}"),
+                    modality,
+                    n_dimensions,
+                )
+                n_written_images += 1
+        writing_time = time.perf_counter() - start_time
+        written_bytes = sum(
+            os.path.getsize(os.path.join(output_dir, file_name))
+            for file_name in os.listdir(output_dir)
+        )
+        return {
+            "n_images": n_written_images,
+            "images_per_second": n_written_images / writing_time,
+            "megabytes_per_second": written_bytes / 2**20 / writing_time,
+        }
+
+    def run_benchmark(self) -> Dict[str, Any]:
+        """
+        Run the benchmark of the model configuration.
+
+        Returns:
+            Dict[str, Any]: The results of the benchmark.
+        """
+        work_dir = tempfile.mkdtemp(prefix="gandlf_synth_benchmark_")
+        try:
+            data_dir = os.path.join(work_dir, "data")
+            images_dir = os.path.join(work_dir, "generated_images")
+            os.makedirs(data_dir)
+            os.makedirs(images_dir)
+            self.logger.info(
+                f"Generating {self.n_samples} synthetic images of shape "
+                f"{self.image_shape} with {self.model_config.n_channels} channels."
+            )
+            dataframe = self._generate_synthetic_dataset(data_dir)
+            self.logger.info("Benchmarking the module construction.")
+            construction_start_time = time.perf_counter()
+            module = ModuleFactory(
+                model_config=self.model_config,
+                model_dir=work_dir,
+                postprocessing_transforms=prepare_postprocessing_transforms(
+                    global_config=self.global_config
+                ),
+            ).get_module()
+            construction_time = time.perf_counter() - construction_start_time
+
+            self.logger.info("Benchmarking the dataloader.")
+            train_dataset = DatasetFactory().get_dataset(
+                dataframe,
+                prepare_transforms(
+                    self.global_config.get("data_preprocessing"),
+                    self.global_config.get("data_augmentations"),
+                    "train",
+                    self.model_config.tensor_shape,
+                ),
+                self.model_config.labeling_paradigm,
+            )
+            dataloader_results = self._benchmark_dataloader(
+                DataloaderFactory(params=self.global_config).get_training_dataloader(
+                    train_dataset
+                )
+            )
+            self.logger.info("Benchmarking the training steps.")
+            training_results = self._benchmark_training(module, dataframe, work_dir)
+            self.logger.info("Benchmarking the predict steps.")
+            prediction_results = self._benchmark_prediction(module, dataframe, work_dir)
+            self.logger.info("Benchmarking the image writing.")
+            image_writing_results = self._benchmark_image_writing(
+                prediction_results.pop("images"), images_dir
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        results = {
+            "model_name": self.model_config.model_name,
+            "n_dimensions": self.model_config.n_dimensions,
+            "n_channels": self.model_config.n_channels,
+            "tensor_shape": list(self.model_config.tensor_shape),
+            "image_shape": self.image_shape,
+            "n_samples": self.n_samples,
+            "device": str(self.device),
+            "module_construction_seconds": construction_time,
+            "dataloader": dataloader_results,
+            "training_step": training_results,
+            "predict_step": prediction_results,
+            "image_writing": image_writing_results,
+        }
+        self.logger.info(
+            f"Module construction: {construction_time:.4f}s, "
+            f"dataloader: {dataloader_results['samples_per_second']} samples/s, "
+            f"training step: {training_results['total']['median_seconds']}s, "
+            f"predict step: {prediction_results['median_seconds']}s, "
+            f"image writing: {image_writing_results['images_per_second']:.2f} images/s."
+        )
+        return results
+
+
+def collect_environment_info() -> Dict[str, Any]:
+    """
+    Collect the information about the software and hardware the benchmark runs on,
+    so the results of different commits and machines can be compared.
+
+    Returns:
+        Dict[str, Any]: The environment information.
+    """
+    try:
+        git_commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        git_commit = None
+    return {
+        "gandlf_synth_version": __version__,
+        "git_commit": git_commit,
+        "python_version": platform.python_version(),
+        "torch_version": torch.__version__,
+        "lightning_version": pl.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "n_cpus": os.cpu_count(),
+        "cuda_version": torch.version.cuda,
+        "gpu_name": (
+            torch.cuda.get_device_name() if torch.cuda.is_available() else None
+        ),
+    }
@@ -0,0 +1,63 @@
+import os
+import json
+
+from gandlf_synth.config_manager import ConfigManager
+
+from typing import Optional, Sequence
+
+
+def main_benchmark(
+    config_paths: Sequence[str],
+    output_dir: str,
+    n_samples: int,
+    n_steps: int,
+    n_warmup_steps: int,
+    image_shape: Optional[Sequence[int]] = None,
+) -> str:
+    """
+    Main function to benchmark model configurations on synthetic datasets.
+
+    Args:
+        config_paths (Sequence[str]): Paths to the configuration files to benchmark.
+        output_dir (str): Path to the output directory, where the results will be saved.
+        n_samples (int): Number of synthetic images generated for every configuration.
+        n_steps (int): Number of timed training steps.
+        n_warmup_steps (int): Number of training and predict steps run before the timed ones.
+        image_shape (Optional[Sequence[int]], optional): Shape of the synthetic images,
+    before the preprocessing. Defaults to the tensor shape of every model.
+
+    Returns:
+        str: The path to the JSON file with the results.
+    """
+    from gandlf_synth.benchmark_manager import (
+        BenchmarkManager,
+        collect_environment_info,
+    )
+
+    benchmarks = []
+    for config_path in config_paths:
+        config_manager = ConfigManager(config_path=config_path)
+        global_config, model_config = config_manager.prepare_configs()
+        benchmark_manager = BenchmarkManager(
+            global_config=global_config,
+            model_config=model_config,
+            output_dir=output_dir,
+            n_samples=n_samples,
+            n_steps=n_steps,
+            n_warmup_steps=n_warmup_steps,
+            image_shape=image_shape,
+        )
+        benchmarks.append(
+            {
+                "config_path": os.path.abspath(config_path),
+                **benchmark_manager.run_benchmark(),
+            }
+        )
+    results_path = os.path.join(output_dir, "benchmark_results.json")
+    with open(results_path, "w") as results_file:
+        json.dump(
+            {"environment": collect_environment_info(), "benchmarks": benchmarks},
+            results_file,
+            indent=4,
+        )
+    return results_path
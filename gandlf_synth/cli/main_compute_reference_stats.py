@@ -0,0 +1,34 @@
+from gandlf_synth.config_manager import ConfigManager
+
+
+def main_compute_reference_stats(
+    config_path: str, main_data_csv_path: str, output_dir: str, features_size: int
+) -> str:
+    """
+    Main function to compute the reference statistics of a dataset for FID.
+
+    Args:
+        config_path (str): Path to the configuration file, used for the data loading
+    and preprocessing.
+        main_data_csv_path (str): Path to the CSV file with the reference images.
+        output_dir (str): Path to the output directory, where the reference statistics
+    will be saved.
+        features_size (int): The InceptionV3 feature layer, one of 64, 192, 768, 2048.
+
+    Returns:
+        str: The path to the reference statistics.
+    """
+    import pandas as pd
+    from gandlf_synth.reference_statistics_manager import ReferenceStatisticsManager
+
+    config_manager = ConfigManager(config_path=config_path)
+    global_config, model_config = config_manager.prepare_configs()
+
+    reference_statistics_manager = ReferenceStatisticsManager(
+        global_config=global_config,
+        model_config=model_config,
+        output_dir=output_dir,
+        dataframe=pd.read_csv(main_data_csv_path),
+        features_size=features_size,
+    )
+    return reference_statistics_manager.run_computation()
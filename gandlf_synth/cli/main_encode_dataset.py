@@ -0,0 +1,39 @@
+from typing import Optional
+
+from gandlf_synth.config_manager import ConfigManager
+
+
+def main_encode_dataset(
+    config_path: str,
+    main_data_csv_path: str,
+    model_dir: str,
+    output_dir: str,
+    custom_checkpoint_path: Optional[str] = None,
+):
+    """
+    Main function to encode a dataset into the discrete latent space of a trained VQVAE.
+
+    Args:
+        config_path (str): Path to the configuration file used to train the VQVAE.
+        main_data_csv_path (str): Path to the CSV file with the data to encode.
+        model_dir (str): Path to the model directory of the trained VQVAE.
+        output_dir (str): Path to the output directory, where the code maps, the codebook
+    and the manifest will be saved.
+        custom_checkpoint_path (str): Custom path to load the specific checkpoint. If not
+    provided, the best or the last checkpoint from `model_dir` is used.
+    """
+    import pandas as pd
+    from gandlf_synth.encoding_manager import LatentEncodingManager
+
+    config_manager = ConfigManager(config_path=config_path)
+    global_config, model_config = config_manager.prepare_configs()
+
+    encoding_manager = LatentEncodingManager(
+        global_config=global_config,
+        model_config=model_config,
+        model_dir=model_dir,
+        output_dir=output_dir,
+        dataframe=pd.read_csv(main_data_csv_path),
+        custom_checkpoint_path=custom_checkpoint_path,
+    )
+    encoding_manager.run_encoding()
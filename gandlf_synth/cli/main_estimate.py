@@ -0,0 +1,44 @@
+import json
+
+from gandlf_synth.config_manager import ConfigManager
+
+from typing import Any, Dict, Optional
+
+
+def main_estimate(
+    config_path: str,
+    batch_size: Optional[int] = None,
+    output_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Main function to estimate the costs of a model configuration, printing a table
+    with the cost of every layer. The model is built on the meta device, so no
+    weights are allocated and no data is read.
+
+    Args:
+        config_path (str): Path to the configuration file.
+        batch_size (Optional[int], optional): Batch size of the forward passes.
+    Defaults to the batch size of the configuration.
+        output_path (Optional[str], optional): Path to a JSON file where the estimated
+    costs are saved. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: The estimated costs.
+    """
+    from gandlf_synth.utils.cost_estimation_utils import (
+        estimate_model_cost,
+        format_cost_table,
+    )
+
+    config_manager = ConfigManager(config_path=config_path)
+    global_config, model_config = config_manager.prepare_configs()
+    cost_estimate = estimate_model_cost(
+        global_config,
+        model_config,
+        batch_size if batch_size is not None else global_config["batch_size"],
+    )
+    print(format_cost_table(cost_estimate))
+    if output_path is not None:
+        with open(output_path, "w") as output_file:
+            json.dump(cost_estimate, output_file, indent=4)
+    return cost_estimate
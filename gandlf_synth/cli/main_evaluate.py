@@ -0,0 +1,41 @@
+from gandlf_synth.config_manager import ConfigManager
+
+from typing import Tuple
+
+
+def main_evaluate(
+    config_path: str,
+    generated_images_dir: str,
+    main_data_csv_path: str,
+    output_dir: str,
+    num_workers: int,
+) -> Tuple[str, str]:
+    """
+    Main function to evaluate generated images against reference images.
+
+    Args:
+        config_path (str): Path to the configuration file, with the metrics and the
+    data preprocessing.
+        generated_images_dir (str): Path to the directory with the generated images.
+        main_data_csv_path (str): Path to the CSV file with the reference images.
+        output_dir (str): Path to the output directory, where the report will be saved.
+        num_workers (int): Number of processes loading the images of each set.
+
+    Returns:
+        Tuple[str, str]: The paths to the JSON and CSV reports.
+    """
+    import pandas as pd
+    from gandlf_synth.evaluation_manager import EvaluationManager
+
+    config_manager = ConfigManager(config_path=config_path)
+    global_config, model_config = config_manager.prepare_configs()
+
+    evaluation_manager = EvaluationManager(
+        global_config=global_config,
+        model_config=model_config,
+        generated_images_dir=generated_images_dir,
+        reference_dataframe=pd.read_csv(main_data_csv_path),
+        output_dir=output_dir,
+        num_workers=num_workers,
+    )
+    return evaluation_manager.run_evaluation()
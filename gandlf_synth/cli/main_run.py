@@ -1,10 +1,6 @@
 from typing import Optional
 
-import pandas as pd
-
-from gandlf_synth.training_manager import TrainingManager
 from gandlf_synth.config_manager import ConfigManager
-from gandlf_synth.inference_manager import InferenceManager
 
 
 def main_run(
@@ -20,6 +16,9 @@ def main_run(
     test_ratio: Optional[float] = None,
     inference_output_dir: Optional[str] = None,
     custom_checkpoint_path: Optional[str] = None,
+    evaluation_csv_path: Optional[str] = None,
+    sweep_checkpoints: bool = False,
+    tune: bool = False,
 ):
     """
     Main function to execute training or inference.
@@ -51,7 +50,18 @@ def main_run(
     Defaults to None.
         custom_checkpoint_path (str): Custom path to load the specific checkpoint either for
     training or inference. During training, it takes action only when `resume` is set to True.
+        evaluation_csv_path (str): Path to the CSV file with the reference images. If specified
+    in inference, the generated images are scored with the metrics of the config instead of
+    being saved. Defaults to None.
+        sweep_checkpoints (bool): Flag to indicate whether to evaluate every checkpoint of the
+    model instead of a single one, used only along with `evaluation_csv_path`. Defaults to False.
+        tune (bool): Flag to indicate whether to tune the batch size and the training dataloader
+    instead of training, writing the recommended values to `tuned_config.yaml` in the output
+    directory. Used only in training mode. Defaults to False.
     """
+    import pandas as pd
+    from gandlf_synth.training_manager import TrainingManager
+    from gandlf_synth.inference_manager import InferenceManager
 
     config_manager = ConfigManager(config_path=config_path)
     global_config, model_config = config_manager.prepare_configs()
@@ -84,7 +94,10 @@ def main_run(
             test_ratio=test_ratio,
             custom_checkpoint_path=custom_checkpoint_path,
         )
-        training_manager.run_training()
+        if tune:
+            training_manager.run_tuning(config_path)
+        else:
+            training_manager.run_training()
 
     if not training:
         print("Running in inference mode.")
@@ -100,5 +113,11 @@ def main_run(
             output_dir=inference_output_dir,
             dataframe_reconstruction=main_input_dataframe,
             custom_checkpoint_path=custom_checkpoint_path,
+            evaluation_dataframe=(
+                pd.read_csv(evaluation_csv_path)
+                if evaluation_csv_path is not None
+                else None
+            ),
+            sweep_checkpoints=sweep_checkpoints,
         )
         inference_manager.run_inference()
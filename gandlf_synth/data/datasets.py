@@ -1,7 +1,11 @@
+import os
+import json
 from abc import abstractmethod
 from typing import Optional
+import numpy as np
 import pandas as pd
 
+import torch
 import torchio as tio
 from torchio.transforms import Compose
 from torch.utils.data import Dataset
@@ -89,3 +93,80 @@ class LabeledSynthesisDataset(SynthesisDataset):
         image = self._prepare_multichannel_image(index)
         label = self._process_label(index)
         return image, label
+
+
+class LatentCodesDataset(Dataset):
+    """
+    Dataset serving the VQVAE code maps stored by the `encode-dataset` command.
+    Depending on the configuration, it returns either the integer code maps or
+    their embeddings looked up in the stored codebook (in channel-first format).
+    """
+
+    def __init__(
+        self, manifest_path: str, return_embeddings: bool = False, preload: bool = True
+    ) -> None:
+        """
+        Initialize the dataset.
+
+        Args:
+            manifest_path (str): Path to the manifest of the encoded dataset.
+            return_embeddings (bool, optional): Whether to return the embeddings of the
+        codes instead of the codes themselves. Defaults to False.
+            preload (bool, optional): Whether to load all the code maps into memory
+        at initialization. Code maps are small, so this is usually the fastest option.
+        Defaults to True.
+        """
+        super().__init__()
+        with open(manifest_path, "r") as manifest_file:
+            self.manifest = json.load(manifest_file)
+        self.root_dir = os.path.dirname(os.path.abspath(manifest_path))
+        self.return_embeddings = return_embeddings
+        self.code_paths = [
+            os.path.join(self.root_dir, sample["codes"])
+            for sample in self.manifest["samples"]
+        ]
+        self.codebook = torch.from_numpy(
+            np.load(os.path.join(self.root_dir, self.manifest["codebook"]))
+        )
+        self.codes = None
+        if preload:
+            self.codes = [self._load_codes(path) for path in self.code_paths]
+
+    @staticmethod
+    def _load_codes(code_path: str) -> torch.Tensor:
+        """
+        Load a single code map, converting it to the index dtype used by torch.
+
+        Args:
+            code_path (str): Path to the code map.
+
+        Returns:
+            torch.Tensor: The code map of shape [(D), H, W].
+        """
+        return torch.from_numpy(np.load(code_path).astype(np.int64))
+
+    def embed(self, codes: torch.Tensor) -> torch.Tensor:
+        """
+        Look up the embeddings of the codes in the codebook.
+
+        Args:
+            codes (torch.Tensor): Code map of shape [(D), H, W].
+
+        Returns:
+            torch.Tensor: Embeddings of shape [embedding_dim, (D), H, W].
+        """
+        embeddings = torch.nn.functional.embedding(codes, self.codebook)
+        return embeddings.movedim(-1, 0).contiguous()
+
+    def __getitem__(self, index):
+        codes = (
+            self.codes[index]
+            if self.codes is not None
+            else self._load_codes(self.code_paths[index])
+        )
+        if self.return_embeddings:
+            return self.embed(codes)
+        return codes
+
+    def __len__(self):
+        return len(self.code_paths)
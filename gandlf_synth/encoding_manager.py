@@ -0,0 +1,200 @@
+import os
+import json
+
+import torch
+import numpy as np
+import pandas as pd
+from torch.utils.data import DataLoader
+
+from gandlf_synth.models.configs.config_abc import AbstractModelConfig
+from gandlf_synth.models.modules.module_factory import ModuleFactory
+from gandlf_synth.data.datasets_factory import InferenceDatasetFactory
+from gandlf_synth.utils.managers_utils import (
+    prepare_logger,
+    determine_checkpoint_to_load,
+    load_weights_from_checkpoint,
+)
+
+from typing import Optional, Type
+
+
+class LatentEncodingManager:
+    LOGGER_NAME = "encoding_manager"
+    MANIFEST_FILENAME = "manifest.json"
+    CODEBOOK_FILENAME = "codebook.npy"
+    CODES_DIRNAME = "codes"
+    # code maps are stored as uint16, so the codebook cannot be larger than this
+    MAX_NUM_EMBEDDINGS = np.iinfo(np.uint16).max + 1
+
+    """
+    Class to manage encoding of a dataset into the discrete latent space of a
+    trained VQVAE. For every sample in the dataframe, the codebook indices are
+    stored as a compact uint16 code map, along with the codebook itself and a
+    manifest describing the encoded dataset.
+    """
+
+    def __init__(
+        self,
+        global_config: dict,
+        model_config: Type[AbstractModelConfig],
+        model_dir: str,
+        output_dir: str,
+        dataframe: pd.DataFrame,
+        custom_checkpoint_path: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the LatentEncodingManager.
+
+        Args:
+            global_config (dict): The global configuration dictionary.
+            model_config (Type[AbstractModelConfig]): The model configuration class.
+            model_dir (str): The directory of the run where the trained VQVAE is saved.
+            output_dir (str): The directory where the code maps and the manifest will be saved.
+            dataframe (pd.DataFrame): The dataframe with the data to encode.
+            custom_checkpoint_path (Optional[str], optional): The custom path for the checkpoint,
+        mostly used when the model is to be loaded from specific epoch checkpoint.
+        """
+        assert model_config.model_name.lower() == "vqvae", (
+            "Dataset encoding is only supported for the VQVAE model, "
+            f"got {model_config.model_name}."
+        )
+        num_embeddings = model_config.architecture["num_embeddings"]
+        assert num_embeddings <= self.MAX_NUM_EMBEDDINGS, (
+            f"Code maps are stored as uint16, which supports at most "
+            f"{self.MAX_NUM_EMBEDDINGS} embeddings, got {num_embeddings}."
+        )
+
+        self.global_config = global_config
+        self.model_config = model_config
+        self.model_dir = model_dir
+        self.output_dir = output_dir
+        self.dataframe = dataframe.reset_index(drop=True)
+        os.makedirs(os.path.join(self.output_dir, self.CODES_DIRNAME), exist_ok=True)
+        self.logger = prepare_logger(self.LOGGER_NAME, self.output_dir)
+
+        self.checkpoint_path = determine_checkpoint_to_load(
+            model_dir=self.model_dir, custom_checkpoint_path=custom_checkpoint_path
+        )
+        assert (
+            self.checkpoint_path is not None
+        ), f"No checkpoint found in {self.model_dir}, a trained VQVAE is required."
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.module = self._load_module()
+
+        dataset_factory = InferenceDatasetFactory(
+            global_config=self.global_config,
+            model_config=self.model_config,
+            dataframe_reconstruction=self.dataframe,
+        )
+        self.dataloader = self._prepare_dataloader(
+            dataset_factory.get_inference_dataset()
+        )
+
+    def _load_module(self):
+        """
+        Build the VQVAE module and load the trained weights from the checkpoint.
+
+        Returns:
+            UnlabeledVQVAEModule: The module in evaluation mode.
+        """
+        module = ModuleFactory(
+            model_config=self.model_config, model_dir=self.model_dir
+        ).get_module(skip_weights_init=True)
+        load_weights_from_checkpoint(module, self.checkpoint_path)
+        self.logger.info(f"Loaded VQVAE weights from {self.checkpoint_path}.")
+        return module.to(self.device).eval()
+
+    def _prepare_dataloader(self, dataset) -> DataLoader:
+        """
+        Prepare the dataloader for encoding. Samples are never shuffled, so that
+        the code maps can be matched with the rows of the source dataframe.
+
+        Returns:
+            torch.utils.data.DataLoader: The dataloader for the encoding process.
+        """
+        dataloader_config = dict(self.global_config["dataloader_config"]["inference"])
+        dataloader_config["shuffle"] = False
+        inference_parameters = self.global_config.get("inference_parameters")
+        if inference_parameters is not None and "batch_size" in inference_parameters:
+            batch_size = inference_parameters["batch_size"]
+        else:
+            batch_size = self.global_config["batch_size"]
+        return DataLoader(dataset=dataset, batch_size=batch_size, **dataloader_config)
+
+    def _save_codebook(self) -> str:
+        """
+        Save the codebook of the quantizer, needed to serve the embeddings of the code maps.
+
+        Returns:
+            str: The path to the saved codebook.
+        """
+        codebook_path = os.path.join(self.output_dir, self.CODEBOOK_FILENAME)
+        codebook = self.module.model.quantizer.quantizer.embedding.weight
+        np.save(codebook_path, codebook.detach().cpu().numpy())
+        return codebook_path
+
+    def _save_manifest(self, samples: list, latent_shape: list) -> str:
+        """
+        Save the manifest describing the encoded dataset.
+
+        Args:
+            samples (list): The list of per-sample entries of the manifest.
+            latent_shape (list): The spatial shape of the code maps.
+
+        Returns:
+            str: The path to the saved manifest.
+        """
+        manifest = {
+            "model_dir": os.path.abspath(self.model_dir),
+            "checkpoint_path": os.path.abspath(self.checkpoint_path),
+            "n_dimensions": self.model_config.n_dimensions,
+            "n_channels": self.model_config.n_channels,
+            "tensor_shape": list(self.model_config.tensor_shape),
+            "num_embeddings": self.model_config.architecture["num_embeddings"],
+            "embedding_dim": self.model_config.architecture["embedding_dim"],
+            "latent_shape": latent_shape,
+            "dtype": "uint16",
+            "codebook": self.CODEBOOK_FILENAME,
+            "samples": samples,
+        }
+        manifest_path = os.path.join(self.output_dir, self.MANIFEST_FILENAME)
+        with open(manifest_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        return manifest_path
+
+    def run_encoding(self) -> str:
+        """
+        Encode the whole dataset and save the code maps, the codebook and the manifest.
+
+        Returns:
+            str: The path to the manifest of the encoded dataset.
+        """
+        channel_columns = [col for col in self.dataframe.columns if "Channel_" in col]
+        samples = []
+        latent_shape = None
+        with torch.no_grad():
+            for batch in self.dataloader:
+                # labeled datasets also return the labels, which are not encoded
+                images = batch[0] if isinstance(batch, (list, tuple)) else batch
+                encoding_indices = self.module.model.encode_to_indices(
+                    images.to(self.device)
+                )
+                codes = encoding_indices.cpu().numpy().astype(np.uint16)
+                latent_shape = list(codes.shape[1:])
+                for code_map in codes:
+                    index = len(samples)
+                    code_path = os.path.join(
+                        self.CODES_DIRNAME, f"sample_{index}_codes.npy"
+                    )
+                    np.save(os.path.join(self.output_dir, code_path), code_map)
+                    sample_entry = {"index": index, "codes": code_path}
+                    for column in channel_columns:
+                        sample_entry[column] = str(self.dataframe.loc[index, column])
+                    samples.append(sample_entry)
+        self._save_codebook()
+        manifest_path = self._save_manifest(samples, latent_shape)
+        self.logger.info(
+            f"Encoded {len(samples)} samples into code maps of shape {latent_shape}, "
+            f"manifest saved to {manifest_path}."
+        )
+        return manifest_path
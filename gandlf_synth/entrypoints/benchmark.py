@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import click
+
+
+from gandlf_synth.entrypoints import append_copyright_to_help
+from gandlf_synth.cli.main_benchmark import main_benchmark
+
+
+@click.command()
+@click.option(
+    "--config",
+    "-c",
+    required=True,
+    multiple=True,
+    help="Path to a configuration file to benchmark, can be given multiple times.",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    required=True,
+    help="Path to the output directory where the benchmark results will be saved.",
+    type=click.Path(file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--n-samples",
+    "-ns",
+    required=False,
+    default=32,
+    show_default=True,
+    help="Number of synthetic images generated for every configuration.",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--n-steps",
+    "-st",
+    required=False,
+    default=20,
+    show_default=True,
+    help="Number of timed training steps.",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--n-warmup-steps",
+    "-ws",
+    required=False,
+    default=3,
+    show_default=True,
+    help="Number of training and predict steps run before the timed ones.",
+    type=click.IntRange(min=0),
+)
+@click.option(
+    "--image-shape",
+    "-is",
+    required=False,
+    multiple=True,
+    help="Size of the synthetic images along one axis, given once per axis "
+    "(e.g. `-is 128 -is 128`). Defaults to the tensor shape of every model.",
+    type=click.IntRange(min=1),
+)
+@append_copyright_to_help
+def benchmark(
+    config: tuple,
+    output_dir: str,
+    n_samples: int,
+    n_steps: int,
+    n_warmup_steps: int,
+    image_shape: tuple,
+):
+    """
+    Benchmark the data loading, training, inference and image writing of model
+    configurations on synthetic datasets, saving the results as JSON.
+    """
+    main_benchmark(
+        config_paths=list(config),
+        output_dir=output_dir,
+        n_samples=n_samples,
+        n_steps=n_steps,
+        n_warmup_steps=n_warmup_steps,
+        image_shape=list(image_shape) if image_shape else None,
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
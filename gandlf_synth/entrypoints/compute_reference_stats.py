@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import click
+
+
+from gandlf_synth.entrypoints import append_copyright_to_help
+from gandlf_synth.cli.main_compute_reference_stats import main_compute_reference_stats
+
+
+@click.command()
+@click.option(
+    "--config",
+    "-c",
+    required=True,
+    help="Path to the configuration file, used for the data loading and preprocessing.",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--main-data-csv-path",
+    "-dt",
+    required=True,
+    help="Path to the CSV file which contains the reference images.",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    required=True,
+    help="Path to the output directory where the reference statistics will be saved.",
+    type=click.Path(file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--features-size",
+    "-fs",
+    required=False,
+    default="2048",
+    show_default=True,
+    help="InceptionV3 feature layer used for the statistics.",
+    type=click.Choice(["64", "192", "768", "2048"]),
+)
+@append_copyright_to_help
+def compute_reference_stats(
+    config: str, main_data_csv_path: str, output_dir: str, features_size: str
+):
+    """
+    Precompute the FID reference statistics (InceptionV3 features) of a dataset.
+    """
+    main_compute_reference_stats(
+        config_path=config,
+        main_data_csv_path=main_data_csv_path,
+        output_dir=output_dir,
+        features_size=int(features_size),
+    )
+
+
+if __name__ == "__main__":
+    compute_reference_stats()
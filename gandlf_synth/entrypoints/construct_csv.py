@@ -3,7 +3,6 @@
 
 import click
 
-from gandlf_synth.data.extractors_factory import DataExtractorFactory
 from gandlf_synth.entrypoints import append_copyright_to_help
 from gandlf_synth.version import __version__
 
@@ -68,6 +67,8 @@ def _construct_csv(
     ["unlabeled", "patient", "custom"]
         output_path (str): Path to the output CSV file.
     """
+    from gandlf_synth.data.extractors_factory import DataExtractorFactory
+
     extractor = DataExtractorFactory().get_data_extractor(
         labeling_paradigm, input_dir, channels_id
     )
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import click
+
+
+from gandlf_synth.entrypoints import append_copyright_to_help
+from gandlf_synth.cli.main_encode_dataset import main_encode_dataset
+
+
+@click.command()
+@click.option(
+    "--config",
+    "-c",
+    required=True,
+    help="Path to the configuration file used to train the VQVAE.",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--main-data-csv-path",
+    "-dt",
+    required=True,
+    help="Path to the CSV file which contains the data to encode.",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--model-dir",
+    "-m-dir",
+    required=True,
+    help="Path to the model directory of the trained VQVAE.",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    required=True,
+    help="Path to the output directory where the code maps and the manifest will be saved.",
+    type=click.Path(file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--custom-checkpoint-path",
+    "-ckpt-path",
+    required=False,
+    type=str,
+    help="Optional path to the checkpoint to use for encoding. If not provided, the best or the last checkpoint from --model-dir is used.",
+)
+@append_copyright_to_help
+def encode_dataset(
+    config: str,
+    main_data_csv_path: str,
+    model_dir: str,
+    output_dir: str,
+    custom_checkpoint_path: str,
+):
+    """
+    Encode a dataset into compact uint16 code maps using a trained VQVAE.
+    """
+    main_encode_dataset(
+        config_path=config,
+        main_data_csv_path=main_data_csv_path,
+        model_dir=model_dir,
+        output_dir=output_dir,
+        custom_checkpoint_path=custom_checkpoint_path,
+    )
+
+
+if __name__ == "__main__":
+    encode_dataset()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import click
+
+
+from gandlf_synth.entrypoints import append_copyright_to_help
+from gandlf_synth.cli.main_estimate import main_estimate
+
+
+@click.command()
+@click.option(
+    "--config",
+    "-c",
+    required=True,
+    help="Path to the configuration file of the model to estimate.",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--batch-size",
+    "-bs",
+    required=False,
+    help="Batch size of the forward passes. Defaults to the batch size of the configuration.",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--output-path",
+    "-o",
+    required=False,
+    help="Optional path to a JSON file where the estimated costs will be saved.",
+    type=click.Path(file_okay=True, dir_okay=False),
+)
+@append_copyright_to_help
+def estimate(config: str, batch_size: int, output_path: str):
+    """
+    Estimate the number of parameters, the FLOPs of the forward passes, the memory
+    of the activations and the size of the checkpoints of a model configuration,
+    without allocating its weights nor reading any data.
+    """
+    main_estimate(config_path=config, batch_size=batch_size, output_path=output_path)
+
+
+if __name__ == "__main__":
+    estimate()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import click
+
+
+from gandlf_synth.entrypoints import append_copyright_to_help
+from gandlf_synth.cli.main_evaluate import main_evaluate
+
+
+@click.command()
+@click.option(
+    "--config",
+    "-c",
+    required=True,
+    help="Path to the configuration file, with the metrics and the data preprocessing.",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--generated-images-dir",
+    "-g",
+    required=True,
+    help="Path to the directory with the generated images, e.g. the inference output.",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--main-data-csv-path",
+    "-dt",
+    required=True,
+    help="Path to the CSV file which contains the reference images.",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    required=True,
+    help="Path to the output directory where the evaluation report will be saved.",
+    type=click.Path(file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--num-workers",
+    "-nw",
+    required=False,
+    default=4,
+    show_default=True,
+    help="Number of processes loading the images of each set.",
+    type=click.IntRange(min=0),
+)
+@append_copyright_to_help
+def evaluate(
+    config: str,
+    generated_images_dir: str,
+    main_data_csv_path: str,
+    output_dir: str,
+    num_workers: int,
+):
+    """
+    Evaluate generated images against reference images, saving a JSON and CSV report.
+    """
+    main_evaluate(
+        config_path=config,
+        generated_images_dir=generated_images_dir,
+        main_data_csv_path=main_data_csv_path,
+        output_dir=output_dir,
+        num_workers=num_workers,
+    )
+
+
+if __name__ == "__main__":
+    evaluate()
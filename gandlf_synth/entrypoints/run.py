@@ -95,6 +95,27 @@ from gandlf_synth.cli.main_run import main_run
     type=str,
     help="Optional path to specify from which checkpoint to resume training or to use for inference. In training, it takes action only if --resume is set.",
 )
+@click.option(
+    "--evaluation-csv-path",
+    "-e-csv",
+    required=False,
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    help="Optional path to the CSV file which contains the reference images. If given in inference, the generated images are scored with the metrics of the config instead of being saved.",
+)
+@click.option(
+    "--sweep-checkpoints",
+    "-sweep",
+    required=False,
+    is_flag=True,
+    help="Evaluate every checkpoint of the model in --model-dir instead of a single one. It takes action only if --evaluation-csv-path is set.",
+)
+@click.option(
+    "--tune",
+    "-tune",
+    required=False,
+    is_flag=True,
+    help="Tune the batch size and the dataloader workers with a few training steps instead of training, and write the recommended values to 'tuned_config.yaml' in --model-dir. It takes action only if --training is set.",
+)
 @append_copyright_to_help
 def run(
     config: str,
@@ -109,6 +130,9 @@ def run(
     test_ratio: float,
     inference_output_dir: str,
     custom_checkpoint_path: str,
+    evaluation_csv_path: str,
+    sweep_checkpoints: bool,
+    tune: bool,
 ):
     main_run(
         config_path=config,
@@ -123,6 +147,9 @@ def run(
         test_ratio=test_ratio,
         inference_output_dir=inference_output_dir,
         custom_checkpoint_path=custom_checkpoint_path,
+        evaluation_csv_path=evaluation_csv_path,
+        sweep_checkpoints=sweep_checkpoints,
+        tune=tune,
     )
 
 
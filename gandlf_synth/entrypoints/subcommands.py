@@ -1,3 +1,5 @@
+# The entrypoints are cheap to import, the heavy dependencies (e.g. torch, Lightning,
+# GANDLF) are imported by the `main_*` functions of `gandlf_synth.cli` when run.
 from gandlf_synth.entrypoints.run import run as run_command
 from gandlf_synth.entrypoints.construct_csv import (
     construct_csv as construct_csv_command,
@@ -5,9 +7,23 @@ from gandlf_synth.entrypoints.construct_csv import (
 from gandlf_synth.entrypoints.verify_install import (
     verify_install as verify_install_command,
 )
+from gandlf_synth.entrypoints.encode_dataset import (
+    encode_dataset as encode_dataset_command,
+)
+from gandlf_synth.entrypoints.compute_reference_stats import (
+    compute_reference_stats as compute_reference_stats_command,
+)
+from gandlf_synth.entrypoints.evaluate import evaluate as evaluate_command
+from gandlf_synth.entrypoints.benchmark import benchmark as benchmark_command
+from gandlf_synth.entrypoints.estimate import estimate as estimate_command
 
 cli_subcommands = {
     "run": run_command,
     "construct-csv": construct_csv_command,
     "verify-install": verify_install_command,
+    "encode-dataset": encode_dataset_command,
+    "compute-reference-stats": compute_reference_stats_command,
+    "evaluate": evaluate_command,
+    "benchmark": benchmark_command,
+    "estimate": estimate_command,
 }
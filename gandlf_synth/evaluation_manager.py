@@ -0,0 +1,208 @@
+import os
+import re
+import time
+import warnings
+
+import torch
+import pandas as pd
+from torch.utils.data import DataLoader
+
+from gandlf_synth.models.configs.config_abc import AbstractModelConfig
+from gandlf_synth.metrics import get_metrics
+from gandlf_synth.utils.io_utils import EXTENSION_MAP
+from gandlf_synth.utils.managers_utils import prepare_logger
+from gandlf_synth.utils.evaluation_utils import (
+    StreamingMetricsEvaluator,
+    prepare_evaluation_dataloader,
+    save_evaluation_report,
+)
+
+from typing import Iterator, List, Tuple, Type
+
+
+class EvaluationManager:
+    LOGGER_NAME = "evaluation_manager"
+    REPORT_NAME = "evaluation_report"
+
+    """
+    Class to manage the evaluation of generated images (e.g. an inference output
+    directory) against reference images. The images of both sets are read by
+    parallel dataloaders and streamed through the metrics batch by batch, so they
+    are never held in memory at once. Both sets go through the inference
+    preprocessing of the config, the i-th generated image (in the order of the
+    indices in the file names) is paired with the i-th reference image.
+    """
+
+    def __init__(
+        self,
+        global_config: dict,
+        model_config: Type[AbstractModelConfig],
+        generated_images_dir: str,
+        reference_dataframe: pd.DataFrame,
+        output_dir: str,
+        num_workers: int = 4,
+    ) -> None:
+        """
+        Initialize the EvaluationManager.
+
+        Args:
+            global_config (dict): The global configuration dictionary.
+            model_config (Type[AbstractModelConfig]): The model configuration class.
+            generated_images_dir (str): The directory with the generated images.
+            reference_dataframe (pd.DataFrame): The dataframe with the reference images.
+            output_dir (str): The directory where the report will be saved.
+            num_workers (int, optional): The number of processes loading the images of
+        each set. Defaults to 4.
+        """
+        assert (
+            "metrics" in global_config
+        ), "No metrics specified in the configuration file."
+        self.global_config = global_config
+        self.model_config = model_config
+        self.generated_images_dir = generated_images_dir
+        self.reference_dataframe = reference_dataframe.reset_index(drop=True)
+        self.output_dir = output_dir
+        self.num_workers = num_workers
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.logger = prepare_logger(self.LOGGER_NAME, self.output_dir)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.metrics = get_metrics(global_config["metrics"], self.model_config)
+
+    def _prepare_generated_dataframe(self) -> pd.DataFrame:
+        """
+        Prepare the dataframe of the generated images, sorted by the index in
+        their file names (e.g. `generated_image_12.nii.gz`).
+
+        Returns:
+            pd.DataFrame: The dataframe with the generated images.
+        """
+
+        def _file_index(file_name: str) -> Tuple[int, str]:
+            """
+            Get the sorting key of a file, the first number in its name.
+
+            Args:
+                file_name (str): The file name.
+
+            Returns:
+                Tuple[int, str]: The sorting key.
+            """
+            index_match = re.search(r"\d+", file_name)
+            return (int(index_match.group()) if index_match else -1, file_name)
+
+        extensions = tuple(EXTENSION_MAP.values())
+        file_names = sorted(
+            (
+                file_name
+                for file_name in os.listdir(self.generated_images_dir)
+                if file_name.endswith(extensions)
+            ),
+            key=_file_index,
+        )
+        assert (
+            len(file_names) > 0
+        ), f"No images with extensions {extensions} found in {self.generated_images_dir}."
+        return pd.DataFrame(
+            {
+                "Channel_0": [
+                    os.path.abspath(os.path.join(self.generated_images_dir, file_name))
+                    for file_name in file_names
+                ]
+            }
+        )
+
+    def _prepare_dataloader(self, dataframe: pd.DataFrame) -> DataLoader:
+        """
+        Prepare the dataloader of a set of images.
+
+        Args:
+            dataframe (pd.DataFrame): The dataframe with the images.
+
+        Returns:
+            torch.utils.data.DataLoader: The dataloader of the images.
+        """
+        return prepare_evaluation_dataloader(
+            self.global_config,
+            self.model_config,
+            dataframe,
+            num_workers=self.num_workers,
+            pin_memory=self.device.type == "cuda",
+        )
+
+    @staticmethod
+    def _timed_batches(
+        generated_dataloader: DataLoader,
+        reference_dataloader: DataLoader,
+        loading_times: List[float],
+    ) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+        """
+        Iterate over the pairs of batches of both dataloaders, recording the time
+        spent waiting for the data.
+
+        Args:
+            generated_dataloader (torch.utils.data.DataLoader): The generated images.
+            reference_dataloader (torch.utils.data.DataLoader): The reference images.
+            loading_times (List[float]): The list to which the waiting times are appended.
+
+        Yields:
+            Tuple[torch.Tensor, torch.Tensor]: The generated and reference images.
+        """
+        batches = zip(generated_dataloader, reference_dataloader)
+        while True:
+            start_time = time.perf_counter()
+            batch_pair = next(batches, None)
+            loading_times.append(time.perf_counter() - start_time)
+            if batch_pair is None:
+                return
+            yield batch_pair
+
+    def run_evaluation(self) -> Tuple[str, str]:
+        """
+        Compute the metrics between the generated and reference images and save
+        the report.
+
+        Returns:
+            Tuple[str, str]: The paths to the JSON and CSV reports.
+        """
+        generated_dataframe = self._prepare_generated_dataframe()
+        reference_dataframe = self.reference_dataframe
+        n_pairs = min(len(generated_dataframe), len(reference_dataframe))
+        if len(generated_dataframe) != len(reference_dataframe):
+            warnings.warn(
+                f"Found {len(generated_dataframe)} generated and "
+                f"{len(reference_dataframe)} reference images, "
+                f"only the first {n_pairs} pairs are evaluated.",
+                UserWarning,
+            )
+            generated_dataframe = generated_dataframe.iloc[:n_pairs]
+            reference_dataframe = reference_dataframe.iloc[:n_pairs]
+        evaluator = StreamingMetricsEvaluator(self.metrics, self.device)
+        loading_times: List[float] = []
+        evaluation_start_time = time.perf_counter()
+        with torch.no_grad():
+            for generated_images, reference_images in self._timed_batches(
+                self._prepare_dataloader(generated_dataframe),
+                self._prepare_dataloader(reference_dataframe),
+                loading_times,
+            ):
+                evaluator.update(generated_images, reference_images)
+            results = evaluator.compute()
+        total_time = time.perf_counter() - evaluation_start_time
+
+        for value_name, value in results.items():
+            self.logger.info(f"{value_name}: {value}")
+        json_path, csv_path = save_evaluation_report(
+            os.path.join(self.output_dir, self.REPORT_NAME),
+            results,
+            evaluator.timings,
+            evaluator.value_sources,
+            generated_images_dir=os.path.abspath(self.generated_images_dir),
+            n_samples=evaluator.n_samples,
+            data_loading_time_seconds=sum(loading_times),
+            total_time_seconds=total_time,
+        )
+        self.logger.info(
+            f"Evaluated {evaluator.n_samples} image pairs in {total_time:.2f}s, "
+            f"report saved to {json_path} and {csv_path}."
+        )
+        return json_path, csv_path
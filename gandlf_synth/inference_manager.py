@@ -1,4 +1,7 @@
 import os
+import re
+import time
+import warnings
 import pandas as pd
 
 import torch
@@ -8,13 +11,30 @@ import lightning.pytorch as pl
 from gandlf_synth.models.configs.config_abc import AbstractModelConfig
 from gandlf_synth.models.modules.module_factory import ModuleFactory
 from gandlf_synth.data.datasets_factory import InferenceDatasetFactory
+from gandlf_synth.metrics import get_metrics
+from gandlf_synth.reference_statistics_manager import ReferenceStatisticsManager
+from gandlf_synth.to_port_to_gandlf_core.metrics.synthesis import (
+    StreamingFrechetInceptionDistance,
+    _StreamingInceptionFeaturesMetric,
+    load_fid_reference_features,
+)
 from gandlf_synth.utils.managers_utils import (
     prepare_logger,
     prepare_postprocessing_transforms,
     determine_checkpoint_to_load,
+    load_weights_from_checkpoint,
 )
 from gandlf_synth.utils.io_utils import prepare_images_for_saving, save_single_image
-from typing import Optional, Type, Any, Literal, Sequence
+from gandlf_synth.utils.instrumentation_utils import (
+    prepare_memory_tracking_callback,
+    prepare_profiler_callback,
+)
+from gandlf_synth.utils.evaluation_utils import (
+    StreamingMetricsEvaluator,
+    prepare_evaluation_dataloader,
+    save_evaluation_report,
+)
+from typing import Callable, Dict, List, Optional, Type, Any, Literal, Sequence
 
 
 class CustomPredictionImageSaver(pl.callbacks.BasePredictionWriter):
@@ -77,6 +97,58 @@ class CustomPredictionImageSaver(pl.callbacks.BasePredictionWriter):
             self._save_images(images, batch_idx, self.modality)
 
 
+class StreamingMetricsCallback(pl.callbacks.BasePredictionWriter):
+    def __init__(
+        self,
+        evaluator: StreamingMetricsEvaluator,
+        reference_dataloader: DataLoader,
+        labeling_paradigm: Literal["labeled", "unlabeled"],
+    ):
+        """
+        Initialize the streaming metrics callback.
+        Instead of saving the predictions, this module feeds every batch of them
+        into the streaming metrics together with the next batch of reference images,
+        so the generated images are never written to disk nor kept in memory.
+
+        Args:
+            evaluator (StreamingMetricsEvaluator): The evaluator accumulating the metrics.
+            reference_dataloader (DataLoader): The dataloader of the reference images.
+            labeling_paradigm (Literal["labeled", "unlabeled"]): The labeling paradigm.
+        """
+        super().__init__("batch")
+        self.evaluator = evaluator
+        self.reference_dataloader = reference_dataloader
+        self.labeling_paradigm = labeling_paradigm
+        self._reference_batches = None
+
+    def on_predict_epoch_start(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._reference_batches = iter(self.reference_dataloader)
+
+    def write_on_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        prediction: Any,
+        batch_indices: Optional[Sequence[int]],
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int,
+    ) -> None:
+        images = prediction[0] if self.labeling_paradigm == "labeled" else prediction
+        reference_images = next(self._reference_batches, None)
+        if reference_images is None:
+            if batch_idx == len(self.reference_dataloader):
+                warnings.warn(
+                    "More images generated than reference images, "
+                    "the remaining generated images are not evaluated.",
+                    UserWarning,
+                )
+            return
+        self.evaluator.update(images, reference_images)
+
+
 class InferenceManager:
     LOGGER_NAME = "inference_manager"
 
@@ -90,6 +162,8 @@ class InferenceManager:
         output_dir: str,
         dataframe_reconstruction: Optional[pd.DataFrame] = None,
         custom_checkpoint_path: Optional[str] = None,
+        evaluation_dataframe: Optional[pd.DataFrame] = None,
+        sweep_checkpoints: bool = False,
     ) -> None:
         """
         Initialize the Inference Manager.
@@ -105,15 +179,26 @@ class InferenceManager:
         to perform reconstruction on. This will be used only for autoencoder-style models.
             custom_checkpoint_path (Optional[str], optional): The custom path for the checkpoint,
         mostly used when the model is to be loaded from specific epoch checkpoint.
+            evaluation_dataframe (Optional[pd.DataFrame], optional): The dataframe with the
+        reference images. If given, the inference runs in the evaluation-only mode: the
+        generated images are not saved, but scored with the metrics of the config.
+            sweep_checkpoints (bool, optional): In the evaluation-only mode, whether to
+        evaluate every checkpoint in the `checkpoints` directory of the model instead of
+        the one to load. Defaults to False.
         """
 
         self.global_config = global_config
         self.model_config = model_config
         self.model_dir = model_dir
         self.dataframe_reconstruction = dataframe_reconstruction
+        self.evaluation_dataframe = evaluation_dataframe
+        self.sweep_checkpoints = sweep_checkpoints
         self.main_inference_dir = output_dir
         self.output_dir = self._prepare_output_directory(output_dir, model_dir)
         self.logger = prepare_logger(self.LOGGER_NAME, self.output_dir)
+        self.checkpoint_path = determine_checkpoint_to_load(
+            model_dir=self.model_dir, custom_checkpoint_path=custom_checkpoint_path
+        )
 
         module_factory = ModuleFactory(
             model_config=self.model_config,
@@ -122,7 +207,12 @@ class InferenceManager:
                 global_config=self.global_config
             ),
         )
-        self.module = module_factory.get_module()
+        # the weights of the restored checkpoints are assigned to the model built on
+        # the meta device, instead of being initialized and then overwritten
+        self.module = module_factory.get_module(
+            skip_weights_init=self.checkpoint_path is not None
+            or (self.sweep_checkpoints and self.evaluation_dataframe is not None)
+        )
         dataset_factory = InferenceDatasetFactory(
             global_config=self.global_config,
             model_config=self.model_config,
@@ -132,10 +222,9 @@ class InferenceManager:
         self.inference_dataloader = self._prepare_inference_dataloader(
             inference_dataset
         )
+        if self.evaluation_dataframe is not None:
+            self._prepare_evaluation()
         self._initialize_trainer_for_inference()
-        self.checkpoint_path = determine_checkpoint_to_load(
-            model_dir=self.model_dir, custom_checkpoint_path=custom_checkpoint_path
-        )
 
     @staticmethod
     def _prepare_output_directory(output_dir: str, model_dir: str) -> str:
@@ -187,18 +276,38 @@ class InferenceManager:
         inference_logger = pl.loggers.CSVLogger(
             self.main_inference_dir, name="inference_logs", flush_logs_every_n_steps=1
         )
-        prediction_saver_callback = CustomPredictionImageSaver(
-            output_dir=self.output_dir,
-            modality=self.global_config["modality"],
-            labeling_paradigm=self.model_config.labeling_paradigm,
-            write_interval="batch",
+        if self.evaluation_dataframe is not None:
+            # the per-batch metrics are accumulated in a single process
+            num_devices, num_nodes = 1, 1
+            inference_callback = StreamingMetricsCallback(
+                evaluator=self.evaluator,
+                reference_dataloader=self.reference_dataloader,
+                labeling_paradigm=self.model_config.labeling_paradigm,
+            )
+        else:
+            inference_callback = CustomPredictionImageSaver(
+                output_dir=self.output_dir,
+                modality=self.global_config["modality"],
+                labeling_paradigm=self.model_config.labeling_paradigm,
+                write_interval="batch",
+            )
+        callbacks = [inference_callback]
+        profiler_callback = prepare_profiler_callback(
+            self.global_config, self.output_dir, self.logger
         )
+        if profiler_callback is not None:
+            callbacks.append(profiler_callback)
+        memory_tracking_callback = prepare_memory_tracking_callback(
+            self.global_config, self.logger
+        )
+        if memory_tracking_callback is not None:
+            callbacks.append(memory_tracking_callback)
         self.trainer = pl.Trainer(
             logger=inference_logger,
             enable_checkpointing=False,
             devices=num_devices,
             num_nodes=num_nodes,
-            callbacks=[prediction_saver_callback],
+            callbacks=callbacks,
             precision=precision,  # default is 32
             sync_batchnorm=True if torch.cuda.device_count() > 1 else False,
         )
@@ -226,12 +335,146 @@ class InferenceManager:
         )
         return dataloader
 
-    def run_inference(self):
+    def _prepare_evaluation(self) -> None:
         """
-        Perform inference on the data.
+        Prepare the metrics and the reference images for the evaluation-only mode.
         """
-        self.trainer.predict(
-            self.module,
-            dataloaders=self.inference_dataloader,
-            ckpt_path=self.checkpoint_path,
+        assert (
+            "metrics" in self.global_config
+        ), "No metrics specified in the configuration file."
+        evaluation_device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        metrics = get_metrics(self.global_config["metrics"], self.model_config)
+        self._set_cached_reference_features(metrics)
+        self.evaluator = StreamingMetricsEvaluator(metrics, evaluation_device)
+        self.reference_dataloader = prepare_evaluation_dataloader(
+            self.global_config,
+            self.model_config,
+            self.evaluation_dataframe,
+            num_workers=self.global_config["dataloader_config"]["inference"].get(
+                "num_workers", 0
+            ),
+            pin_memory=evaluation_device.type == "cuda",
         )
+
+    def _set_cached_reference_features(self, metrics: Dict[str, Callable]) -> None:
+        """
+        Set the features of the reference images in the metrics based on InceptionV3
+        features (FID, KID, precision and recall), so they are extracted once and not
+        for every evaluated checkpoint. The features are cached in the `reference_stats`
+        directory of the main inference directory, under a key derived from the content
+        of the images, and reused by the next evaluations of the same images. Metrics
+        with `reference_statistics` set in their config are left untouched.
+
+        Args:
+            metrics (Dict[str, Callable]): The metrics.
+        """
+        reference_features = {}
+        for metric in metrics.values():
+            if (
+                not isinstance(
+                    metric,
+                    (
+                        StreamingFrechetInceptionDistance,
+                        _StreamingInceptionFeaturesMetric,
+                    ),
+                )
+                or metric.reference_features is not None
+            ):
+                continue
+            features_size = metric.inception.num_features
+            if features_size not in reference_features:
+                reference_statistics_path = ReferenceStatisticsManager(
+                    global_config=self.global_config,
+                    model_config=self.model_config,
+                    output_dir=os.path.join(self.main_inference_dir, "reference_stats"),
+                    dataframe=self.evaluation_dataframe,
+                    features_size=features_size,
+                ).run_computation()
+                reference_features[features_size] = load_fid_reference_features(
+                    reference_statistics_path,
+                    features_size,
+                    self.model_config.n_channels,
+                )
+            metric.set_reference_features(reference_features[features_size])
+
+    def _get_checkpoints_to_evaluate(self) -> List[Optional[str]]:
+        """
+        Get the checkpoints to evaluate, either the one to load or, when sweeping,
+        all the checkpoints saved during training in the order of their epochs.
+        The `last` checkpoint link is skipped, as it points to one of them.
+
+        Returns:
+            List[Optional[str]]: The checkpoint paths.
+        """
+        if not self.sweep_checkpoints:
+            return [self.checkpoint_path]
+        checkpoints_dir = os.path.join(self.model_dir, "checkpoints")
+        checkpoint_paths = [
+            os.path.join(checkpoints_dir, file_name)
+            for file_name in os.listdir(checkpoints_dir)
+            if file_name.endswith(".ckpt")
+            and not os.path.islink(os.path.join(checkpoints_dir, file_name))
+        ]
+        assert len(checkpoint_paths) > 0, f"No checkpoints found in {checkpoints_dir}."
+        return sorted(
+            checkpoint_paths,
+            key=lambda path: (
+                [int(number) for number in re.findall(r"\d+", os.path.basename(path))],
+                path,
+            ),
+        )
+
+    def _run_evaluation(self) -> None:
+        """
+        Generate the images of every checkpoint to evaluate in memory and score
+        them. A report is saved for every checkpoint, and the scores of all of them
+        are summarized in `checkpoints_evaluation.csv`.
+        """
+        checkpoints_results = []
+        for checkpoint_path in self._get_checkpoints_to_evaluate():
+            checkpoint_name = (
+                os.path.splitext(os.path.basename(checkpoint_path))[0]
+                if checkpoint_path is not None
+                else "untrained"
+            )
+            self.evaluator.reset()
+            evaluation_start_time = time.perf_counter()
+            if checkpoint_path is not None:
+                load_weights_from_checkpoint(self.module, checkpoint_path)
+            self.trainer.predict(
+                self.module,
+                dataloaders=self.inference_dataloader,
+                return_predictions=False,
+            )
+            with torch.no_grad():
+                results = self.evaluator.compute()
+            total_time = time.perf_counter() - evaluation_start_time
+            save_evaluation_report(
+                os.path.join(self.output_dir, f"evaluation_report_{checkpoint_name}"),
+                results,
+                self.evaluator.timings,
+                self.evaluator.value_sources,
+                checkpoint_path=checkpoint_path,
+                n_samples=self.evaluator.n_samples,
+                total_time_seconds=total_time,
+            )
+            self.logger.info(
+                f"Checkpoint {checkpoint_name}: "
+                + ", ".join(f"{name}: {value}" for name, value in results.items())
+            )
+            checkpoints_results.append({"checkpoint": checkpoint_name, **results})
+        pd.DataFrame(checkpoints_results).to_csv(
+            os.path.join(self.output_dir, "checkpoints_evaluation.csv"), index=False
+        )
+
+    def run_inference(self):
+        """
+        Perform inference on the data. In the evaluation-only mode, the generated
+        images are scored instead of saved.
+        """
+        if self.evaluation_dataframe is not None:
+            self._run_evaluation()
+            return
+        if self.checkpoint_path is not None:
+            load_weights_from_checkpoint(self.module, self.checkpoint_path)
+        self.trainer.predict(self.module, dataloaders=self.inference_dataloader)
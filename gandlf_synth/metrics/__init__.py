@@ -10,6 +10,14 @@ from GANDLF.metrics.synthesis import (
     ncc_max,
     ncc_min,
 )
+from gandlf_synth.to_port_to_gandlf_core.metrics.synthesis import (
+    StreamingFrechetInceptionDistance,
+    StreamingKernelInceptionDistance,
+    StreamingPrecisionRecall,
+    StreamingLearnedPerceptualImagePatchSimilarity,
+    StreamingStructuralSimilarity,
+    StreamingMultiScaleStructuralSimilarity,
+)
 
 # added all synth metrics from original gandlf, not sure if they will all work tho
 global_metrics_dict = {
@@ -24,11 +32,47 @@ global_metrics_dict = {
     "structural_similarity_index": structural_similarity_index,
 }
 
-from typing import List, Union, Dict, Callable
+# epoch-level metrics, accumulated over the batches of the validation and test epochs
+epoch_metrics_dict = {
+    "fid": StreamingFrechetInceptionDistance,
+    "kid": StreamingKernelInceptionDistance,
+    "precision_recall": StreamingPrecisionRecall,
+    "lpips": StreamingLearnedPerceptualImagePatchSimilarity,
+    "ssim": StreamingStructuralSimilarity,
+    "ms_ssim": StreamingMultiScaleStructuralSimilarity,
+}
+
+from typing import List, Union, Dict, Callable, Optional, Type
+from gandlf_synth.models.configs.config_abc import AbstractModelConfig
+
+
+def _prepare_epoch_metric_params(
+    metric_type: str, metric_params: dict, model_config: Type[AbstractModelConfig]
+) -> dict:
+    """
+    This function prepares the parameters of an epoch-level metric, in the
+    format expected by the metrics in `to_port_to_gandlf_core`.
+
+    Args:
+        metric_type (str): The metric name.
+        metric_params (dict): The metric parameters.
+        model_config (AbstractModelConfig): The model configuration.
+
+    Returns:
+        dict: The metric parameters.
+    """
+    return {
+        "model": {
+            "dimension": model_config.n_dimensions,
+            "num_channels": model_config.n_channels,
+        },
+        "metrics_config": {metric_type: metric_params},
+    }
 
 
 def get_metrics(
-    metrics_params: Union[Dict[str, object], List[str]]
+    metrics_params: Union[Dict[str, object], List[str]],
+    model_config: Optional[Type[AbstractModelConfig]] = None,
 ) -> Dict[str, Callable]:
     """
     This function gets the metric transformations from the parameters.
@@ -37,8 +81,11 @@ def get_metrics(
 
         metrics_params (Union[Dict[str, object], List[str]]): The metrics parameters.
     Can be a list of metric names or a dictionary of metric names and their parameters.
+        model_config (AbstractModelConfig, optional): The model configuration,
+    required by the epoch-level metrics (e.g. FID, KID).
     Returns:
-        dict[object]: The dict of metrics to be calculated.
+        dict[object]: The dict of metrics to be calculated. Epoch-level metrics are
+    `torchmetrics.Metric` instances, the other metrics are functions called per batch.
     """
     current_metrics = {}
 
@@ -48,7 +95,7 @@ def get_metrics(
         for metric_type in metrics_params:
             if isinstance(metric_type, dict):
                 # case in which user specified some metrics with parameters along with some metrics without parameters
-                converted_metrics_params[metric_type.keys()] = metric_type.values()
+                converted_metrics_params.update(metric_type)
             else:
                 converted_metrics_params[metric_type] = {}
         metrics_params = converted_metrics_params
@@ -60,6 +107,18 @@ def get_metrics(
 
         if metric_type_lower in global_metrics_dict:
             current_metrics[metric_type_lower] = global_metrics_dict[metric_type_lower]
+        elif metric_type_lower in epoch_metrics_dict:
+            if model_config is None:
+                warn(
+                    f"Metric {metric_type} requires the model configuration, skipping it.",
+                    UserWarning,
+                )
+                continue
+            current_metrics[metric_type_lower] = epoch_metrics_dict[metric_type_lower](
+                _prepare_epoch_metric_params(
+                    metric_type_lower, metric_params, model_config
+                )
+            )
         else:
             warn(
                 f"Metric {metric_type} not found in the global metrics dictionary.",
@@ -1,7 +1,8 @@
 """Implementation of DCGAN model."""
 
+import math
 from warnings import warn
-from typing import Type, List
+from typing import Type, List, Sequence
 
 import torch
 import torch.nn as nn
@@ -10,6 +11,76 @@ from gandlf_synth.models.architectures.base_model import ModelBase
 from gandlf_synth.models.configs.config_abc import AbstractModelConfig
 
 
+def _get_conv_output_size(
+    layer: nn.modules.conv._ConvNd, input_size: Sequence[int]
+) -> List[int]:
+    """
+    Computes the spatial output size of a convolution or transposed convolution
+    from its kernel size, stride, padding and dilation.
+
+    Args:
+        layer (nn.modules.conv._ConvNd): The (transposed) convolution.
+        input_size (Sequence[int]): The spatial size of the input.
+
+    Returns:
+        List[int]: The spatial size of the output.
+    """
+    if isinstance(layer, nn.modules.conv._ConvTransposeNd):
+        return [
+            (size - 1) * stride - 2 * padding + dilation * (kernel - 1) + extra + 1
+            for size, kernel, stride, padding, dilation, extra in zip(
+                input_size,
+                layer.kernel_size,
+                layer.stride,
+                layer.padding,
+                layer.dilation,
+                layer.output_padding,
+            )
+        ]
+    # the "same" padding is only allowed with unit strides
+    if layer.padding == "same":
+        return list(input_size)
+    padding = [0] * len(input_size) if layer.padding == "valid" else layer.padding
+    return [
+        (size + 2 * pad - dilation * (kernel - 1) - 1) // stride + 1
+        for size, kernel, stride, pad, dilation in zip(
+            input_size, layer.kernel_size, layer.stride, padding, layer.dilation
+        )
+    ]
+
+
+def _get_output_shape(
+    feature_extractor: nn.Sequential, input_shape: Sequence[int]
+) -> List[int]:
+    """
+    Computes the output shape of a feature extractor analytically, without running
+    an input through it. The (transposed) convolutions change the number of channels
+    and the spatial size, the flattening layers merge the dimensions, while the other
+    layers (normalizations, activations) keep the shape.
+
+    Args:
+        feature_extractor (nn.Sequential): The feature extractor.
+        input_shape (Sequence[int]): The shape of a single input (C, H, W) or
+    (C, H, W, D), without the batch dimension.
+
+    Returns:
+        List[int]: The shape of a single output, without the batch dimension.
+    """
+    shape = list(input_shape)
+    for layer in feature_extractor:
+        if isinstance(layer, nn.modules.conv._ConvNd):
+            shape = [layer.out_channels, *_get_conv_output_size(layer, shape[1:])]
+            assert min(shape[1:]) > 0, (
+                f"The input of shape {tuple(input_shape)} is too small for the "
+                "feature extractor."
+            )
+        elif isinstance(layer, nn.Flatten):
+            assert layer.end_dim == -1, "Only flattening to the end is supported."
+            start_dim = layer.start_dim - 1 if layer.start_dim > 0 else layer.start_dim
+            shape = shape[:start_dim] + [math.prod(shape[start_dim:])]
+    return shape
+
+
 class _GeneratorDCGAN(nn.Module):
     """Generator for the DCGAN."""
 
@@ -24,6 +95,7 @@ class _GeneratorDCGAN(nn.Module):
         norm: nn.Module,
         conv_transpose: nn.Module,
         conv: nn.Module,
+        verify_output_size: bool = False,
     ) -> None:
         """
         Initializes a new instance of the _GneratorDCGAN class.
@@ -47,6 +119,9 @@ class _GeneratorDCGAN(nn.Module):
             conv_transpose (torch.nn.module): A convolutional layer subclassing
         torch.nn.Module.
             conv (torch.nn.module): A convolutional layer subclassing torch.nn.Module.
+            verify_output_size (bool, optional): Whether to verify the computed output
+        size of the feature extractor with a forward pass of a dummy input.
+        Defaults to False.
         """
         super().__init__()
         self.feature_extractor = nn.Sequential()
@@ -109,7 +184,7 @@ class _GeneratorDCGAN(nn.Module):
             ),
         )
         feature_extractor_output_size = self._get_output_size_feature_extractor(
-            self.feature_extractor, latent_vector_dim, n_dimensions
+            self.feature_extractor, latent_vector_dim, n_dimensions, verify_output_size
         )
         # if the output size of the feature extractor does not match
         # the output patch size, add an upsampling layer and a 1x1
@@ -143,25 +218,37 @@ class _GeneratorDCGAN(nn.Module):
 
     @staticmethod
     def _get_output_size_feature_extractor(
-        feature_extractor: nn.Module, latent_vector_dim: int, n_dimensions: int = 3
-    ) -> int:
+        feature_extractor: nn.Module,
+        latent_vector_dim: int,
+        n_dimensions: int = 3,
+        verify: bool = False,
+    ) -> torch.Size:
         """
-        Determines the output size of the given module.
+        Determines the output size of the given module from the kernel size,
+        stride and padding of its layers.
 
         Args:
             feature_extractor (nn.Module): The feature extractor module.
             latent_vector_dim (int): The dimension of the latent vector
         to be used as input to the generator.
+            n_dimensions (int, optional): The dimensionality of the output.
+        Defaults to 3.
+            verify (bool, optional): Whether to verify the computed size with
+        a forward pass of a dummy input. Defaults to False.
 
         Returns:
-            int: The output size of the feature extractor.
+            torch.Size: The spatial output size of the feature extractor.
         """
-        dummy_input_shape = [1, latent_vector_dim, 1, 1]
-        if n_dimensions == 3:
-            dummy_input_shape.append(1)
-        dummy_input = torch.randn(dummy_input_shape)
-        dummy_output = feature_extractor(dummy_input)
-        return dummy_output.shape[2:]
+        input_shape = [latent_vector_dim] + [1] * n_dimensions
+        output_size = torch.Size(_get_output_shape(feature_extractor, input_shape)[1:])
+        if verify:
+            with torch.no_grad():
+                dummy_output = feature_extractor(torch.randn(1, *input_shape))
+            assert dummy_output.shape[2:] == output_size, (
+                f"Computed output size {tuple(output_size)} of the generator "
+                f"feature extractor, got {tuple(dummy_output.shape[2:])}."
+            )
+        return output_size
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
@@ -190,6 +277,7 @@ class _DiscriminatorDCGAN(nn.Module):
         slope: float,
         norm: nn.Module,
         conv: nn.Module,
+        verify_output_size: bool = False,
     ) -> None:
         """
         Initializes a new instance of the _DiscriminatorDCGAN class.
@@ -210,6 +298,9 @@ class _DiscriminatorDCGAN(nn.Module):
         torch.nn.Module (i.e. nn.BatchNorm2d)
             conv (torch.nn.module): A convolutional layer subclassing
         torch.nn.Module.
+            verify_output_size (bool, optional): Whether to verify the computed output
+        size of the feature extractor with a forward pass of a dummy input.
+        Defaults to False.
         """
         super().__init__()
         self.feature_extractor = nn.Sequential()
@@ -279,18 +370,22 @@ class _DiscriminatorDCGAN(nn.Module):
         self.feature_extractor.add_module("flatten", nn.Flatten(start_dim=1))
 
         num_output_features = self._get_output_size_feature_extractor(
-            self.feature_extractor, input_size, num_input_channels
+            self.feature_extractor, input_size, num_input_channels, verify_output_size
         )
         self.classifier.add_module("linear1", nn.Linear(num_output_features, 1))
         self.classifier.add_module("sigmoid", nn.Sigmoid())
 
     @staticmethod
     def _get_output_size_feature_extractor(
-        feature_extractor: nn.Module, input_size: List[int], n_channels: int = 1
+        feature_extractor: nn.Module,
+        input_size: List[int],
+        n_channels: int = 1,
+        verify: bool = False,
     ) -> int:
         """
         Determines the output size of the feature extractor to
-        initialize the classifier.
+        initialize the classifier, from the kernel size, stride and
+        padding of its layers.
 
         Args:
             feature_extractor (nn.Module): The feature extractor module.
@@ -298,14 +393,22 @@ class _DiscriminatorDCGAN(nn.Module):
         only includes (H, W, D) and not the number of channels (C).
             n_channels (int): The number of input channels in the image
         to be discriminated.
+            verify (bool, optional): Whether to verify the computed size with
+        a forward pass of a dummy input. Defaults to False.
 
         Returns:
             int: The output size of the feature extractor.
         """
-        dummy_input_shape = [1, n_channels, *input_size]
-        dummy_input = torch.randn(dummy_input_shape)
-        dummy_output = feature_extractor(dummy_input)
-        return dummy_output.shape[1]
+        input_shape = [n_channels, *input_size]
+        (num_output_features,) = _get_output_shape(feature_extractor, input_shape)
+        if verify:
+            with torch.no_grad():
+                dummy_output = feature_extractor(torch.randn(1, *input_shape))
+            assert dummy_output.shape[1] == num_output_features, (
+                f"Computed {num_output_features} output features of the discriminator "
+                f"feature extractor, got {dummy_output.shape[1]}."
+            )
+        return num_output_features
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
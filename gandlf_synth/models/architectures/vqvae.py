@@ -29,6 +29,8 @@ class EMAQuantizer(nn.Module):
         epsilon: epsilon value. Defaults to 1e-5.
         embedding_init: initialization method for the codebook. Defaults to "normal".
         ddp_sync: whether to synchronize the codebook across processes. Defaults to True.
+        max_distance_matrix_elements: upper bound on the number of elements of the distance matrix
+            materialized at once during the nearest codebook search. Defaults to 2**24.
     """
 
     def __init__(
@@ -41,6 +43,7 @@ class EMAQuantizer(nn.Module):
         epsilon: float = 1e-5,
         embedding_init: str = "normal",
         ddp_sync: bool = True,
+        max_distance_matrix_elements: int = 2**24,
     ):
         super().__init__()
         self.spatial_dims: int = spatial_dims
@@ -72,6 +75,7 @@ class EMAQuantizer(nn.Module):
         self.epsilon: float = epsilon
 
         self.ddp_sync: bool = ddp_sync
+        self.max_distance_matrix_elements: int = max_distance_matrix_elements
 
         # Precalculating required permutation shapes
         self.flatten_permutation: Sequence[int] = (
@@ -82,6 +86,39 @@ class EMAQuantizer(nn.Module):
             self.spatial_dims + 1,
         ] + list(range(1, self.spatial_dims + 1))
 
+    def _nearest_codebook_indices(self, flat_input: torch.Tensor) -> torch.Tensor:
+        """
+        Finds the index of the nearest codebook vector for every row of the flattened input.
+        The distance matrix is computed in chunks of rows, so that at most
+        `max_distance_matrix_elements` distances are materialized at once.
+
+        Args:
+            flat_input: Flattened encoding space tensor of shape [B*D*H*W, C].
+
+        Returns:
+            torch.Tensor: Quantization indices of shape [B*D*H*W].
+        """
+        codebook = self.embedding.weight
+        codebook_sq_norms = (codebook.t() ** 2).sum(dim=0, keepdim=True)
+        chunk_size = max(1, self.max_distance_matrix_elements // self.num_embeddings)
+
+        encoding_indices = torch.empty(
+            flat_input.shape[0], dtype=torch.long, device=flat_input.device
+        )
+        for start in range(0, flat_input.shape[0], chunk_size):
+            input_chunk = flat_input[start : start + chunk_size]
+            # Calculate Euclidean distances
+            distances = (
+                (input_chunk**2).sum(dim=1, keepdim=True)
+                + codebook_sq_norms
+                - 2 * torch.mm(input_chunk, codebook.t())
+            )
+            # Mapping distances to indexes, first minimum is taken on ties
+            encoding_indices[start : start + chunk_size] = torch.argmin(
+                distances, dim=1
+            )
+        return encoding_indices
+
     def quantize(
         self, inputs: torch.Tensor
     ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
@@ -93,7 +130,7 @@ class EMAQuantizer(nn.Module):
 
         Returns:
             torch.Tensor: Flatten version of the input of shape [B*D*H*W, C].
-            torch.Tensor: One-hot representation of the quantization indices of shape [B*D*H*W, self.num_embeddings].
+            torch.Tensor: Flat quantization indices of shape [B*D*H*W].
             torch.Tensor: Quantization indices of shape [B,D,H,W,1]
 
         """
@@ -110,23 +147,12 @@ class EMAQuantizer(nn.Module):
                 .view(-1, self.embedding_dim)
             )
 
-            # Calculate Euclidean distances
-            distances = (
-                (flat_input**2).sum(dim=1, keepdim=True)
-                + (self.embedding.weight.t() ** 2).sum(dim=0, keepdim=True)
-                - 2 * torch.mm(flat_input, self.embedding.weight.t())
-            )
-
-            # Mapping distances to indexes
-            encoding_indices = torch.max(-distances, dim=1)[1]
-            encodings = torch.nn.functional.one_hot(
-                encoding_indices, self.num_embeddings
-            ).type_as(inputs)
+            flat_encoding_indices = self._nearest_codebook_indices(flat_input)
 
             # Quantize and reshape
-            encoding_indices = encoding_indices.view(encoding_indices_view)
+            encoding_indices = flat_encoding_indices.view(encoding_indices_view)
 
-        return flat_input, encodings, encoding_indices
+        return flat_input, flat_encoding_indices, encoding_indices
 
     def embed(self, embedding_indices: torch.Tensor) -> torch.Tensor:
         """
@@ -157,10 +183,8 @@ class EMAQuantizer(nn.Module):
         example: https://pytorch.org/docs/stable/generated/torch.jit.unused.html#torch.jit.unused
 
         Args:
-            encodings_sum: The summation of one hot representation of what encoding was used for each
-                position.
-            dw: The multiplication of the one hot representation of what encoding was used for each
-                position with the flattened input.
+            encodings_sum: The number of positions assigned to each encoding.
+            dw: The summation of the flattened input over the positions assigned to each encoding.
 
         """
         if self.ddp_sync and torch.distributed.is_initialized():
@@ -173,13 +197,19 @@ class EMAQuantizer(nn.Module):
     def forward(
         self, inputs: torch.Tensor
     ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
-        flat_input, encodings, encoding_indices = self.quantize(inputs)
+        flat_input, flat_encoding_indices, encoding_indices = self.quantize(inputs)
         quantized = self.embed(encoding_indices)
         # Use EMA to update the embedding vectors
         if self.training:
             with torch.no_grad():
-                encodings_sum = encodings.sum(0)
-                dw = torch.mm(encodings.t(), flat_input)
+                # Equivalent to the column sums of the one-hot encodings matrix and
+                # its product with the flat input, without materializing it
+                encodings_sum = torch.bincount(
+                    flat_encoding_indices, minlength=self.num_embeddings
+                ).type_as(flat_input)
+                dw = flat_input.new_zeros(
+                    (self.num_embeddings, self.embedding_dim)
+                ).index_add_(0, flat_encoding_indices, flat_input)
 
                 if self.ddp_sync:
                     self.distributed_synchronization(encodings_sum, dw)
@@ -516,6 +546,9 @@ class VQVAE(ModelBase):
                 decay=model_config.architecture["EMA_decay"],
                 epsilon=model_config.architecture["epsilon"],
                 ddp_sync=False,  # FIXME: possible problem with allreduce sync when the deepspeed is used
+                max_distance_matrix_elements=model_config.architecture[
+                    "max_distance_matrix_elements"
+                ],
             )
         )
         self.full_module = nn.Sequential(self.encoder, self.quantizer, self.decoder)
@@ -530,6 +563,32 @@ class VQVAE(ModelBase):
     def decode(self, quantized_encodings: torch.Tensor) -> torch.Tensor:
         return self.decoder(quantized_encodings)
 
+    def encode_to_indices(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        Encodes the input into the codebook indices. Unlike the forward pass,
+        this never updates the codebook, regardless of the training mode.
+
+        Args:
+            x (torch.Tensor): Input tensor of shape [B, C, (D), H, W].
+
+        Returns:
+            torch.Tensor: Codebook indices of shape [B, (D), H, W].
+        """
+        _, _, encoding_indices = self.quantizer.quantizer.quantize(self.encode(x))
+        return encoding_indices
+
+    def decode_from_indices(self, encoding_indices: torch.Tensor) -> torch.Tensor:
+        """
+        Decodes the codebook indices back into the image space.
+
+        Args:
+            encoding_indices (torch.Tensor): Codebook indices of shape [B, (D), H, W].
+
+        Returns:
+            torch.Tensor: Reconstructed tensor of shape [B, C, (D), H, W].
+        """
+        return self.decode(self.quantizer.embed(encoding_indices))
+
     def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
         x = self.encode(x)
         quantized, quantization_loss = self.quantize(x)
@@ -21,6 +21,10 @@ class UnlabeledDCGANConfig(AbstractModelConfig):
             assert dim > 0 and isinstance(
                 dim, int
             ), "All elements of `tensor_shape` must be positive integers."
+        metrics_every_n_steps = model_config["metrics_every_n_steps"]
+        assert (
+            isinstance(metrics_every_n_steps, int) and metrics_every_n_steps >= 1
+        ), "`metrics_every_n_steps` should be a positive integer."
         if "leaky_relu_slope" in model_config["architecture"]:
             assert (
                 model_config["architecture"]["leaky_relu_slope"] > 0
@@ -33,6 +37,8 @@ class UnlabeledDCGANConfig(AbstractModelConfig):
             "n_fixed_images_batch_size": 1,  # Batch size of images to gernerate at the end of each training epochs
             "n_fixed_images_to_generate": 8,  # How many images to generate at the end of each training epochs
             "save_eval_images_every_n_epochs": -1,  # Save evaluation images every n epochs, < 0 means never
+            "metrics_every_n_steps": 1,  # Interval (in steps) of computing the training metrics
+            "metrics_in_background": False,  # Compute the training metrics on CPU copies of the images in a background thread
         }
 
     @staticmethod
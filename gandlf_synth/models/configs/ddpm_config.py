@@ -15,6 +15,8 @@ class DDPMConfig(AbstractModelConfig):
             "n_fixed_images_batch_size": 1,  # Batch size of images to gernerate at the end of each training epochs
             "n_fixed_images_to_generate": 8,  # How many images to generate at the end of each training epochs
             "save_eval_images_every_n_epochs": -1,  # Save evaluation images every n epochs, < 0 means never
+            "eval_images_num_timesteps": 50,  # Number of sampling timesteps used for the evaluation images, fewer than `num_eval_timesteps` to keep them cheap
+            "timesteps_per_sample": 1,  # Number of independent timesteps (and noises) drawn for each loaded sample in training
         }
 
     @staticmethod
@@ -41,6 +43,16 @@ class DDPMConfig(AbstractModelConfig):
     def _validate_params(model_config: dict) -> None:
         architecture_params = model_config["architecture"]
 
+        timesteps_per_sample = model_config["timesteps_per_sample"]
+        assert (
+            isinstance(timesteps_per_sample, int) and timesteps_per_sample >= 1
+        ), "`timesteps_per_sample` should be a positive integer."
+        eval_images_num_timesteps = model_config["eval_images_num_timesteps"]
+        assert (
+            isinstance(eval_images_num_timesteps, int)
+            and eval_images_num_timesteps >= 1
+        ), "`eval_images_num_timesteps` should be a positive integer."
+
         with_conditioning = architecture_params["with_conditioning"]
         cross_attention_dim = architecture_params["cross_attention_dim"]
         dropout_cattn = architecture_params["cross_attention_dropout"]
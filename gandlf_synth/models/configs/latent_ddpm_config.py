@@ -0,0 +1,46 @@
+import os
+
+from gandlf_synth.models.configs.ddpm_config import DDPMConfig
+
+
+class LatentDDPMConfig(DDPMConfig):
+    """
+    Configuration class for the latent DDPM model. The diffusion UNet is trained in the
+    latent space of a previously trained (and frozen) VQVAE, and the generated latents are
+    decoded back to the image space with the VQVAE decoder. Architecture parameters are the
+    same as for the DDPM model, the input and output channels of the UNet are set to the
+    VQVAE embedding dimension.
+
+    """
+
+    @staticmethod
+    def _prepare_default_model_params() -> dict:
+        default_params = DDPMConfig._prepare_default_model_params()
+        default_params.update(
+            {
+                "vqvae_model_dir": None,  # Directory of the training run of the VQVAE, required
+                "vqvae_checkpoint_path": None,  # Custom VQVAE checkpoint, if None best or last checkpoint from `vqvae_model_dir` is used
+                "latent_codes_manifest": None,  # Manifest created by the `encode-dataset` command, if given the cached latents are used for training
+                "latent_scale_factor": 1.0,  # Scaling applied to the latents before the diffusion process
+                "quantize_generated_latents": True,  # Snap the generated latents to the nearest codebook entries before decoding
+            }
+        )
+        return default_params
+
+    @staticmethod
+    def _validate_params(model_config: dict) -> None:
+        DDPMConfig._validate_params(model_config)
+        vqvae_model_dir = model_config["vqvae_model_dir"]
+        assert (
+            vqvae_model_dir is not None
+        ), "Latent DDPM requires `vqvae_model_dir` pointing to the training run of a VQVAE."
+        assert os.path.exists(
+            os.path.join(vqvae_model_dir, "parameters.pkl")
+        ), f"No VQVAE parameters found in {vqvae_model_dir}."
+        assert (
+            model_config["latent_scale_factor"] > 0
+        ), "`latent_scale_factor` should be positive."
+        latent_codes_manifest = model_config["latent_codes_manifest"]
+        assert latent_codes_manifest is None or os.path.exists(
+            latent_codes_manifest
+        ), f"Latent codes manifest {latent_codes_manifest} does not exist."
@@ -9,7 +9,11 @@ class VQVAEConfig(AbstractModelConfig):
 
     @staticmethod
     def _prepare_default_model_params() -> dict:
-        return {}
+        return {
+            "n_fixed_images_batch_size": 1,  # Batch size of images to reconstruct at the end of each training epochs
+            "n_fixed_images_to_generate": 8,  # How many training images to reconstruct at the end of each training epochs
+            "save_eval_images_every_n_epochs": -1,  # Save evaluation images every n epochs, < 0 means never
+        }
 
     @staticmethod
     def _prepare_default_architecture_params() -> dict:
@@ -29,6 +33,8 @@ class VQVAEConfig(AbstractModelConfig):
             "loss_scaling_commitment_cost": 0.25,
             "EMA_decay": 0.5,
             "epsilon": 1e-5,
+            # memory budget (in elements) of the distance matrix in the codebook search
+            "max_distance_matrix_elements": 2**24,
         }
 
     @staticmethod
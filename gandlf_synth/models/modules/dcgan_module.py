@@ -1,8 +1,8 @@
-import os
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import torch
 from torch import nn, optim
-from torchvision.utils import save_image
+from torchmetrics import Metric
 
 from gandlf_synth.models.architectures.base_model import ModelBase
 from gandlf_synth.models.architectures.dcgan import DCGAN
@@ -15,15 +15,33 @@ from gandlf_synth.optimizers import get_optimizer
 from gandlf_synth.losses import get_loss
 from gandlf_synth.schedulers import get_scheduler
 
-from typing import Dict, Union, List
+from typing import Dict, Union, List, Optional
 
 
 class UnlabeledDCGANModule(SynthesisModule):
+    # maximum number of training metric computations queued in the background,
+    # when reached, the training waits for the oldest one
+    MAX_PENDING_METRICS_COMPUTATIONS = 4
+
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
         self.model: DCGAN
         self.automatic_optimization = False
-        self.train_loss_list: List[Dict[float]] = []
+        # The fixed latent vector used to generate the evaluation images is created once,
+        # not stored in the checkpoints.
+        self.register_buffer(
+            "fixed_latent_vector",
+            get_fixed_latent_vector(
+                self.model_config.n_fixed_images_to_generate,
+                self.model_config.architecture["latent_vector_size"],
+                self.model_config.n_dimensions,
+                "cpu",
+                self.model_config.fixed_latent_vector_seed,
+            ),
+            persistent=False,
+        )
+        self._metrics_computation_pool: Optional[ThreadPoolExecutor] = None
+        self._metrics_computation_futures: List[Future] = []
 
     def training_step(self, batch: object, batch_idx: int) -> torch.Tensor:
         real_images: torch.Tensor = batch
@@ -93,15 +111,80 @@ class UnlabeledDCGANModule(SynthesisModule):
             optimizer_disc.zero_grad(set_to_none=True)
 
         self.untoggle_optimizer(optimizer_disc)
-        loss_dict = {"disc_loss": total_disc_loss.item(), "gen_loss": gen_loss.item()}
-        self._step_log(loss_dict)
-        self.train_loss_list.append(loss_dict)
+        loss_dict = {"disc_loss": total_disc_loss, "gen_loss": gen_loss}
+        self._track_values(loss_dict, "train", batch_idx)
 
-        if self.metric_calculator is not None:
-            metric_results = {}
-            for metric_name, metric in self.metric_calculator.items():
-                metric_results[metric_name] = metric(real_images, fake_images.detach())
-            self._step_log(metric_results)
+        if (
+            self.metric_calculator is not None
+            and batch_idx % self.model_config.metrics_every_n_steps == 0
+        ):
+            self._calculate_and_track_metrics(
+                real_images.detach(), fake_images.detach(), batch_idx
+            )
+
+    def _calculate_metrics(
+        self, real_images: torch.Tensor, fake_images: torch.Tensor
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Calculate all the configured metrics between the real and fake images.
+
+        Args:
+            real_images (torch.Tensor): The real images.
+            fake_images (torch.Tensor): The generated images.
+
+        Returns:
+            Dict[str, torch.Tensor]: The metric results.
+        """
+        return {
+            metric_name: metric(real_images, fake_images)
+            for metric_name, metric in self.metric_calculator.items()
+            # epoch-level metrics are accumulated only in validation and test
+            if not isinstance(metric, Metric)
+        }
+
+    def _calculate_and_track_metrics(
+        self, real_images: torch.Tensor, fake_images: torch.Tensor, batch_idx: int
+    ) -> None:
+        """
+        Calculate the training metrics and track them. If `metrics_in_background` is
+        set, the metrics are calculated on CPU copies of the images in a background
+        thread, and merged into the tracked values at the end of the epoch.
+
+        Args:
+            real_images (torch.Tensor): The real images.
+            fake_images (torch.Tensor): The generated images.
+            batch_idx (int): The index of the current batch.
+        """
+        if not self.model_config.metrics_in_background:
+            self._track_values(
+                self._calculate_metrics(real_images, fake_images), "train", batch_idx
+            )
+            return
+        if self._metrics_computation_pool is None:
+            self._metrics_computation_pool = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="metrics_computation"
+            )
+        if (
+            len(self._metrics_computation_futures)
+            >= self.MAX_PENDING_METRICS_COMPUTATIONS
+        ):
+            self._accumulate_values(
+                self._metrics_computation_futures.pop(0).result(), "train"
+            )
+        self._metrics_computation_futures.append(
+            self._metrics_computation_pool.submit(
+                self._calculate_metrics, real_images.cpu(), fake_images.cpu()
+            )
+        )
+
+    def _collect_background_metrics(self) -> None:
+        """
+        Wait for the training metrics calculated in the background and merge
+        them into the tracked values.
+        """
+        for future in self._metrics_computation_futures:
+            self._accumulate_values(future.result(), "train")
+        self._metrics_computation_futures.clear()
 
     def validation_step(self, batch: object, batch_idx: int) -> torch.Tensor:
         raise NotImplementedError("Validation step is not implemented for the DCGAN.")
@@ -193,60 +276,29 @@ class UnlabeledDCGANModule(SynthesisModule):
 
         return [disc_optimizer, gen_optimizer]
 
-    def _generate_image_set_from_fixed_vector(
-        self, n_images_to_generate
-    ) -> torch.Tensor:
-        fixed_latent_vector = get_fixed_latent_vector(
-            n_images_to_generate,
-            self.model_config.architecture["latent_vector_size"],
-            self.model_config.n_dimensions,
-            self.device,
-            self.model_config.fixed_latent_vector_seed,
-        )
-        fake_images = self.model.generator(fixed_latent_vector)
-        return fake_images
-
-    # TODO can we make it nicer? It's a bit of a mess, plus maybe saving can be
-    # done in parallel?
-    def on_train_epoch_end(self) -> None:
-        self._epoch_log(self.train_loss_list)
+    def _generate_eval_images(self) -> List[torch.Tensor]:
+        """
+        Generate the evaluation images from the fixed latent vector, in batches of
+        `n_fixed_images_batch_size`.
 
-        process_rank = self.global_rank
-        eval_save_interval = self.model_config.save_eval_images_every_n_epochs
-        dimension = self.model_config.n_dimensions  # only for 2d
-        if (
-            dimension == 2
-            and eval_save_interval > 0
-            and self.current_epoch % eval_save_interval == 0
-        ):
-            fixed_images_save_path = os.path.join(
-                self.model_dir, f"eval_images", f"epoch_{self.current_epoch}"
-            )
-            if not os.path.exists(fixed_images_save_path):
-                os.makedirs(fixed_images_save_path, exist_ok=True)
-            last_batch_size = (
-                self.model_config.n_fixed_images_to_generate
-                % self.model_config.fixed_images_batch_size
-            )
-            n_batches = (
-                self.model_config.n_fixed_images_to_generate
-                // self.model_config.fixed_images_batch_size
+        Returns:
+            List[torch.Tensor]: The batches of generated images.
+        """
+        return [
+            self.model.generator(latent_vector_batch)
+            for latent_vector_batch in torch.split(
+                self.fixed_latent_vector, self.model_config.n_fixed_images_batch_size
             )
-            if last_batch_size > 0:
-                n_batches += 1
-            for i in range(n_batches):
-                n_images_to_generate = self.model_config.fixed_images_batch_size
-                if (i == n_batches - 1) and last_batch_size > 0:
-                    n_images_to_generate = last_batch_size
-                fake_images = self._generate_image_set_from_fixed_vector(
-                    n_images_to_generate
-                )
-                for n, fake_image in enumerate(fake_images):
-                    save_image(
-                        fake_image,
-                        os.path.join(
-                            fixed_images_save_path,
-                            f"fake_image_{i*n + n}_{process_rank}.png",
-                        ),
-                        normalize=True,
-                    )
+        ]
+
+    def on_train_epoch_end(self) -> None:
+        self._collect_background_metrics()
+        self._epoch_log("train")
+        self._save_eval_images("fake_image")
+
+    def on_train_end(self) -> None:
+        super().on_train_end()
+        if self._metrics_computation_pool is not None:
+            self._collect_background_metrics()
+            self._metrics_computation_pool.shutdown()
+            self._metrics_computation_pool = None
@@ -1,3 +1,5 @@
+import time
+
 import torch
 from torch import nn
 
@@ -10,20 +12,104 @@ from gandlf_synth.optimizers import get_optimizer
 from gandlf_synth.losses import get_loss
 from gandlf_synth.schedulers import get_scheduler
 
-from typing import Dict, Union, List
+from typing import Dict, Union, Tuple, List
 
 
 class UnlabeledDDPMModule(SynthesisModule):
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
-        self.train_loss_list: List[Dict[float]] = []
         self.scheduler = DDPMScheduler(
             num_train_timesteps=self.model_config.architecture["num_train_timesteps"]
         )
         self.inferer = DiffusionInferer(self.scheduler)
+        self._last_train_step_time = None
+        # The evaluation images are sampled with a separate scheduler, using fewer
+        # timesteps than the inference, from the fixed noise created once on the device.
+        self.eval_images_scheduler = DDPMScheduler(
+            num_train_timesteps=self.model_config.architecture["num_train_timesteps"]
+        )
+        self.eval_images_scheduler.set_timesteps(
+            num_inference_steps=min(
+                self.model_config.eval_images_num_timesteps,
+                self.model_config.architecture["num_train_timesteps"],
+            )
+        )
+        fixed_noise = None
+        if self._eval_images_enabled():
+            fixed_noise = torch.randn(
+                self.model_config.n_fixed_images_to_generate,
+                *self._get_sample_shape(),
+                generator=torch.Generator().manual_seed(
+                    self.model_config.fixed_latent_vector_seed
+                ),
+            )
+        self.register_buffer("fixed_noise", fixed_noise, persistent=False)
+
+    def _prepare_diffusion_inputs(self, batch: object) -> torch.Tensor:
+        """
+        Prepare the tensor the diffusion process operates on from the input batch.
+
+        Args:
+            batch (object): The input batch.
+
+        Returns:
+            torch.Tensor: The tensor to diffuse.
+        """
+        return batch
+
+    def _get_sample_shape(self) -> Tuple[int, ...]:
+        """
+        Get the shape of a single sample of the diffusion process (without batch dimension).
+
+        Returns:
+            Tuple[int, ...]: The sample shape.
+        """
+        return (self.model_config.n_channels, *self.model_config.tensor_shape)
+
+    def _postprocess_samples(self, samples: torch.Tensor) -> torch.Tensor:
+        """
+        Map the samples of the diffusion process to the image space.
+
+        Args:
+            samples (torch.Tensor): The samples of the diffusion process.
+
+        Returns:
+            torch.Tensor: The generated images.
+        """
+        return samples
+
+    def _log_training_throughput(self, n_loaded_samples: int, batch_idx: int) -> None:
+        """
+        Log the training throughput, measured between the consecutive training steps
+        (so including the data loading time), both in loaded samples and in the
+        noise prediction targets the UNet is trained on.
+
+        Args:
+            n_loaded_samples (int): The number of samples loaded in the current batch.
+            batch_idx (int): The index of the current batch.
+        """
+        current_time = time.perf_counter()
+        if self._last_train_step_time is not None:
+            elapsed_time = current_time - self._last_train_step_time
+            self._track_values(
+                {
+                    "loaded_samples_per_second": n_loaded_samples / elapsed_time,
+                    "unet_samples_per_second": n_loaded_samples
+                    * self.model_config.timesteps_per_sample
+                    / elapsed_time,
+                },
+                "train",
+                batch_idx,
+            )
+        self._last_train_step_time = current_time
 
     def training_step(self, batch: object, batch_idx: int) -> torch.Tensor:
-        x = batch
+        x = self._prepare_diffusion_inputs(batch)
+        n_loaded_samples = x.shape[0]
+        # Each loaded sample is used with multiple independent timesteps and noises,
+        # the loss is still averaged, so the gradient scale (and accumulation) is unchanged
+        if self.model_config.timesteps_per_sample > 1:
+            x = x.repeat_interleave(self.model_config.timesteps_per_sample, dim=0)
         noise = torch.randn_like(x).type_as(x)
         # Create timesteps
         timesteps = torch.randint(
@@ -37,9 +123,8 @@ class UnlabeledDDPMModule(SynthesisModule):
         )
         loss = self.losses(noise_pred, noise)
 
-        loss_dict = {"loss": loss.detach().item()}
-        self.train_loss_list.append(loss_dict)
-        self._step_log(loss_dict)
+        self._track_values({"loss": loss}, "train", batch_idx)
+        self._log_training_throughput(n_loaded_samples, batch_idx)
         return loss
         # for now, we will not calculate metrics for diffusion models in this version as this
         # requires additional generation of samples, slowing down the training
@@ -60,16 +145,15 @@ class UnlabeledDDPMModule(SynthesisModule):
         n_images_to_generate = len(batch)
 
         noise = torch.randn(
-            n_images_to_generate,
-            self.model_config.n_channels,
-            *self.model_config.tensor_shape,
-            device=self.device,
+            n_images_to_generate, *self._get_sample_shape(), device=self.device
         )
         self.scheduler.set_timesteps(
             num_inference_steps=self.model_config.architecture["num_eval_timesteps"]
         )
-        generated_images = self.inferer.sample(
-            input_noise=noise, diffusion_model=self.model, scheduler=self.scheduler
+        generated_images = self._postprocess_samples(
+            self.inferer.sample(
+                input_noise=noise, diffusion_model=self.model, scheduler=self.scheduler
+            )
         )
         if self.postprocessing_transforms is not None:
             for transform in self.postprocessing_transforms:
@@ -77,8 +161,41 @@ class UnlabeledDDPMModule(SynthesisModule):
 
         return generated_images
 
-    def _on_train_epoch_end(self, epoch: int) -> None:
-        self._epoch_log(self.train_loss_list)
+    def _generate_eval_images(self) -> List[torch.Tensor]:
+        """
+        Sample the evaluation images from the fixed noise, in batches of
+        `n_fixed_images_batch_size`, using `eval_images_num_timesteps` steps. The noise
+        added in the sampling steps is seeded as well, so the images of consecutive
+        epochs are comparable.
+
+        Returns:
+            List[torch.Tensor]: The batches of generated images.
+        """
+        with torch.random.fork_rng(
+            devices=[self.device] if self.device.type == "cuda" else []
+        ):
+            torch.manual_seed(self.model_config.fixed_latent_vector_seed)
+            return [
+                self._postprocess_samples(
+                    self.inferer.sample(
+                        input_noise=noise_batch,
+                        diffusion_model=self.model,
+                        scheduler=self.eval_images_scheduler,
+                        verbose=False,
+                    )
+                )
+                for noise_batch in torch.split(
+                    self.fixed_noise, self.model_config.n_fixed_images_batch_size
+                )
+            ]
+
+    def on_train_epoch_start(self) -> None:
+        # the first step of the epoch does not measure the end of the previous one
+        self._last_train_step_time = None
+
+    def on_train_epoch_end(self) -> None:
+        self._epoch_log("train")
+        self._save_eval_images("fake_image")
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         return self.model(x)
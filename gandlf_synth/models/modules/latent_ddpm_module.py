@@ -0,0 +1,101 @@
+import os
+import pickle
+from copy import deepcopy
+
+import torch
+
+from gandlf_synth.models.architectures.base_model import ModelBase
+from gandlf_synth.models.architectures.ddpm import DDPM
+from gandlf_synth.models.architectures.vqvae import VQVAE
+from gandlf_synth.models.modules.ddpm_module import UnlabeledDDPMModule
+from gandlf_synth.utils.managers_utils import (
+    determine_checkpoint_to_load,
+    load_weights_from_checkpoint,
+)
+
+from typing import Tuple
+
+
+class UnlabeledLatentDDPMModule(UnlabeledDDPMModule):
+    """
+    DDPM trained in the latent space of a frozen VQVAE. The training inputs are either
+    images, which are encoded and quantized on the fly, or the code maps cached by the
+    `encode-dataset` command. The generated latents are decoded with the VQVAE decoder.
+
+    The VQVAE is a registered submodule, so its weights are saved in every checkpoint.
+    This way, a checkpoint restores the VQVAE it was trained with even if the VQVAE run
+    changes afterwards, and only its configuration is read from `vqvae_model_dir` when
+    restoring with `skip_weights_init`. The cost is the size of the VQVAE in every
+    checkpoint, which is bounded with the `keep_last` retention option.
+    """
+
+    def _load_vqvae(self) -> VQVAE:
+        """
+        Build the VQVAE from the configuration saved in its training run and load
+        the trained weights. The VQVAE is frozen and kept in evaluation mode. It is
+        built on the meta device and the weights are assigned from the checkpoint, or
+        left on the meta device when the module skips the weights initialization.
+
+        Returns:
+            VQVAE: The frozen VQVAE.
+        """
+        vqvae_model_dir = self.model_config.vqvae_model_dir
+        with open(os.path.join(vqvae_model_dir, "parameters.pkl"), "rb") as pickle_file:
+            vqvae_model_config = pickle.load(pickle_file)["model_config"]
+        with torch.device("meta"):
+            vqvae = VQVAE(vqvae_model_config)
+        vqvae.requires_grad_(False)
+        if self.skip_weights_init:
+            return vqvae.eval()
+        vqvae_checkpoint_path = determine_checkpoint_to_load(
+            model_dir=vqvae_model_dir,
+            custom_checkpoint_path=self.model_config.vqvae_checkpoint_path,
+        )
+        assert (
+            vqvae_checkpoint_path is not None
+        ), f"No checkpoint found in {vqvae_model_dir}, a trained VQVAE is required."
+        # the VQVAE module stores the architecture under the `model` attribute
+        load_weights_from_checkpoint(vqvae, vqvae_checkpoint_path, prefix="model.")
+        return vqvae.eval()
+
+    def _initialize_model(self) -> ModelBase:
+        self.vqvae = self._load_vqvae()
+        with torch.no_grad():
+            latent_shape = self.vqvae.encode(
+                torch.zeros(1, self.vqvae.n_channels, *self.model_config.tensor_shape)
+            ).shape[1:]
+        self.latent_shape = tuple(latent_shape)
+        # the UNet operates on the latents, not on the images
+        latent_model_config = deepcopy(self.model_config)
+        latent_model_config.n_channels = self.latent_shape[0]
+        latent_model_config.tensor_shape = self.latent_shape[1:]
+        latent_model_config.architecture["out_channels"] = self.latent_shape[0]
+        return DDPM(latent_model_config)
+
+    def train(self, mode: bool = True) -> "UnlabeledLatentDDPMModule":
+        super().train(mode)
+        # the VQVAE is frozen, dropout and codebook updates must stay disabled
+        self.vqvae.eval()
+        return self
+
+    def _prepare_diffusion_inputs(self, batch: object) -> torch.Tensor:
+        with torch.no_grad():
+            if not torch.is_floating_point(batch):
+                # cached code maps from the `encode-dataset` command
+                latents = self.vqvae.quantizer.embed(batch)
+            else:
+                latents = self.vqvae.quantizer.embed(
+                    self.vqvae.encode_to_indices(batch)
+                )
+        return latents * self.model_config.latent_scale_factor
+
+    def _get_sample_shape(self) -> Tuple[int, ...]:
+        return self.latent_shape
+
+    def _postprocess_samples(self, samples: torch.Tensor) -> torch.Tensor:
+        latents = samples / self.model_config.latent_scale_factor
+        if self.model_config.quantize_generated_latents:
+            latents = self.vqvae.quantizer.embed(
+                self.vqvae.quantizer.quantizer.quantize(latents)[2]
+            )
+        return self.vqvae.decode(latents)
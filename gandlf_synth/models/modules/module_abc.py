@@ -1,10 +1,14 @@
 import os
 from logging import Logger
+from contextlib import nullcontext
 from abc import abstractmethod, ABCMeta
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import torch
 from torch import nn
 import lightning.pytorch as pl
+from torchmetrics import Metric
+from torchvision.utils import save_image
 
 from gandlf_synth.version import __version__
 from gandlf_synth.models.configs.config_abc import AbstractModelConfig
@@ -18,12 +22,15 @@ class SynthesisModule(pl.LightningModule, metaclass=ABCMeta):
     Uses Pytorch Lightning as the base class, with extra functionality added on top.
     """
 
+    EVAL_IMAGES_SAVING_WORKERS = 4
+
     def __init__(
         self,
         model_config: Type[AbstractModelConfig],
         model_dir: str,
         metric_calculator: Optional[Dict[str, Callable]] = None,
         postprocessing_transforms: Optional[List[Callable]] = None,
+        skip_weights_init: bool = False,
     ) -> None:
         """Initialize the synthesis module.
 
@@ -33,6 +40,9 @@ class SynthesisModule(pl.LightningModule, metaclass=ABCMeta):
             model_dir (str) : Model and results output directory.
             metric_calculator (Dict[str,Callable],optional): Metric calculator object.
             postprocessing_transforms (List[Callable], optional): Postprocessing transformations to apply.
+            skip_weights_init (bool, optional): Whether to build the model on the meta device,
+        without allocating nor initializing its weights, when they are restored from a
+        checkpoint right after. Defaults to False.
         """
 
         super().__init__()
@@ -42,7 +52,15 @@ class SynthesisModule(pl.LightningModule, metaclass=ABCMeta):
         self.model_dir = model_dir
         self.metric_calculator = metric_calculator
         self.postprocessing_transforms = postprocessing_transforms
-        self.model = self._initialize_model()
+        # running means of the tracked values per phase, see `_track_values`
+        self._running_means: Dict[str, Dict[str, "_RunningMean"]] = {}
+        # evaluation images are saved in the background, not to stall the training
+        self._eval_images_saving_pool: Optional[ThreadPoolExecutor] = None
+        self._eval_images_saving_futures: List[Future] = []
+        # the weights are assigned later with `load_weights_from_checkpoint`
+        self.skip_weights_init = skip_weights_init
+        with torch.device("meta") if skip_weights_init else nullcontext():
+            self.model = self._initialize_model()
         self.losses = self._initialize_losses()
 
     @abstractmethod
@@ -96,10 +114,12 @@ class SynthesisModule(pl.LightningModule, metaclass=ABCMeta):
             data_to_transform = self.data_transform(data_to_transform)
         return data_to_transform
 
-    def _step_log(self, dict_to_log: Dict[str, float]) -> None:
+    def _step_log(self, dict_to_log: Dict[str, Union[float, torch.Tensor]]) -> None:
         """
         Log the value to the logger at the end of the step.
         This writes the values to the progress bar, but not to the log file.
+        Values are not synchronized between processes, so the progress bar shows
+        the values of the given process.
 
         Args:
             dict_to_log (dict): Dictionary of values to log.
@@ -110,34 +130,232 @@ class SynthesisModule(pl.LightningModule, metaclass=ABCMeta):
             on_step=True,
             logger=False,
             on_epoch=False,
-            sync_dist=True,
+            sync_dist=False,
         )
 
-    def _epoch_log(self, object_to_log: List[Dict[str, float]]) -> None:
+    def _track_values(
+        self,
+        dict_to_track: Dict[str, Union[float, torch.Tensor]],
+        phase: str,
+        batch_idx: int,
+    ) -> None:
+        """
+        Accumulate the values into running means kept on the device, which are
+        logged at the end of the epoch by `_epoch_log`. This never synchronizes
+        the device with the host. Every `log_every_n_steps` steps, the values are
+        also written to the progress bar.
+
+        Args:
+            dict_to_track (dict): Dictionary of values to track.
+            phase (str): The phase the values come from (train, val, test).
+            batch_idx (int): The index of the current batch.
+        """
+        self._accumulate_values(dict_to_track, phase)
+        if batch_idx % self.model_config.log_every_n_steps == 0:
+            self._step_log(dict_to_track)
+
+    def _accumulate_values(
+        self, dict_to_accumulate: Dict[str, Union[float, torch.Tensor]], phase: str
+    ) -> None:
         """
-        Log the accumulated tracked value to the logger at the end of the epoch.
-        Averages the tracked values and logs them to the progress bar and the log file.
-        At the end, empties the tracked values.
+        Accumulate the values into the running means of the given phase, without
+        writing them to the progress bar.
 
         Args:
-            object_to_log (List[Dict[str, float]]): List of dictionaries containing tracked values.
-        """
-        if len(object_to_log) > 0:
-            avg_results = {}
-            for tracked_value_name in object_to_log[0].keys():
-                avg_results[tracked_value_name] = sum(
-                    [
-                        tracked_value[tracked_value_name]
-                        for tracked_value in object_to_log
-                    ]
-                ) / len(object_to_log)
-
-            self.log_dict(
-                avg_results,
-                prog_bar=True,
-                on_step=False,
-                logger=True,
-                on_epoch=True,
-                sync_dist=True,
+            dict_to_accumulate (dict): Dictionary of values to accumulate.
+            phase (str): The phase the values come from (train, val, test).
+        """
+        running_means = self._running_means.setdefault(phase, {})
+        for tracked_value_name, tracked_value in dict_to_accumulate.items():
+            tracked_value = torch.as_tensor(tracked_value, device=self.device).detach()
+            if tracked_value_name not in running_means:
+                running_means[tracked_value_name] = _RunningMean(self.device)
+            running_means[tracked_value_name].update(tracked_value)
+
+    def _update_epoch_metrics(
+        self, generated_images: torch.Tensor, real_images: torch.Tensor
+    ) -> None:
+        """
+        Update the epoch-level metrics (`torchmetrics.Metric` instances in the
+        metric calculator) with a batch of images. They are computed once at the
+        end of the validation and test epochs by `_epoch_log`.
+
+        Args:
+            generated_images (torch.Tensor): The generated (or reconstructed) images.
+            real_images (torch.Tensor): The real images.
+        """
+        if self.metric_calculator is None:
+            return
+        for metric in self.metric_calculator.values():
+            if isinstance(metric, Metric):
+                metric.to(self.device).update(generated_images, real_images)
+
+    def _compute_epoch_metrics(self, phase: str) -> Dict[str, torch.Tensor]:
+        """
+        Compute the epoch-level metrics updated in the given phase and reset them.
+        The metric states are reduced across processes by the metrics themselves.
+        Metrics returning multiple values (e.g. precision and recall) are logged
+        under the names of the values.
+
+        Args:
+            phase (str): The phase to compute the metrics of (val, test).
+
+        Returns:
+            Dict[str, torch.Tensor]: The metric results.
+        """
+        if self.metric_calculator is None or phase == "train":
+            return {}
+        epoch_metric_results = {}
+        for metric_name, metric in self.metric_calculator.items():
+            if isinstance(metric, Metric) and metric.update_called:
+                metric_result = metric.compute()
+                if isinstance(metric_result, dict):
+                    epoch_metric_results.update(
+                        {
+                            f"{phase}_{value_name}": value
+                            for value_name, value in metric_result.items()
+                        }
+                    )
+                else:
+                    epoch_metric_results[f"{phase}_{metric_name}"] = metric_result
+                metric.reset()
+        return epoch_metric_results
+
+    def _epoch_log(self, phase: str) -> None:
+        """
+        Log the running means of the values tracked in the given phase, together
+        with the epoch-level metrics, to the progress bar and the log file. The
+        running means of all the values are reduced across processes in a single
+        operation. At the end, the running means are reset.
+
+        Args:
+            phase (str): The phase to log the tracked values of (train, val, test).
+        """
+        avg_results = self._compute_epoch_metrics(phase)
+        running_means = self._running_means.pop(phase, None)
+        if running_means:
+            tracked_value_names = sorted(running_means.keys())
+            totals = torch.stack(
+                [running_means[name].state() for name in tracked_value_names]
+            )
+            totals = self.trainer.strategy.reduce(totals, reduce_op="sum")
+            avg_results.update(
+                {
+                    name: totals[i, 0] / totals[i, 1]
+                    for i, name in enumerate(tracked_value_names)
+                }
             )
-            object_to_log.clear()
+        if not avg_results:
+            return
+        self.log_dict(
+            avg_results,
+            prog_bar=True,
+            on_step=False,
+            logger=True,
+            on_epoch=True,
+            sync_dist=False,  # already reduced above
+        )
+
+    def _eval_images_enabled(self) -> bool:
+        """
+        Check if the evaluation images are saved during the training. They are
+        saved only for 2D data, if `save_eval_images_every_n_epochs` is positive.
+
+        Returns:
+            bool: Whether the evaluation images are saved.
+        """
+        return (
+            self.model_config.n_dimensions == 2
+            and getattr(self.model_config, "save_eval_images_every_n_epochs", -1) > 0
+        )
+
+    @abstractmethod
+    def _generate_eval_images(self) -> List[torch.Tensor]:
+        """
+        Generate the evaluation images used to monitor the training progress. It is
+        called in the inference mode, with the model switched to the evaluation mode.
+
+        Returns:
+            List[torch.Tensor]: The batches of evaluation images. Each element of the
+        batches is saved to a separate file.
+        """
+        pass
+
+    def _save_eval_images(self, image_name_prefix: str) -> None:
+        """
+        Generate the evaluation images and save them in the background, if they are
+        due in the current epoch. Meant to be called at the end of the training epoch.
+
+        Args:
+            image_name_prefix (str): Prefix of the names of the saved image files.
+        """
+        if not (
+            self._eval_images_enabled()
+            and self.current_epoch % self.model_config.save_eval_images_every_n_epochs
+            == 0
+        ):
+            return
+        eval_images_save_path = os.path.join(
+            self.model_dir, "eval_images", f"epoch_{self.current_epoch}"
+        )
+        os.makedirs(eval_images_save_path, exist_ok=True)
+        # surface errors from the previous epochs before submitting new images
+        self._wait_for_eval_images_saving()
+        if self._eval_images_saving_pool is None:
+            self._eval_images_saving_pool = ThreadPoolExecutor(
+                max_workers=self.EVAL_IMAGES_SAVING_WORKERS,
+                thread_name_prefix="eval_images_saving",
+            )
+        model_training = self.model.training
+        self.model.eval()
+        with torch.inference_mode():
+            eval_images = torch.cat(
+                [eval_images.cpu() for eval_images in self._generate_eval_images()]
+            )
+        self.model.train(model_training)
+        for n, eval_image in enumerate(eval_images):
+            self._eval_images_saving_futures.append(
+                self._eval_images_saving_pool.submit(
+                    save_image,
+                    eval_image,
+                    os.path.join(
+                        eval_images_save_path,
+                        f"{image_name_prefix}_{n}_{self.global_rank}.png",
+                    ),
+                    normalize=True,
+                )
+            )
+
+    def _wait_for_eval_images_saving(self) -> None:
+        """
+        Wait until all the evaluation images submitted for saving are written,
+        re-raising any error that occurred while saving them.
+        """
+        for future in self._eval_images_saving_futures:
+            future.result()
+        self._eval_images_saving_futures.clear()
+
+    def on_train_end(self) -> None:
+        if self._eval_images_saving_pool is not None:
+            self._wait_for_eval_images_saving()
+            self._eval_images_saving_pool.shutdown()
+            self._eval_images_saving_pool = None
+
+
+class _RunningMean:
+    """
+    Running mean of a tracked value, accumulated on the device. Used instead of
+    `torchmetrics.MeanMetric`, which checks the values for NaNs on the host at
+    every update, forcing a device synchronization.
+    """
+
+    def __init__(self, device: torch.device) -> None:
+        self.total = torch.zeros((), dtype=torch.float32, device=device)
+        self.count = torch.zeros((), dtype=torch.float32, device=device)
+
+    def update(self, value: torch.Tensor) -> None:
+        self.total += value.sum().float()
+        self.count += value.numel()
+
+    def state(self) -> torch.Tensor:
+        return torch.stack([self.total, self.count])
@@ -1,17 +1,18 @@
+import importlib
+
 from gandlf_synth.models.modules.module_abc import SynthesisModule
-from gandlf_synth.models.modules.dcgan_module import UnlabeledDCGANModule
-from gandlf_synth.models.modules.vqvae_module import UnlabeledVQVAEModule
-from gandlf_synth.models.modules.ddpm_module import UnlabeledDDPMModule
 from gandlf_synth.models.configs.config_abc import AbstractModelConfig
 
 from typing import Type, Optional, Dict, List, Callable
 
 
 class ModuleFactory:
+    # the modules are imported only when selected, as their dependencies are heavy
     AVAILABE_MODULES = {
-        "unlabeled_dcgan": UnlabeledDCGANModule,
-        "unlabeled_vqvae": UnlabeledVQVAEModule,
-        "unlabeled_ddpm": UnlabeledDDPMModule,
+        "unlabeled_dcgan": "gandlf_synth.models.modules.dcgan_module.UnlabeledDCGANModule",
+        "unlabeled_vqvae": "gandlf_synth.models.modules.vqvae_module.UnlabeledVQVAEModule",
+        "unlabeled_ddpm": "gandlf_synth.models.modules.ddpm_module.UnlabeledDDPMModule",
+        "unlabeled_latent_ddpm": "gandlf_synth.models.modules.latent_ddpm_module.UnlabeledLatentDDPMModule",
     }
     """
     Class responsible for creating modules.
@@ -52,10 +53,15 @@ class ModuleFactory:
         labeling_paradigm = self.model_config.labeling_paradigm
         return f"{labeling_paradigm}_{model_name}"
 
-    def get_module(self) -> Type[SynthesisModule]:
+    def get_module(self, skip_weights_init: bool = False) -> Type[SynthesisModule]:
         """
         Method to get the module based on the model config.
 
+        Args:
+            skip_weights_init (bool, optional): Whether to build the model on the meta
+        device, to restore its weights from a checkpoint afterwards with
+        `load_weights_from_checkpoint`. Defaults to False.
+
         Returns:
             Module (SynthesisModule): The synthesis module object.
         """
@@ -65,9 +71,12 @@ class ModuleFactory:
             f"Module {module_name} not found. "
             f"Available modules: {self.AVAILABE_MODULES.keys()}"
         )
-        return self.AVAILABE_MODULES[module_name](
+        import_path, class_name = self.AVAILABE_MODULES[module_name].rsplit(".", 1)
+        module_class = getattr(importlib.import_module(import_path), class_name)
+        return module_class(
             model_config=self.model_config,
             model_dir=self.model_dir,
             metric_calculator=self.metric_calculator,
             postprocessing_transforms=self.postprocessing_transforms,
+            skip_weights_init=skip_weights_init,
         )
@@ -1,5 +1,6 @@
 import torch
 from torch import nn
+from torchmetrics import Metric
 
 from gandlf_synth.models.architectures.base_model import ModelBase
 from gandlf_synth.models.architectures.vqvae import VQVAE
@@ -9,59 +10,78 @@ from gandlf_synth.losses import get_loss
 from gandlf_synth.schedulers import get_scheduler
 
 
-from typing import Dict, Union
+from typing import Dict, Union, List
 
 
 class UnlabeledVQVAEModule(SynthesisModule):
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
-        # TODO how to display the predict metrics/results? It cannot be logged
-        self.phase_loss_lists = {"train": [], "val": [], "test": [], "predict": []}
-        self.phase_metric_lists = {"train": [], "val": [], "test": [], "predict": []}
+        # the first training images are kept on the device and reconstructed
+        # as the evaluation images at the end of the training epochs
+        self._fixed_images: List[torch.Tensor] = []
+        self._n_fixed_images = 0
+
+    def _cache_fixed_images(self, x: torch.Tensor) -> None:
+        """
+        Keep the training images until `n_fixed_images_to_generate` are collected.
+
+        Args:
+            x (torch.Tensor): The batch of training images.
+        """
+        n_missing_images = (
+            self.model_config.n_fixed_images_to_generate - self._n_fixed_images
+        )
+        if n_missing_images > 0:
+            self._fixed_images.append(x[:n_missing_images].detach().clone())
+            self._n_fixed_images += self._fixed_images[-1].shape[0]
 
     def _calculate_and_log_metrics(
-        self, recon_images: torch.Tensor, x: torch.Tensor, phase: str
+        self, recon_images: torch.Tensor, x: torch.Tensor, phase: str, batch_idx: int
     ):
         metric_result = {}
         for metric_name, metric in self.metric_calculator.items():
+            # epoch-level metrics are accumulated only in validation and test
+            if isinstance(metric, Metric):
+                continue
             if phase != "train":
                 metric_name = f"{phase}_{metric_name}"
             metric_result[metric_name] = metric(recon_images, x)
-        self.phase_metric_lists[phase].append(metric_result)
-        if phase != "predict":
-            self._step_log(metric_result)
+        self._track_values(metric_result, phase, batch_idx)
+        if phase in ["val", "test"]:
+            self._update_epoch_metrics(recon_images, x)
 
-    def _common_step(self, batch: object, phase: str) -> torch.Tensor:
+    def _common_step(self, batch: object, phase: str, batch_idx: int) -> torch.Tensor:
         x = batch
         recon_images, quantization_loss = self.model(x)
         reconstruction_loss = self.losses(recon_images, x)
         loss = reconstruction_loss + quantization_loss
-
-        loss_dict = {
-            "reconstruction_loss": reconstruction_loss.item(),
-            "quantization_loss": quantization_loss.item(),
-        }
-        self.phase_loss_lists[phase].append(loss_dict)
+        # TODO how to display the predict metrics/results? It cannot be logged
         if phase != "predict":
-            self._step_log(loss_dict)
-        if self.metric_calculator is not None:
-            self._calculate_and_log_metrics(recon_images, x, phase)
+            loss_dict = {
+                "reconstruction_loss": reconstruction_loss,
+                "quantization_loss": quantization_loss,
+            }
+            self._track_values(loss_dict, phase, batch_idx)
+            if self.metric_calculator is not None:
+                self._calculate_and_log_metrics(recon_images, x, phase, batch_idx)
 
         return loss, recon_images
 
     def training_step(self, batch: object, batch_idx: int) -> torch.Tensor:
-        loss, _ = self._common_step(batch, "train")
+        if self._eval_images_enabled():
+            self._cache_fixed_images(batch)
+        loss, _ = self._common_step(batch, "train", batch_idx)
         return loss
 
     def validation_step(self, batch: object, batch_idx: int) -> torch.Tensor:
-        loss, _ = self._common_step(batch, "val")
+        loss, _ = self._common_step(batch, "val", batch_idx)
         return loss
 
     def test_step(self, batch: object, batch_idx: int) -> torch.Tensor:
-        self._common_step(batch, "test")
+        self._common_step(batch, "test", batch_idx)
 
     def predict_step(self, batch, batch_idx) -> torch.Tensor:
-        _, recon_images = self._common_step(batch, "predict")
+        _, recon_images = self._common_step(batch, "predict", batch_idx)
 
         if self.postprocessing_transforms is not None:
             for transform in self.postprocessing_transforms:
@@ -69,17 +89,31 @@ class UnlabeledVQVAEModule(SynthesisModule):
 
         return recon_images
 
+    def _generate_eval_images(self) -> List[torch.Tensor]:
+        """
+        Reconstruct the fixed training images, in batches of `n_fixed_images_batch_size`.
+
+        Returns:
+            List[torch.Tensor]: The batches of the input and reconstructed image pairs,
+        each pair is saved side by side.
+        """
+        return [
+            torch.stack([x, self.model(x)[0]], dim=1)
+            for x in torch.split(
+                torch.cat(self._fixed_images),
+                self.model_config.n_fixed_images_batch_size,
+            )
+        ]
+
     def on_train_epoch_end(self) -> None:
-        self._epoch_log(self.phase_loss_lists["train"])
-        self._epoch_log(self.phase_metric_lists["train"])
+        self._epoch_log("train")
+        self._save_eval_images("reconstruction")
 
     def on_validation_epoch_end(self) -> None:
-        self._epoch_log(self.phase_loss_lists["val"])
-        self._epoch_log(self.phase_metric_lists["val"])
+        self._epoch_log("val")
 
     def on_test_epoch_end(self) -> None:
-        self._epoch_log(self.phase_loss_lists["test"])
-        self._epoch_log(self.phase_metric_lists["test"])
+        self._epoch_log("test")
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         return self.model(x)
@@ -13,6 +13,7 @@ MODEL_PARAMETER_DEFAULTS = {
     "accumulate_grad_batches": 1,  # number of batches to accumulate gradients
     "gradient_clip_val": None,  # gradient clipping
     "gradient_clip_algorithm": "norm",  # gradient clipping mode, either "norm" or "value"
+    "log_every_n_steps": 1,  # interval (in steps) of writing the tracked values to the progress bar
     "patience": 0,  # number of epochs to wait for performance improvement
     "labeling_paradigm": "unlabeled",  # labeling paradigm
     "inference_parameters": {},  # inference parameters
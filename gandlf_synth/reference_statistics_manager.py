@@ -0,0 +1,191 @@
+import os
+import json
+import hashlib
+
+import torch
+import pandas as pd
+from torch.utils.data import DataLoader
+
+from gandlf_synth.models.configs.config_abc import AbstractModelConfig
+from gandlf_synth.data.datasets_factory import InferenceDatasetFactory
+from gandlf_synth.utils.managers_utils import prepare_logger, get_inference_batch_size
+from gandlf_synth.to_port_to_gandlf_core.metrics.synthesis import (
+    StreamingFrechetInceptionDistance,
+)
+
+from typing import Type
+
+
+class ReferenceStatisticsManager:
+    LOGGER_NAME = "reference_statistics_manager"
+    # size of the chunks in which the image files are read for hashing
+    HASHING_CHUNK_SIZE = 2**20
+
+    """
+    Class to manage the computation of the reference statistics of a dataset,
+    i.e. the InceptionV3 features of the real images used by FID. The features
+    are computed once per dataset and feature size and saved under a key derived
+    from the content of the images and the preprocessing, so evaluating a new
+    checkpoint only requires the feature extraction of the generated images.
+    """
+
+    def __init__(
+        self,
+        global_config: dict,
+        model_config: Type[AbstractModelConfig],
+        output_dir: str,
+        dataframe: pd.DataFrame,
+        features_size: int = 2048,
+    ) -> None:
+        """
+        Initialize the ReferenceStatisticsManager.
+
+        Args:
+            global_config (dict): The global configuration dictionary.
+            model_config (Type[AbstractModelConfig]): The model configuration class.
+            output_dir (str): The directory where the reference statistics will be saved.
+            dataframe (pd.DataFrame): The dataframe with the reference images.
+            features_size (int, optional): The InceptionV3 feature layer, one of 64, 192,
+        768, 2048. Defaults to 2048.
+        """
+        assert (
+            model_config.n_dimensions == 2
+        ), "Reference statistics are only supported for 2D images."
+        self.global_config = global_config
+        self.model_config = model_config
+        self.output_dir = output_dir
+        self.dataframe = dataframe.reset_index(drop=True)
+        self.features_size = features_size
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.logger = prepare_logger(self.LOGGER_NAME, self.output_dir)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    def _hash_file(self, file_path: str) -> str:
+        """
+        Compute the hash of the content of a single file.
+
+        Args:
+            file_path (str): The path to the file.
+
+        Returns:
+            str: The hex digest of the file content.
+        """
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(self.HASHING_CHUNK_SIZE), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def compute_content_hash(self) -> str:
+        """
+        Compute the key of the reference statistics. It depends on the content of
+        the images (not on their paths nor order in the CSV), the preprocessing
+        and the feature extractor.
+
+        Returns:
+            str: The hex digest identifying the reference statistics.
+        """
+        channel_columns = sorted(
+            col for col in self.dataframe.columns if "Channel_" in col
+        )
+        sample_digests = sorted(
+            "".join(self._hash_file(str(row[col])) for col in channel_columns)
+            for _, row in self.dataframe.iterrows()
+        )
+        content_hash = hashlib.sha256()
+        for sample_digest in sample_digests:
+            content_hash.update(sample_digest.encode())
+        content_hash.update(
+            json.dumps(
+                {
+                    "features_size": self.features_size,
+                    "n_channels": self.model_config.n_channels,
+                    "tensor_shape": list(self.model_config.tensor_shape),
+                    "data_preprocessing": self.global_config.get("data_preprocessing"),
+                },
+                sort_keys=True,
+                default=str,
+            ).encode()
+        )
+        return content_hash.hexdigest()
+
+    def get_reference_statistics_path(self, content_hash: str) -> str:
+        """
+        Get the path of the reference statistics with the given key.
+
+        Args:
+            content_hash (str): The key of the reference statistics.
+
+        Returns:
+            str: The path to the reference statistics.
+        """
+        return os.path.join(
+            self.output_dir, f"fid_reference_{self.features_size}_{content_hash}.pt"
+        )
+
+    def _prepare_dataloader(self) -> DataLoader:
+        """
+        Prepare the dataloader of the reference images.
+
+        Returns:
+            torch.utils.data.DataLoader: The dataloader of the reference images.
+        """
+        dataset = InferenceDatasetFactory(
+            global_config=self.global_config,
+            model_config=self.model_config,
+            dataframe_reconstruction=self.dataframe,
+        ).get_inference_dataset()
+        dataloader_config = dict(self.global_config["dataloader_config"]["inference"])
+        dataloader_config["shuffle"] = False
+        batch_size = get_inference_batch_size(self.global_config)
+        return DataLoader(dataset=dataset, batch_size=batch_size, **dataloader_config)
+
+    def run_computation(self) -> str:
+        """
+        Compute and save the features of the reference images, unless the reference
+        statistics with the same key already exist.
+
+        Returns:
+            str: The path to the reference statistics.
+        """
+        content_hash = self.compute_content_hash()
+        reference_statistics_path = self.get_reference_statistics_path(content_hash)
+        if os.path.exists(reference_statistics_path):
+            self.logger.info(
+                f"Reference statistics already computed, found in {reference_statistics_path}."
+            )
+            return reference_statistics_path
+
+        fid_metric = StreamingFrechetInceptionDistance(
+            {
+                "model": {
+                    "dimension": self.model_config.n_dimensions,
+                    "num_channels": self.model_config.n_channels,
+                },
+                "metrics_config": {"fid": {"features_size": self.features_size}},
+            }
+        ).to(self.device)
+        features = []
+        with torch.no_grad():
+            for batch in self._prepare_dataloader():
+                # labeled datasets also return the labels, which are not used
+                images = batch[0] if isinstance(batch, (list, tuple)) else batch
+                features.append(
+                    fid_metric.extract_features(images.to(self.device)).cpu()
+                )
+        features = torch.cat(features)
+        torch.save(
+            {
+                "features": features,
+                "features_size": self.features_size,
+                "n_channels": self.model_config.n_channels,
+                "n_samples": features.shape[0],
+                "content_hash": content_hash,
+            },
+            reference_statistics_path,
+        )
+        self.logger.info(
+            f"Computed reference features of {features.shape[0]} images, "
+            f"saved to {reference_statistics_path}."
+        )
+        return reference_statistics_path
@@ -3,12 +3,19 @@ import SimpleITK as sitk
 import PIL.Image
 import numpy as np
 import torch
-from torchmetrics import StructuralSimilarityIndexMeasure
+from torchmetrics import Metric
 from GANDLF.utils import get_image_from_tensor
 import warnings
 from typing import Any, Dict, Tuple
+from torchmetrics.utilities.data import dim_zero_cat
 from .utils.lpip import LPIPSGandlf
-from .utils.fid import FrechetInceptionDistance
+from .utils.fid import FrechetInceptionDistance, NoTrainInceptionV3
+from .utils.inception_features import compute_kid, compute_precision_recall
+from .utils.functional import (
+    MS_SSIM_BETAS,
+    structural_similarity,
+    multiscale_structural_similarity,
+)
 
 
 def _structural_similarity_index_measure(
@@ -16,8 +23,8 @@ def _structural_similarity_index_measure(
 ) -> torch.Tensor:
     """
     This function computes the SSIM between the generated images and the real
-    images. Except for the params specified below, the rest of the params are
-    default from torchmetrics. Works both for 2D and 3D images.
+    images, with an 11-voxel Gaussian window and the data range of the inputs.
+    Works natively both for 2D and 3D images.
 
     Args:
         generated_images (torch.Tensor): The generated images.
@@ -56,219 +63,683 @@ def _structural_similarity_index_measure(
         )
         reduction = "elementwise_mean"
 
-    if params["model"]["dimension"] == 2:
-        real_images = real_images.squeeze(-1)
-    ssim = StructuralSimilarityIndexMeasure(reduction=reduction)  # type: ignore
-    return ssim(generated_images, real_images)
+    return structural_similarity(generated_images, real_images, reduction=reduction)
 
 
-def _ferechet_inception_distance(
-    generated_images: torch.Tensor, real_images: torch.Tensor, params: Dict[str, Any]
-) -> torch.Tensor:
+class StreamingStructuralSimilarity(Metric):
+    """
+    SSIM accumulated over the batches passed to `update`, computed natively for 2D
+    and 3D images with a separable Gaussian window. Configurable with `window_size`
+    (default 11), `sigma` (default 1.5), `data_range` (default the range of every
+    batch), `k1`, `k2` and `reduction` over the samples (elementwise_mean or sum).
     """
-    This function computes the FID between the generated images and the
-    real images. Except for the params specified below, the rest of the params
-    are default from torchmetrics.
 
-    Args:
-        generated_images (torch.Tensor): The generated images.
-        real_images (torch.Tensor): The real images.
-        params (dict): The parameter dictionary containing training and data information.
+    is_differentiable: bool = False
+    higher_is_better: bool = True
+    full_state_update: bool = False
+    # name of the metric in the `metrics_config`
+    metric_name: str = "ssim"
 
-    Returns:
-        torch.Tensor: The FID score.
+    def __init__(self, params: Dict[str, Any], **kwargs: Any) -> None:
+        """
+        Initialize the metric.
+
+        Args:
+            params (dict): The parameter dictionary containing training and data information.
+            kwargs: Additional keyword arguments of `torchmetrics.Metric`.
+        """
+        super().__init__(**kwargs)
+        self.metric_config = params.get("metrics_config", {}).get(self.metric_name, {})
+        self.reduction = self.metric_config.get("reduction", "elementwise_mean")
+        assert self.reduction in (
+            "elementwise_mean",
+            "sum",
+        ), f"Invalid reduction: {self.reduction}, expected one of elementwise_mean, sum"
+        self.ssim_kwargs = {
+            argument: self.metric_config[argument]
+            for argument in ("window_size", "sigma", "data_range", "k1", "k2")
+            if argument in self.metric_config
+        }
+        self.add_state(
+            "sum_scores", torch.tensor(0.0, dtype=torch.float64), dist_reduce_fx="sum"
+        )
+        self.add_state("total", torch.tensor(0), dist_reduce_fx="sum")
+
+    def _compute_scores(
+        self, generated_images: torch.Tensor, real_images: torch.Tensor
+    ) -> torch.Tensor:
+        """
+        Compute the per-sample scores of a batch.
+
+        Args:
+            generated_images (torch.Tensor): The generated images.
+            real_images (torch.Tensor): The real images.
+
+        Returns:
+            torch.Tensor: The scores of shape (batch_size,).
+        """
+        return structural_similarity(
+            generated_images, real_images, reduction="none", **self.ssim_kwargs
+        )
+
+    def update(self, generated_images: torch.Tensor, real_images: torch.Tensor) -> None:
+        """
+        Update the state with the scores of a batch of generated and real images.
+
+        Args:
+            generated_images (torch.Tensor): The generated images.
+            real_images (torch.Tensor): The real images.
+        """
+        scores = self._compute_scores(generated_images, real_images)
+        self.sum_scores += scores.sum().double()
+        self.total += scores.numel()
+
+    def compute(self) -> torch.Tensor:
+        """
+        Compute the final score.
+
+        Returns:
+            torch.Tensor: The mean or the sum of the scores of all the samples.
+        """
+        if self.reduction == "sum":
+            return self.sum_scores.float()
+        return (self.sum_scores / self.total).float()
+
+
+class StreamingMultiScaleStructuralSimilarity(StreamingStructuralSimilarity):
+    """
+    MS-SSIM accumulated over the batches passed to `update`, for 2D and 3D images.
+    Accepts the options of `StreamingStructuralSimilarity` and `betas`, the weights
+    of the scales (default the 5 weights of the original paper). The images need at
+    least (window_size - 1) * 2^(scales - 1) + 1 voxels along every axis.
     """
-    assert (generated_images.dim() == 4) and (real_images.dim() == 4), (
-        "FID is only supported for 2D images. "
-        "The input images should be of shape (batch_size, channels, height, width)."
-        f"Got generated_images of shape {generated_images.shape} and real_images of shape {real_images.shape}"
-    )
 
-    def _get_features_size(params: Dict[str, Any]) -> int:
+    metric_name = "ms_ssim"
+
+    def _compute_scores(
+        self, generated_images: torch.Tensor, real_images: torch.Tensor
+    ) -> torch.Tensor:
         """
-        This function returns the feature size for FID from config.
+        Compute the per-sample scores of a batch.
 
         Args:
-            params (dict): The parameter dictionary containing training and data information.
+            generated_images (torch.Tensor): The generated images.
+            real_images (torch.Tensor): The real images.
 
         Returns:
-            int: The feature size.
+            torch.Tensor: The scores of shape (batch_size,).
         """
-        # check if metrics have config
-        if "metrics_config" in params:
-            # check if fid has config
-            if "fid" in params["metrics_config"]:
-                # check if features_size is present
-                if "features_size" in params["metrics_config"]["fid"]:
-                    return params["metrics_config"]["fid"]["features_size"]
-        return 2048
+        return multiscale_structural_similarity(
+            generated_images,
+            real_images,
+            betas=self.metric_config.get("betas", MS_SSIM_BETAS),
+            reduction="none",
+            **self.ssim_kwargs,
+        )
 
-    assert params["model"]["dimension"] == 2, "FID is only supported for 2D images"
 
-    assert params["batch_size"] > 1, "FID is not supported for batch size 1"
-    real_images = real_images.squeeze(-1)
+def _get_fid_features_size(params: Dict[str, Any]) -> int:
+    """
+    This function returns the feature size for FID from config.
 
-    features_size = _get_features_size(params)
-    fid_metric = FrechetInceptionDistance(feature=features_size, normalize=True)
-    n_input_channels = params["model"]["num_channels"]
-    if n_input_channels == 1:
-        # need manual patching for single channel data
-        fid_metric.get_submodule("inception")._modules["Conv2d_1a_3x3"]._modules[
-            "conv"
-        ] = torch.nn.Conv2d(1, 32, kernel_size=(3, 3), stride=(2, 2), bias=False)
-    # check input dtype
-    if generated_images.dtype != torch.float32:
-        generated_images = generated_images.float()
-    if real_images.dtype != torch.float32:
-        real_images = real_images.float()
-    if generated_images.max() > 1:
-        warnings.warn(
-            "Input generated images are not in [0, 1] range. "
-            "This may lead to incorrect results. "
-            "FID expects input images to be in [0, 1] range."
-            "Dividing the images by 255 for metric calculation.",
-            UserWarning,
+    Args:
+        params (dict): The parameter dictionary containing training and data information.
+
+    Returns:
+        int: The feature size.
+    """
+    # check if metrics have config
+    if "metrics_config" in params:
+        # check if fid has config
+        if "fid" in params["metrics_config"]:
+            # check if features_size is present
+            if "features_size" in params["metrics_config"]["fid"]:
+                return params["metrics_config"]["fid"]["features_size"]
+    return 2048
+
+
+# feature extractors shared by all the metrics based on InceptionV3 features (FID, KID,
+# precision and recall), keyed by (features_size, n_input_channels)
+_INCEPTION_FEATURE_EXTRACTORS: Dict[Tuple[int, int], NoTrainInceptionV3] = {}
+
+
+def _get_inception_feature_extractor(
+    features_size: int, n_input_channels: int
+) -> NoTrainInceptionV3:
+    """
+    This function returns the InceptionV3 feature extractor. The weights are
+    loaded only once per process, the extractor is then shared by all the metrics
+    with the same feature size and number of input channels.
+
+    Args:
+        features_size (int): The feature size, one of 64, 192, 768, 2048.
+        n_input_channels (int): The number of input channels.
+
+    Returns:
+        NoTrainInceptionV3: The feature extractor.
+    """
+    extractor_key = (features_size, n_input_channels)
+    if extractor_key not in _INCEPTION_FEATURE_EXTRACTORS:
+        feature_extractor = NoTrainInceptionV3(
+            name="inception-v3-compat", features_list=[str(features_size)]
         )
-        generated_images = generated_images / 255.0
-    if real_images.max() > 1:
+        if n_input_channels == 1:
+            # need manual patching for single channel data, the pretrained RGB
+            # filters are summed so the features are the same in all the processes
+            input_conv = feature_extractor.Conv2d_1a_3x3.conv
+            single_channel_conv = torch.nn.Conv2d(
+                1, 32, kernel_size=(3, 3), stride=(2, 2), bias=False
+            )
+            single_channel_conv.weight.data.copy_(
+                input_conv.weight.data.sum(dim=1, keepdim=True)
+            )
+            single_channel_conv.requires_grad_(False)
+            feature_extractor.Conv2d_1a_3x3.conv = single_channel_conv
+        # avoids the dummy forward pass of 3-channel images in `FrechetInceptionDistance`
+        feature_extractor.num_features = features_size
+        _INCEPTION_FEATURE_EXTRACTORS[extractor_key] = feature_extractor
+    return _INCEPTION_FEATURE_EXTRACTORS[extractor_key]
+
+
+def _prepare_fid_images(images: torch.Tensor, images_type: str) -> torch.Tensor:
+    """
+    This function ensures that the input images are in the correct scale
+    and dtype for the FID calculation.
+
+    Args:
+        images (torch.Tensor): The input images.
+        images_type (str): The type of the images (generated, real), used in the warnings.
+
+    Returns:
+        torch.Tensor: The scaled and dtype corrected images.
+    """
+    if images.dim() == 5:
+        images = images.squeeze(-1)
+    if images.dtype != torch.float32:
+        images = images.float()
+    if images.max() > 1:
         warnings.warn(
-            "Input real images are not in [0, 1] range. "
+            f"Input {images_type} images are not in [0, 1] range. "
             "This may lead to incorrect results. "
             "FID expects input images to be in [0, 1] range."
             "Dividing the images by 255 for metric calculation.",
             UserWarning,
         )
-        real_images = real_images / 255.0
-    if generated_images.shape[0] == 1 or real_images.shape[0] == 1:
-        warnings.warn(
-            "FID is not supported for batch size 1. "
-            "The metric will not be computed for this batch.",
-            UserWarning,
-        )
-        return torch.tensor([0.0])
+        images = images / 255.0
+    return images.clamp(0.0, 1.0)
 
-    fid_metric.update(generated_images, real=False)
-    fid_metric.update(real_images, real=True)
-    metric_value = fid_metric.compute()
-    return metric_value
 
+def _extract_inception_features(
+    feature_extractor: NoTrainInceptionV3, images: torch.Tensor, images_type: str
+) -> torch.Tensor:
+    """
+    This function extracts the InceptionV3 features of a batch of images.
 
-def _learned_perceptual_image_patch_similarity(
-    generated_images: torch.Tensor, real_images: torch.Tensor, params: Dict[str, Any]
+    Args:
+        feature_extractor (NoTrainInceptionV3): The feature extractor.
+        images (torch.Tensor): The images.
+        images_type (str): The type of the images (generated, real), used in the warnings.
+
+    Returns:
+        torch.Tensor: The features, of shape (batch_size, features_size).
+    """
+    images = _prepare_fid_images(images, images_type)
+    return feature_extractor((images * 255).byte())
+
+
+def _get_fid_reference_statistics_path(params: Dict[str, Any]) -> Optional[str]:
+    """
+    This function returns the path to the precomputed reference statistics
+    of the real images for FID from config.
+
+    Args:
+        params (dict): The parameter dictionary containing training and data information.
+
+    Returns:
+        Optional[str]: The path to the reference statistics, None if not given.
+    """
+    if "metrics_config" in params:
+        if "fid" in params["metrics_config"]:
+            return params["metrics_config"]["fid"].get("reference_statistics")
+    return None
+
+
+def load_fid_reference_features(
+    reference_statistics_path: str, features_size: int, n_input_channels: int
 ) -> torch.Tensor:
     """
-    This function computes the LPIPS between the generated images and the
-    real images. Except for the params specified below, the rest of the params
-    are default from torchmetrics.
+    This function loads the features of the real images saved by the
+    `compute-reference-stats` command, checking that they were extracted
+    with the same feature extractor.
 
     Args:
-        generated_images (torch.Tensor): The generated images.
-        real_images (torch.Tensor): The real images.
-        n_input_channels (int): The number of input channels.
-        n_dim (int): The number of dimensions.
-        net_type (Literal["alex", "squeeze", "vgg"], optional): The network type.
-    Defaults to "squeeze".
-        reduction (Literal["mean", "sum"], optional): The reduction type.
-    Defaults to "mean".
-        converter_type (Literal["soft", "acs", "conv3d], optional): The converter
-    type from ACS. Defaults to "soft".
+        reference_statistics_path (str): The path to the reference statistics.
+        features_size (int): The expected feature size.
+        n_input_channels (int): The expected number of input channels.
 
     Returns:
-        torch.Tensor: The LPIP score.
+        torch.Tensor: The features of the real images, of shape (N, features_size).
+    """
+    reference_statistics = torch.load(reference_statistics_path, map_location="cpu")
+    assert (
+        reference_statistics["features_size"] == features_size
+        and reference_statistics["n_channels"] == n_input_channels
+    ), (
+        f"Reference statistics in {reference_statistics_path} were computed for "
+        f"features size {reference_statistics['features_size']} and "
+        f"{reference_statistics['n_channels']} channels, expected features size "
+        f"{features_size} and {n_input_channels} channels."
+    )
+    return reference_statistics["features"]
+
+
+class StreamingFrechetInceptionDistance(FrechetInceptionDistance):
+    """
+    FID accumulated over whole epochs. The features of the generated and real
+    images are accumulated with `update` for every batch, and the FID is calculated
+    once with `compute`. The accumulated states are summed across the processes
+    when computing. The feature extractor is shared between the metric instances,
+    see `_get_inception_feature_extractor`. If `reference_statistics` is given in the
+    FID config, the real images passed to `update` are ignored and the precomputed
+    features are used instead.
     """
 
-    def _get_metric_params(params: Dict[str, Any]) -> Tuple[int, int, str, str, str]:
+    def __init__(self, params: Dict[str, Any], **kwargs: Any) -> None:
         """
-        This function returns the metric parameters from config.
+        Initialize the streaming FID metric.
 
         Args:
             params (dict): The parameter dictionary containing training and data information.
+            kwargs: Additional keyword arguments of `torchmetrics.Metric`.
+        """
+        assert params["model"]["dimension"] == 2, "FID is only supported for 2D images"
+        features_size = _get_fid_features_size(params)
+        n_input_channels = params["model"]["num_channels"]
+        super().__init__(
+            feature=_get_inception_feature_extractor(features_size, n_input_channels),
+            normalize=True,
+            **kwargs,
+        )
+        reference_statistics_path = _get_fid_reference_statistics_path(params)
+        if reference_statistics_path is not None:
+            self.set_reference_features(
+                load_fid_reference_features(
+                    reference_statistics_path, features_size, n_input_channels
+                )
+            )
+
+    def extract_features(
+        self, images: torch.Tensor, images_type: str = "real"
+    ) -> torch.Tensor:
+        """
+        Extract the features of a batch of images, without updating the state.
+
+        Args:
+            images (torch.Tensor): The images.
+            images_type (str): The type of the images (generated, real), used in the warnings.
 
         Returns:
-            Tuple[int, int, str, str, str]: The metric parameters,
-        namely n_input_channels, n_dim, net_type, reduction, converter_type.
+            torch.Tensor: The features, of shape (batch_size, features_size).
+        """
+        return _extract_inception_features(self.inception, images, images_type)
+
+    def update(self, generated_images: torch.Tensor, real_images: torch.Tensor) -> None:
+        """
+        Update the state with the features of a batch of generated and real images.
+        The real images are skipped if the reference features are used.
+
+        Args:
+            generated_images (torch.Tensor): The generated images.
+            real_images (torch.Tensor): The real images.
+        """
+        super().update(_prepare_fid_images(generated_images, "generated"), real=False)
+        if self.reference_features is None:
+            super().update(_prepare_fid_images(real_images, "real"), real=True)
+
+
+class _StreamingInceptionFeaturesMetric(Metric):
+    """
+    Base class of the metrics computed from the InceptionV3 features of whole sets
+    of generated and real images. The features are accumulated with `update` for
+    every batch and gathered from all the processes when computing. The feature
+    extractor is shared with FID. If `reference_statistics` is given in the metric
+    config, the precomputed features of the real images are used instead of the
+    real images passed to `update`.
+    """
+
+    is_differentiable: bool = False
+    full_state_update: bool = False
+    # name of the metric in the `metrics_config`
+    metric_name: str
+
+    def __init__(self, params: Dict[str, Any], **kwargs: Any) -> None:
         """
+        Initialize the metric.
+
+        Args:
+            params (dict): The parameter dictionary containing training and data information.
+            kwargs: Additional keyword arguments of `torchmetrics.Metric`.
+        """
+        super().__init__(**kwargs)
+        assert (
+            params["model"]["dimension"] == 2
+        ), f"{self.metric_name} is only supported for 2D images"
+        self.metric_config = params.get("metrics_config", {}).get(self.metric_name, {})
+        features_size = self.metric_config.get("features_size", 2048)
         n_input_channels = params["model"]["num_channels"]
-        n_dim = params["model"]["dimension"]
-        if "metrics_config" in params:
-            if "lpips" in params["metrics_config"]:
-                net_type = (
-                    params["metrics_config"]["lpips"]["net_type"]
-                    if "net_type" in params["metrics_config"]["lpips"]
-                    else "squeeze"
-                )
-                reduction = (
-                    params["metrics_config"]["lpips"]["reduction"]
-                    if "reduction" in params["metrics_config"]["lpips"]
-                    else "mean"
-                )
-                converter_type = (
-                    params["metrics_config"]["lpips"]["converter_type"]
-                    if "converter_type" in params["metrics_config"]["lpips"]
-                    else "soft"
+        self.inception = _get_inception_feature_extractor(
+            features_size, n_input_channels
+        )
+        # memory budget (in elements) of the distance or kernel matrices computed at once
+        self.max_distance_matrix_elements = self.metric_config.get(
+            "max_distance_matrix_elements", 2**24
+        )
+        self.add_state("real_features", [], dist_reduce_fx="cat")
+        self.add_state("fake_features", [], dist_reduce_fx="cat")
+        self.register_buffer("reference_features", None, persistent=False)
+        reference_statistics_path = self.metric_config.get("reference_statistics")
+        if reference_statistics_path is not None:
+            self.set_reference_features(
+                load_fid_reference_features(
+                    reference_statistics_path, features_size, n_input_channels
                 )
-                return (n_input_channels, n_dim, net_type, reduction, converter_type)
-        return n_input_channels, n_dim, "squeeze", "mean", "soft"
+            )
 
-    def _ensure_proper_scale_and_dtype(images: torch.Tensor) -> torch.Tensor:
+    def set_reference_features(self, features: torch.Tensor) -> None:
         """
-        This function ensures that the input images are in the correct scale
-        and dtype for the metric calculation.
+        Use precomputed features of the real images instead of the ones accumulated
+        with `update`, as in `StreamingFrechetInceptionDistance`.
 
         Args:
-            images (torch.Tensor): The input images.
+            features (torch.Tensor): The features of the real images, of shape (N, d).
+        """
+        assert (
+            features.dim() == 2 and features.shape[0] >= 2
+        ), f"Expected reference features of shape (N, d) with N >= 2, got {tuple(features.shape)}."
+        self.reference_features = features.to(self.device)
 
-        Returns:
-            torch.Tensor: The scaled and dtype corrected images.
+    def update(self, generated_images: torch.Tensor, real_images: torch.Tensor) -> None:
         """
-        if images.dtype != torch.float32:
-            images = images.float()
-        # if images are in [-1, 1] range, scale to [0, 1]
-        if not torch.all((images >= 0) & (images <= 1)):
-            warnings.warn(
-                "Input images are not in [0, 1] range. "
-                "This may lead to incorrect results. "
-                "LPIPS expects input images to be in [0, 1] range."
-                "Performing min-max scaling for metric calculation.",
-                UserWarning,
+        Update the state with the features of a batch of generated and real images.
+        The real images are skipped if the reference features are used.
+
+        Args:
+            generated_images (torch.Tensor): The generated images.
+            real_images (torch.Tensor): The real images.
+        """
+        self.fake_features.append(
+            _extract_inception_features(self.inception, generated_images, "generated")
+        )
+        if self.reference_features is None:
+            self.real_features.append(
+                _extract_inception_features(self.inception, real_images, "real")
             )
-            images = (images - images.min()) / (images.max() - images.min())
-        return images
 
-    (n_input_channels, n_dim, net_type, reduction, converter_type) = _get_metric_params(
-        params
+    def _get_features(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Get the accumulated features of the real and generated images.
+
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor]: The real and generated features.
+        """
+        real_features = (
+            dim_zero_cat(self.real_features)
+            if self.reference_features is None
+            else self.reference_features
+        )
+        return real_features, dim_zero_cat(self.fake_features)
+
+
+class StreamingKernelInceptionDistance(_StreamingInceptionFeaturesMetric):
+    """
+    Kernel Inception Distance (KID), the unbiased MMD^2 estimate with the polynomial
+    kernel, averaged over random subsets of the features. Unlike FID, it is unbiased,
+    so it gives stable estimates from a few hundred samples. Configurable with
+    `subsets` (default 100), `subset_size` (default 1000, clipped to the number of
+    samples) and `seed` (default 42) of the subsets sampling.
+    """
+
+    higher_is_better: bool = False
+    metric_name = "kid"
+
+    def compute(self) -> Dict[str, torch.Tensor]:
+        """
+        Compute KID from the accumulated features.
+
+        Returns:
+            Dict[str, torch.Tensor]: The mean and standard deviation of KID over the subsets.
+        """
+        real_features, fake_features = self._get_features()
+        return compute_kid(
+            real_features,
+            fake_features,
+            subsets=self.metric_config.get("subsets", 100),
+            subset_size=self.metric_config.get("subset_size", 1000),
+            max_kernel_matrix_elements=self.max_distance_matrix_elements,
+            generator=torch.Generator().manual_seed(self.metric_config.get("seed", 42)),
+        )
+
+
+class StreamingPrecisionRecall(_StreamingInceptionFeaturesMetric):
+    """
+    Improved precision and recall (Kynkäänniemi et al., 2019), measuring the fidelity
+    and the diversity of the generated images separately. The manifolds are estimated
+    with the k-NN balls of the samples, `k` is configurable (default 3). The distances
+    are computed in chunks within `max_distance_matrix_elements`.
+    """
+
+    higher_is_better: bool = True
+    metric_name = "precision_recall"
+
+    def compute(self) -> Dict[str, torch.Tensor]:
+        """
+        Compute the precision and recall from the accumulated features.
+
+        Returns:
+            Dict[str, torch.Tensor]: The precision and recall.
+        """
+        real_features, fake_features = self._get_features()
+        return compute_precision_recall(
+            real_features,
+            fake_features,
+            k=self.metric_config.get("k", 3),
+            max_distance_matrix_elements=self.max_distance_matrix_elements,
+        )
+
+
+def _ferechet_inception_distance(
+    generated_images: torch.Tensor, real_images: torch.Tensor, params: Dict[str, Any]
+) -> torch.Tensor:
+    """
+    This function computes the FID between the generated images and the
+    real images. Except for the params specified below, the rest of the params
+    are default from torchmetrics. The FID is computed from a single batch, use
+    `StreamingFrechetInceptionDistance` to accumulate it over an epoch.
+
+    Args:
+        generated_images (torch.Tensor): The generated images.
+        real_images (torch.Tensor): The real images.
+        params (dict): The parameter dictionary containing training and data information.
+
+    Returns:
+        torch.Tensor: The FID score.
+    """
+    assert (generated_images.dim() == 4) and (real_images.dim() == 4), (
+        "FID is only supported for 2D images. "
+        "The input images should be of shape (batch_size, channels, height, width)."
+        f"Got generated_images of shape {generated_images.shape} and real_images of shape {real_images.shape}"
     )
-    if n_dim == 2:
-        real_images = real_images.squeeze(-1)
-    else:
+    assert params["batch_size"] > 1, "FID is not supported for batch size 1"
+    if generated_images.shape[0] == 1 or real_images.shape[0] == 1:
         warnings.warn(
-            "LPIPS was originally designed for 2D data. "
-            "Currently, the entire network will be modified to accept 3D "
-            "with ACS converter. (https://arxiv.org/abs/1911.10477)"
-            "Results need to be interpreted with caution.",
+            "FID is not supported for batch size 1. "
+            "The metric will not be computed for this batch.",
             UserWarning,
         )
-    if n_input_channels == 1:
+        return torch.tensor([0.0])
+
+    # single batch value, not synchronized between the processes
+    fid_metric = StreamingFrechetInceptionDistance(params, sync_on_compute=False)
+    fid_metric.to(generated_images.device)
+    fid_metric.update(generated_images, real_images)
+    return fid_metric.compute()
+
+
+def _get_lpips_params(params: Dict[str, Any]) -> Tuple[int, int, str, str, str]:
+    """
+    This function returns the LPIPS parameters from config.
+
+    Args:
+        params (dict): The parameter dictionary containing training and data information.
+
+    Returns:
+        Tuple[int, int, str, str, str]: The metric parameters,
+    namely n_input_channels, n_dim, net_type, reduction, converter_type.
+    """
+    n_input_channels = params["model"]["num_channels"]
+    n_dim = params["model"]["dimension"]
+    if "metrics_config" in params:
+        if "lpips" in params["metrics_config"]:
+            net_type = (
+                params["metrics_config"]["lpips"]["net_type"]
+                if "net_type" in params["metrics_config"]["lpips"]
+                else "squeeze"
+            )
+            reduction = (
+                params["metrics_config"]["lpips"]["reduction"]
+                if "reduction" in params["metrics_config"]["lpips"]
+                else "mean"
+            )
+            converter_type = (
+                params["metrics_config"]["lpips"]["converter_type"]
+                if "converter_type" in params["metrics_config"]["lpips"]
+                else "soft"
+            )
+            return (n_input_channels, n_dim, net_type, reduction, converter_type)
+    return n_input_channels, n_dim, "squeeze", "mean", "soft"
+
+
+def _prepare_lpips_images(images: torch.Tensor) -> torch.Tensor:
+    """
+    This function ensures that the input images are in the correct scale
+    and dtype for the LPIPS calculation.
+
+    Args:
+        images (torch.Tensor): The input images.
+
+    Returns:
+        torch.Tensor: The scaled and dtype corrected images.
+    """
+    if images.dtype != torch.float32:
+        images = images.float()
+    # if images are in [-1, 1] range, scale to [0, 1]
+    if not torch.all((images >= 0) & (images <= 1)):
         warnings.warn(
-            "LPIPS was designed for 3-channel images. "
-            "Currently, the input layer will be modified to accept single "
-            "channel images. Results need to be interpreted with caution.",
+            "Input images are not in [0, 1] range. "
+            "This may lead to incorrect results. "
+            "LPIPS expects input images to be in [0, 1] range."
+            "Performing min-max scaling for metric calculation.",
             UserWarning,
         )
-    lpips_metric = LPIPSGandlf(
-        net_type=net_type,  # type: ignore
-        normalize=True,
-        reduction=reduction,  # type: ignore
-        n_dim=n_dim,
-        n_channels=n_input_channels,
-        converter_type=converter_type,  # type: ignore
-    )
+        images = (images - images.min()) / (images.max() - images.min())
+    return images
+
 
-    # check input dtype
-    generated_images = _ensure_proper_scale_and_dtype(generated_images)
-    real_images = _ensure_proper_scale_and_dtype(real_images)
+class StreamingLearnedPerceptualImagePatchSimilarity(LPIPSGandlf):
+    """
+    LPIPS accumulated over the batches passed to `update`, taking the parameter
+    dictionary as the other epoch-level metrics. The network is shared by all
+    the LPIPS metrics of the process with the same configuration, so creating
+    the metric does not reload the pretrained weights.
+    """
 
-    return lpips_metric(generated_images, real_images)
+    def __init__(self, params: Dict[str, Any], **kwargs: Any) -> None:
+        """
+        Initialize the metric.
+
+        Args:
+            params (dict): The parameter dictionary containing training and data information.
+            kwargs: Additional keyword arguments of `torchmetrics.Metric`.
+        """
+        (
+            n_input_channels,
+            n_dim,
+            net_type,
+            reduction,
+            converter_type,
+        ) = _get_lpips_params(params)
+        if n_dim == 3:
+            warnings.warn(
+                "LPIPS was originally designed for 2D data. "
+                "Currently, the entire network will be modified to accept 3D "
+                "with ACS converter. (https://arxiv.org/abs/1911.10477)"
+                "Results need to be interpreted with caution.",
+                UserWarning,
+            )
+        if n_input_channels == 1:
+            warnings.warn(
+                "LPIPS was designed for 3-channel images. "
+                "Currently, the input layer will be modified to accept single "
+                "channel images. Results need to be interpreted with caution.",
+                UserWarning,
+            )
+        super().__init__(
+            net_type=net_type,  # type: ignore
+            normalize=True,
+            reduction=reduction,  # type: ignore
+            n_dim=n_dim,
+            n_channels=n_input_channels,
+            converter_type=converter_type,  # type: ignore
+            **kwargs,
+        )
+        self.n_dim = n_dim
+
+    def update(self, generated_images: torch.Tensor, real_images: torch.Tensor) -> None:
+        """
+        Update the state with the scores of a batch of generated and real images.
+
+        Args:
+            generated_images (torch.Tensor): The generated images.
+            real_images (torch.Tensor): The real images.
+        """
+        if self.n_dim == 2:
+            real_images = real_images.squeeze(-1)
+        super().update(
+            _prepare_lpips_images(generated_images), _prepare_lpips_images(real_images)
+        )
+
+
+def _learned_perceptual_image_patch_similarity(
+    generated_images: torch.Tensor, real_images: torch.Tensor, params: Dict[str, Any]
+) -> torch.Tensor:
+    """
+    This function computes the LPIPS between the generated images and the
+    real images. Except for the params specified below, the rest of the params
+    are default from torchmetrics. The LPIPS is computed from a single batch, use
+    `StreamingLearnedPerceptualImagePatchSimilarity` to accumulate it over an epoch.
+
+    Args:
+        generated_images (torch.Tensor): The generated images.
+        real_images (torch.Tensor): The real images.
+        n_input_channels (int): The number of input channels.
+        n_dim (int): The number of dimensions.
+        net_type (Literal["alex", "squeeze", "vgg"], optional): The network type.
+    Defaults to "squeeze".
+        reduction (Literal["mean", "sum"], optional): The reduction type.
+    Defaults to "mean".
+        converter_type (Literal["soft", "acs", "conv3d], optional): The converter
+    type from ACS. Defaults to "soft".
+
+    Returns:
+        torch.Tensor: The LPIP score.
+    """
+    # single batch value, not synchronized between the processes
+    lpips_metric = StreamingLearnedPerceptualImagePatchSimilarity(
+        params, sync_on_compute=False
+    )
+    lpips_metric.to(generated_images.device)
+    lpips_metric.update(generated_images, real_images)
+    return lpips_metric.compute()
 
 
 def fid(
@@ -374,6 +374,46 @@ class FrechetInceptionDistance(Metric):
         self.add_state(
             "fake_features_num_samples", torch.tensor(0).long(), dist_reduce_fx="sum"
         )
+        # precomputed features of the real images, see `set_reference_features`
+        self.register_buffer("reference_features", None, persistent=False)
+
+    def set_reference_features(self, features: Tensor) -> None:
+        """
+        Use precomputed features of the real images instead of the ones accumulated
+        with `update(..., real=True)`. The reference features are kept outside of the
+        metric states, so they are never reset nor reduced across processes, as with
+        ``reset_real_features=False``.
+
+        Args:
+            features (torch.Tensor): The features of the real images, of shape ``(N, d)``.
+        """
+        assert (
+            features.dim() == 2 and features.shape[0] >= 2
+        ), f"Expected reference features of shape (N, d) with N >= 2, got {tuple(features.shape)}."
+        self.reset_real_features = False
+        self.reference_features = features.to(self.real_features_sum.device)
+
+    def _get_real_statistics(self) -> Tuple[Tensor, Tensor, Tensor]:
+        """
+        Get the statistics of the real distribution, either from the reference
+        features or from the accumulated states.
+
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor, torch.Tensor]: The sum of the features,
+        the sum of their outer products and the number of samples.
+        """
+        if self.reference_features is None:
+            return (
+                self.real_features_sum,
+                self.real_features_cov_sum,
+                self.real_features_num_samples,
+            )
+        features = self.reference_features.double()
+        return (
+            features.sum(dim=0),
+            features.t().mm(features),
+            torch.tensor(features.shape[0], device=features.device),
+        )
 
     def update(self, imgs: Tensor, real: bool) -> None:
         """
@@ -408,22 +448,25 @@ class FrechetInceptionDistance(Metric):
         Returns:
             torch.Tensor: Frechet Inception Distance between the two distributions.
         """
+        (
+            real_features_sum,
+            real_features_cov_sum,
+            real_features_num_samples,
+        ) = self._get_real_statistics()
         assert (
-            self.real_features_num_samples < 2 or self.fake_features_num_samples < 2
+            real_features_num_samples >= 2 and self.fake_features_num_samples >= 2
         ), "More than one sample is required for both the real and fake distributed to compute FID"
 
-        mean_real = (self.real_features_sum / self.real_features_num_samples).unsqueeze(
-            0
-        )
+        mean_real = (real_features_sum / real_features_num_samples).unsqueeze(0)
         mean_fake = (self.fake_features_sum / self.fake_features_num_samples).unsqueeze(
             0
         )
 
         cov_real_num = (
-            self.real_features_cov_sum
-            - self.real_features_num_samples * mean_real.t().mm(mean_real)
+            real_features_cov_sum
+            - real_features_num_samples * mean_real.t().mm(mean_real)
         )
-        cov_real = cov_real_num / (self.real_features_num_samples - 1)
+        cov_real = cov_real_num / (real_features_num_samples - 1)
         cov_fake_num = (
             self.fake_features_cov_sum
             - self.fake_features_num_samples * mean_fake.t().mm(mean_fake)
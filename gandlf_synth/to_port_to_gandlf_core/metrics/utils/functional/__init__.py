@@ -4,5 +4,7 @@ from .lpips import (
     lpips_compute,
     lpips_update,
     modify_scaling_layer,
+    get_lpips_backbone,
     _NoTrainLpipsLPIPSGandlf,
 )
+from .ssim import MS_SSIM_BETAS, structural_similarity, multiscale_structural_similarity
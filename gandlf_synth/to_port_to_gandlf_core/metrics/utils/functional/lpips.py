@@ -1,4 +1,6 @@
 import os
+from copy import deepcopy
+
 import torch
 from torch import nn
 from torch import Tensor
@@ -10,7 +12,7 @@ from torchmetrics.functional.image.lpips import (
     NetLinLayer,
     ScalingLayer,
 )
-from typing import Tuple, Union, Literal, Optional, List
+from typing import Dict, Tuple, Union, Literal, Optional, List
 from acsconv.converters import ACSConverter, Conv3dConverter, SoftACSConverter
 
 
@@ -184,33 +186,28 @@ class _LPIPSGandlf(nn.Module):
             in0 = 2 * in0 - 1
             in1 = 2 * in1 - 1
 
-        # normalize input
-        in0_input, in1_input = self.scaling_layer(in0), self.scaling_layer(in1)
+        # both inputs go through the backbone in a single pass
+        n_images = in0.shape[0]
+        net_input = self.scaling_layer(torch.cat([in0, in1], dim=0))
 
         # resize input if needed
         if self.resize is not None:
-            in0_input = _resize_tensor(in0_input, size=self.resize)
-            in1_input = _resize_tensor(in1_input, size=self.resize)
+            net_input = _resize_tensor(net_input, size=self.resize)
         with torch.no_grad():
-            outs0, outs1 = self.net.forward(in0_input), self.net.forward(in1_input)
-            feats0, feats1, diffs = {}, {}, {}
-
-            for kk in range(self.L):
-                feats0[kk], feats1[kk] = _normalize_tensor(
-                    outs0[kk]
-                ), _normalize_tensor(outs1[kk])
-                diffs[kk] = (feats0[kk] - feats1[kk]) ** 2
+            outs = self.net.forward(net_input)
 
             res = []
             for kk in range(self.L):
+                feats0, feats1 = _normalize_tensor(outs[kk]).split(n_images)
+                diff = (feats0 - feats1) ** 2
                 if self.spatial:
                     res.append(
-                        _upsample(self.lins[kk](diffs[kk]), out_hw=tuple(in0.shape[2:]))
+                        _upsample(self.lins[kk](diff), out_hw=tuple(in0.shape[2:]))
                     )
                 else:
                     res.append(
                         _spatial_average(
-                            self.lins[kk](diffs[kk]), n_dims=self.n_dim, keep_dim=True
+                            self.lins[kk](diff), n_dims=self.n_dim, keep_dim=True
                         )
                     )
         val: Tensor = sum(res)  # type: ignore[assignment]
@@ -328,27 +325,37 @@ def modify_net_input(
 ) -> None:
     """
     Modify the input layer of the network to accept the correct number
-    of channels.
+    of channels. The filters of the new layer are the pretrained RGB filters
+    summed over their channels and split evenly between the input channels, so
+    the network is the same in all the processes and runs, and an image with
+    the same values in all its channels gets the features of the corresponding
+    gray RGB image.
 
     Args:
         net: network
         net_type: str indicating backbone network type to use. Choose
-    `'squeeze'`, not implemented for `alex` or `vgg`.
+    between `'alex'`, `'vgg'`, `'squeeze'`.
         n_channels: number of channels
     """
     if net_type == "squeeze":
-        net.net.slices._modules["0"]._modules["0"] = torch.nn.Conv2d(
-            n_channels, 64, kernel_size=(3, 3), stride=(2, 2)
-        )
-    elif net_type == "alex":
-        net.net._modules["slice1"]._modules["0"] = torch.nn.Conv2d(
-            n_channels, 64, kernel_size=(11, 11), stride=(4, 4)
-        )
-
-    elif net_type == "vgg":
-        net.net._modules["slice1"]._modules["0"] = torch.nn.Conv2d(
-            n_channels, 64, kernel_size=(3, 3), stride=(1, 1), padding=(1, 1)
+        input_block = net.net.slices._modules["0"]
+    else:
+        input_block = net.net._modules["slice1"]
+    rgb_conv = input_block._modules["0"]
+    input_conv = torch.nn.Conv2d(
+        n_channels,
+        rgb_conv.out_channels,
+        kernel_size=rgb_conv.kernel_size,
+        stride=rgb_conv.stride,
+        padding=rgb_conv.padding,
+    )
+    with torch.no_grad():
+        input_conv.weight.copy_(
+            rgb_conv.weight.sum(dim=1, keepdim=True).expand_as(input_conv.weight)
+            / n_channels
         )
+        input_conv.bias.copy_(rgb_conv.bias)
+    input_block._modules["0"] = input_conv
 
 
 def modify_scaling_layer(net: nn.Module) -> None:
@@ -363,6 +370,72 @@ def modify_scaling_layer(net: nn.Module) -> None:
         net.scaling_layer = nn.Identity()
 
 
+# backbones shared by all the LPIPS metrics of the process, keyed by
+# (net_type, n_channels, n_dim, converter_type, device, dtype)
+_LPIPS_BACKBONES: Dict[
+    Tuple[str, int, int, Optional[str], torch.device, torch.dtype],
+    _NoTrainLpipsLPIPSGandlf,
+] = {}
+
+
+def get_lpips_backbone(
+    net_type: Literal["alex", "vgg", "squeeze"] = "alex",
+    n_channels: int = 1,
+    n_dim: int = 2,
+    converter_type: Literal["soft", "acs", "conv3d"] = "soft",
+    device: Optional[Union[str, torch.device]] = None,
+    dtype: Optional[torch.dtype] = None,
+) -> _NoTrainLpipsLPIPSGandlf:
+    """
+    Get the LPIPS network for the given input. The pretrained weights are loaded
+    and the network is modified for the number of channels and dimensions only
+    once per process, the network is then shared by all the LPIPS metrics with
+    the same configuration. It is always in evaluation mode and without gradients.
+    A separate copy is kept for every device and dtype, so the shared networks
+    must never be moved nor cast by the callers.
+
+    Args:
+        net_type (Literal["alex", "vgg", "squeeze"], optional): backbone network type.
+    Defaults to "alex".
+        n_channels (int, optional): number of channels. Defaults to 1.
+        n_dim (int, optional): number of dimensions. Defaults to 2.
+        converter_type (Literal["soft", "acs", "conv3d"], optional): the converter type
+    used for 3D inputs, ignored for 2D. Defaults to "soft".
+        device (Union[str, torch.device], optional): the device of the network.
+    Defaults to the CPU.
+        dtype (torch.dtype, optional): the dtype of the network. Defaults to float32.
+
+    Returns:
+        _NoTrainLpipsLPIPSGandlf: the LPIPS network.
+    """
+    valid_net_type = ("vgg", "alex", "squeeze")
+    assert (
+        net_type in valid_net_type
+    ), f"Invalid net_type: {net_type}, expected one of {valid_net_type}"
+    config_key = (net_type, n_channels, n_dim, converter_type if n_dim == 3 else None)
+    base_key = config_key + (torch.device("cpu"), torch.float32)
+    backbone_key = config_key + (
+        torch.device("cpu") if device is None else torch.device(device),
+        torch.float32 if dtype is None else dtype,
+    )
+    if base_key not in _LPIPS_BACKBONES:
+        net = _NoTrainLpipsLPIPSGandlf(n_dim=n_dim, net=net_type)
+        if n_channels != 3:
+            modify_scaling_layer(net)
+            modify_net_input(net, net_type, n_channels)
+        if n_dim == 3:
+            modify_scaling_layer(net)
+            # the modules of the network are converted in place
+            determine_converter(converter_type)(net)
+        net.requires_grad_(False)
+        _LPIPS_BACKBONES[base_key] = net.eval()
+    if backbone_key not in _LPIPS_BACKBONES:
+        _LPIPS_BACKBONES[backbone_key] = deepcopy(_LPIPS_BACKBONES[base_key]).to(
+            device=backbone_key[-2], dtype=backbone_key[-1]
+        )
+    return _LPIPS_BACKBONES[backbone_key]
+
+
 def learned_perceptual_image_patch_similarity(
     img1: Tensor,
     img2: Tensor,
@@ -410,15 +483,8 @@ def learned_perceptual_image_patch_similarity(
         >>> learned_perceptual_image_patch_similarity(img1, img2, net_type='squeeze')
         tensor(0.1008, grad_fn=<DivBackward0>)
     """
-    net = _NoTrainLpipsLPIPSGandlf(n_dim=n_dim, net=net_type).to(
-        device=img1.device, dtype=img1.dtype
+    net = get_lpips_backbone(
+        net_type, n_channels, n_dim, converter_type, img1.device, img1.dtype
     )
-    if n_channels != 3:
-        modify_scaling_layer(net)
-        modify_net_input(net, net_type, n_channels)
-    if n_dim == 3:
-        modify_scaling_layer(net)
-        converter = determine_converter(converter_type)
-        net = converter(net)
     loss, total = lpips_update(img1, img2, net, normalize)
     return lpips_compute(loss.sum(), total, reduction)
@@ -0,0 +1,268 @@
+import torch
+import torch.nn.functional as F
+from torch import Tensor
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+# default weights of the scales of MS-SSIM (Wang et al., 2003)
+MS_SSIM_BETAS = (0.0448, 0.2856, 0.3001, 0.2363, 0.1333)
+
+# 1D Gaussian kernels shaped for every spatial axis, keyed by
+# (window_size, sigma, n_spatial_dims, device, dtype)
+_GAUSSIAN_KERNELS: Dict[
+    Tuple[int, float, int, torch.device, torch.dtype], List[Tensor]
+] = {}
+
+
+def _get_gaussian_kernels(
+    window_size: int,
+    sigma: float,
+    n_spatial_dims: int,
+    device: torch.device,
+    dtype: torch.dtype,
+) -> List[Tensor]:
+    """
+    Get the 1D Gaussian kernels of the separable filter, one per spatial axis,
+    shaped as (1, 1, window_size, 1, ...) with the window along the given axis.
+    The kernels are computed once per configuration and device.
+
+    Args:
+        window_size (int): The size of the window.
+        sigma (float): The standard deviation of the Gaussian.
+        n_spatial_dims (int): The number of spatial dimensions (2 or 3).
+        device (torch.device): The device of the kernels.
+        dtype (torch.dtype): The dtype of the kernels.
+
+    Returns:
+        List[torch.Tensor]: The kernels, one per spatial axis.
+    """
+    kernels_key = (window_size, sigma, n_spatial_dims, device, dtype)
+    if kernels_key not in _GAUSSIAN_KERNELS:
+        coords = torch.arange(window_size, dtype=torch.float64) - (window_size - 1) / 2
+        gaussian = torch.exp(-(coords**2) / (2 * sigma**2))
+        gaussian = (gaussian / gaussian.sum()).to(device=device, dtype=dtype)
+        kernels = []
+        for axis in range(n_spatial_dims):
+            kernel_shape = [1, 1] + [1] * n_spatial_dims
+            kernel_shape[2 + axis] = window_size
+            kernels.append(gaussian.reshape(kernel_shape))
+        _GAUSSIAN_KERNELS[kernels_key] = kernels
+    return _GAUSSIAN_KERNELS[kernels_key]
+
+
+def _gaussian_filter(images: Tensor, kernels: Sequence[Tensor]) -> Tensor:
+    """
+    Filter every channel of the images with the separable Gaussian, as a sequence
+    of 1D depthwise convolutions without padding.
+
+    Args:
+        images (torch.Tensor): The images of shape (N, C, H, W) or (N, C, D, H, W).
+        kernels (Sequence[torch.Tensor]): The 1D kernels, one per spatial axis.
+
+    Returns:
+        torch.Tensor: The filtered images, smaller by window_size - 1 along every axis.
+    """
+    conv = F.conv2d if images.dim() == 4 else F.conv3d
+    n_channels = images.shape[1]
+    for kernel in kernels:
+        images = conv(
+            images, kernel.expand(n_channels, *kernel.shape[1:]), groups=n_channels
+        )
+    return images
+
+
+def _prepare_ssim_inputs(
+    preds: Tensor, target: Tensor, data_range: Optional[float]
+) -> Tuple[Tensor, Tensor, float]:
+    """
+    Check the inputs, squeeze the trailing singleton dimension of 2D images stored
+    as (N, C, H, W, 1) and determine the data range.
+
+    Args:
+        preds (torch.Tensor): The predicted images.
+        target (torch.Tensor): The target images.
+        data_range (Optional[float]): The data range, if None it is the largest range
+    of the two inputs.
+
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor, float]: The inputs and the data range.
+    """
+    if preds.dim() == 5 and preds.shape[-1] == 1:
+        preds = preds.squeeze(-1)
+    if target.dim() == 5 and target.shape[-1] == 1:
+        target = target.squeeze(-1)
+    assert preds.shape == target.shape and preds.dim() in (4, 5), (
+        "Expected inputs of the same shape (N, C, H, W) or (N, C, D, H, W), "
+        f"got {tuple(preds.shape)} and {tuple(target.shape)}."
+    )
+    preds, target = preds.float(), target.float()
+    if data_range is None:
+        data_range = max(
+            (preds.max() - preds.min()).item(), (target.max() - target.min()).item()
+        )
+    return preds, target, data_range
+
+
+def _ssim_and_contrast_structure(
+    preds: Tensor,
+    target: Tensor,
+    kernels: Sequence[Tensor],
+    data_range: float,
+    k1: float,
+    k2: float,
+) -> Tuple[Tensor, Tensor]:
+    """
+    Compute the per-sample SSIM and contrast-structure terms. The five local
+    statistics are filtered in a single grouped pass.
+
+    Args:
+        preds (torch.Tensor): The predicted images.
+        target (torch.Tensor): The target images.
+        kernels (Sequence[torch.Tensor]): The 1D Gaussian kernels.
+        data_range (float): The data range.
+        k1 (float): The luminance stabilization constant.
+        k2 (float): The contrast stabilization constant.
+
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor]: The SSIM and contrast-structure of shape (N,).
+    """
+    c1, c2 = (k1 * data_range) ** 2, (k2 * data_range) ** 2
+    filtered = _gaussian_filter(
+        torch.cat([preds, target, preds * preds, target * target, preds * target]),
+        kernels,
+    )
+    mu_p, mu_t, e_pp, e_tt, e_pt = filtered.chunk(5)
+    sigma_p = e_pp - mu_p**2
+    sigma_t = e_tt - mu_t**2
+    sigma_pt = e_pt - mu_p * mu_t
+    contrast_structure = (2 * sigma_pt + c2) / (sigma_p + sigma_t + c2)
+    luminance = (2 * mu_p * mu_t + c1) / (mu_p**2 + mu_t**2 + c1)
+    ssim = (luminance * contrast_structure).flatten(1).mean(dim=1)
+    return ssim, contrast_structure.flatten(1).mean(dim=1)
+
+
+def _reduce(
+    scores: Tensor, reduction: Literal["elementwise_mean", "sum", "none"]
+) -> Tensor:
+    """
+    Reduce the per-sample scores.
+
+    Args:
+        scores (torch.Tensor): The scores of shape (N,).
+        reduction (Literal["elementwise_mean", "sum", "none"]): The reduction.
+
+    Returns:
+        torch.Tensor: The reduced scores.
+    """
+    assert reduction in (
+        "elementwise_mean",
+        "sum",
+        "none",
+    ), f"Invalid reduction: {reduction}, expected one of elementwise_mean, sum, none"
+    if reduction == "elementwise_mean":
+        return scores.mean()
+    if reduction == "sum":
+        return scores.sum()
+    return scores
+
+
+def structural_similarity(
+    preds: Tensor,
+    target: Tensor,
+    data_range: Optional[float] = None,
+    window_size: int = 11,
+    sigma: float = 1.5,
+    k1: float = 0.01,
+    k2: float = 0.03,
+    reduction: Literal["elementwise_mean", "sum", "none"] = "elementwise_mean",
+) -> Tensor:
+    """
+    Structural similarity index (SSIM) of batches of 2D or 3D images, computed
+    natively on (N, C, H, W) or (N, C, D, H, W) inputs with a separable Gaussian
+    window. The local statistics are computed over the valid region (no padding).
+
+    Args:
+        preds (torch.Tensor): The predicted images.
+        target (torch.Tensor): The target images.
+        data_range (Optional[float], optional): The data range, if None it is the
+    largest range of the two inputs. Defaults to None.
+        window_size (int, optional): The size of the Gaussian window. Defaults to 11.
+        sigma (float, optional): The standard deviation of the Gaussian. Defaults to 1.5.
+        k1 (float, optional): The luminance stabilization constant. Defaults to 0.01.
+        k2 (float, optional): The contrast stabilization constant. Defaults to 0.03.
+        reduction (Literal["elementwise_mean", "sum", "none"], optional): The reduction
+    over the samples. Defaults to "elementwise_mean".
+
+    Returns:
+        torch.Tensor: The SSIM.
+    """
+    preds, target, data_range = _prepare_ssim_inputs(preds, target, data_range)
+    assert min(preds.shape[2:]) >= window_size, (
+        f"Expected images of at least {window_size} voxels along every axis, "
+        f"got {tuple(preds.shape[2:])}."
+    )
+    kernels = _get_gaussian_kernels(
+        window_size, sigma, preds.dim() - 2, preds.device, preds.dtype
+    )
+    ssim, _ = _ssim_and_contrast_structure(preds, target, kernels, data_range, k1, k2)
+    return _reduce(ssim, reduction)
+
+
+def multiscale_structural_similarity(
+    preds: Tensor,
+    target: Tensor,
+    data_range: Optional[float] = None,
+    window_size: int = 11,
+    sigma: float = 1.5,
+    k1: float = 0.01,
+    k2: float = 0.03,
+    betas: Sequence[float] = MS_SSIM_BETAS,
+    reduction: Literal["elementwise_mean", "sum", "none"] = "elementwise_mean",
+) -> Tensor:
+    """
+    Multi-scale structural similarity index (MS-SSIM) of batches of 2D or 3D images.
+    The contrast-structure terms of the coarser scales are obtained by average
+    pooling the images by 2 along every spatial axis, the luminance is taken from
+    the coarsest scale. Negative terms are clipped to 0, as in the reference
+    implementations, to keep the fractional powers defined.
+
+    Args:
+        preds (torch.Tensor): The predicted images.
+        target (torch.Tensor): The target images.
+        data_range (Optional[float], optional): The data range, if None it is the
+    largest range of the two inputs. Defaults to None.
+        window_size (int, optional): The size of the Gaussian window. Defaults to 11.
+        sigma (float, optional): The standard deviation of the Gaussian. Defaults to 1.5.
+        k1 (float, optional): The luminance stabilization constant. Defaults to 0.01.
+        k2 (float, optional): The contrast stabilization constant. Defaults to 0.03.
+        betas (Sequence[float], optional): The weights of the scales, their number is
+    the number of scales. Defaults to the weights of the original paper.
+        reduction (Literal["elementwise_mean", "sum", "none"], optional): The reduction
+    over the samples. Defaults to "elementwise_mean".
+
+    Returns:
+        torch.Tensor: The MS-SSIM.
+    """
+    preds, target, data_range = _prepare_ssim_inputs(preds, target, data_range)
+    n_scales = len(betas)
+    min_size = (window_size - 1) * 2 ** (n_scales - 1) + 1
+    assert min(preds.shape[2:]) >= min_size, (
+        f"Expected images of at least {min_size} voxels along every axis for "
+        f"{n_scales} scales and window size {window_size}, got {tuple(preds.shape[2:])}."
+    )
+    kernels = _get_gaussian_kernels(
+        window_size, sigma, preds.dim() - 2, preds.device, preds.dtype
+    )
+    pool = F.avg_pool2d if preds.dim() == 4 else F.avg_pool3d
+    scale_terms = []
+    for scale in range(n_scales):
+        ssim, contrast_structure = _ssim_and_contrast_structure(
+            preds, target, kernels, data_range, k1, k2
+        )
+        if scale < n_scales - 1:
+            scale_terms.append(contrast_structure)
+            preds, target = pool(preds, kernel_size=2), pool(target, kernel_size=2)
+        else:
+            scale_terms.append(ssim)
+    scale_terms = torch.stack(scale_terms, dim=1).clamp(min=0)
+    betas = torch.tensor(betas, device=preds.device, dtype=scale_terms.dtype)
+    return _reduce(torch.prod(scale_terms**betas, dim=1), reduction)
@@ -0,0 +1,224 @@
+import torch
+from torch import Tensor
+
+from typing import Dict, Optional
+
+
+def _polynomial_kernel(features_1: Tensor, features_2: Tensor) -> Tensor:
+    """
+    Polynomial kernel of degree 3 used by KID, k(x, y) = (x^T y / d + 1)^3.
+    Works on batches of feature sets.
+
+    Args:
+        features_1 (torch.Tensor): Features of shape (..., N, d).
+        features_2 (torch.Tensor): Features of shape (..., M, d).
+
+    Returns:
+        torch.Tensor: The kernel matrix of shape (..., N, M).
+    """
+    return (features_1 @ features_2.transpose(-1, -2) / features_1.shape[-1] + 1) ** 3
+
+
+def _unbiased_mmd2(real_subsets: Tensor, fake_subsets: Tensor) -> Tensor:
+    """
+    Unbiased estimate of the squared maximum mean discrepancy with the
+    polynomial kernel, for a batch of subsets.
+
+    Args:
+        real_subsets (torch.Tensor): Real features of shape (S, m, d).
+        fake_subsets (torch.Tensor): Fake features of shape (S, n, d).
+
+    Returns:
+        torch.Tensor: The MMD^2 estimates of shape (S,).
+    """
+    m, n = real_subsets.shape[1], fake_subsets.shape[1]
+    k_real = _polynomial_kernel(real_subsets, real_subsets)
+    k_fake = _polynomial_kernel(fake_subsets, fake_subsets)
+    k_real_fake = _polynomial_kernel(real_subsets, fake_subsets)
+    # the diagonals are excluded for the unbiased estimate
+    real_term = (
+        k_real.sum(dim=(1, 2)) - k_real.diagonal(dim1=1, dim2=2).sum(dim=1)
+    ) / (m * (m - 1))
+    fake_term = (
+        k_fake.sum(dim=(1, 2)) - k_fake.diagonal(dim1=1, dim2=2).sum(dim=1)
+    ) / (n * (n - 1))
+    return real_term + fake_term - 2 * k_real_fake.mean(dim=(1, 2))
+
+
+def _random_subset(
+    n_samples: int, subset_size: int, generator: Optional[torch.Generator]
+) -> Tensor:
+    """
+    Draw the indices of a random subset of samples, without replacement.
+
+    Args:
+        n_samples (int): The number of samples.
+        subset_size (int): The size of the subset.
+        generator (torch.Generator, optional): The generator used to draw the subset.
+
+    Returns:
+        torch.Tensor: The indices of shape (subset_size,).
+    """
+    return torch.randperm(n_samples, generator=generator)[:subset_size]
+
+
+def compute_kid(
+    real_features: Tensor,
+    fake_features: Tensor,
+    subsets: int,
+    subset_size: int,
+    max_kernel_matrix_elements: int,
+    generator: Optional[torch.Generator] = None,
+) -> Dict[str, Tensor]:
+    """
+    Compute the Kernel Inception Distance (KID) as the mean of the unbiased MMD^2
+    estimates over random subsets of the features. The subsets are processed in
+    batches, so that the kernel matrices of a batch do not exceed the memory budget.
+
+    Args:
+        real_features (torch.Tensor): Features of the real images, of shape (N, d).
+        fake_features (torch.Tensor): Features of the generated images, of shape (M, d).
+        subsets (int): The number of random subsets.
+        subset_size (int): The size of the subsets, clipped to the number of samples.
+        max_kernel_matrix_elements (int): The memory budget (in elements) of the kernel
+    matrices computed at once.
+        generator (torch.Generator, optional): The generator used to draw the subsets.
+
+    Returns:
+        Dict[str, torch.Tensor]: The mean and standard deviation of KID over the subsets,
+    the standard deviation is 0 with a single subset.
+    """
+    subset_size = min(subset_size, real_features.shape[0], fake_features.shape[0])
+    assert subset_size >= 2, "KID requires at least 2 real and 2 generated samples."
+    real_features, fake_features = real_features.double(), fake_features.double()
+    subsets_per_batch = max(1, max_kernel_matrix_elements // (3 * subset_size**2))
+    mmd2_estimates = []
+    for first_subset in range(0, subsets, subsets_per_batch):
+        n_subsets = min(subsets_per_batch, subsets - first_subset)
+        # drawn subset by subset, so the subsets do not depend on the batching
+        real_indices, fake_indices = [], []
+        for _ in range(n_subsets):
+            real_indices.append(
+                _random_subset(real_features.shape[0], subset_size, generator)
+            )
+            fake_indices.append(
+                _random_subset(fake_features.shape[0], subset_size, generator)
+            )
+        mmd2_estimates.append(
+            _unbiased_mmd2(
+                real_features[torch.stack(real_indices).to(real_features.device)],
+                fake_features[torch.stack(fake_indices).to(fake_features.device)],
+            )
+        )
+    mmd2_estimates = torch.cat(mmd2_estimates)
+    # the standard deviation of a single subset is 0, not NaN
+    kid_std = (
+        mmd2_estimates.std()
+        if subsets > 1
+        else torch.zeros((), dtype=mmd2_estimates.dtype, device=mmd2_estimates.device)
+    )
+    return {"kid_mean": mmd2_estimates.mean(), "kid_std": kid_std}
+
+
+def _chunk_size(n_columns: int, max_distance_matrix_elements: int) -> int:
+    """
+    Number of rows of the distance matrix computed at once within the memory budget.
+
+    Args:
+        n_columns (int): The number of columns of the distance matrix.
+        max_distance_matrix_elements (int): The memory budget (in elements).
+
+    Returns:
+        int: The number of rows.
+    """
+    return max(1, max_distance_matrix_elements // n_columns)
+
+
+def _knn_radii(features: Tensor, k: int, max_distance_matrix_elements: int) -> Tensor:
+    """
+    Distance of every sample to its k-th nearest neighbour in the same set,
+    computed in chunks of rows of the distance matrix.
+
+    Args:
+        features (torch.Tensor): Features of shape (N, d).
+        k (int): The number of nearest neighbours.
+        max_distance_matrix_elements (int): The memory budget (in elements).
+
+    Returns:
+        torch.Tensor: The radii of shape (N,).
+    """
+    chunk_size = _chunk_size(features.shape[0], max_distance_matrix_elements)
+    return torch.cat(
+        [
+            # the sample itself is the closest neighbour, at distance 0
+            torch.cdist(features_chunk, features).kthvalue(k + 1, dim=1).values
+            for features_chunk in features.split(chunk_size)
+        ]
+    )
+
+
+def _manifold_coverage(
+    query_features: Tensor,
+    manifold_features: Tensor,
+    manifold_radii: Tensor,
+    max_distance_matrix_elements: int,
+) -> Tensor:
+    """
+    Fraction of the query samples lying within the k-NN ball of at least one
+    sample of the manifold, computed in chunks of rows of the distance matrix.
+
+    Args:
+        query_features (torch.Tensor): Features of shape (N, d).
+        manifold_features (torch.Tensor): Features of shape (M, d).
+        manifold_radii (torch.Tensor): The k-NN radii of the manifold samples, of shape (M,).
+        max_distance_matrix_elements (int): The memory budget (in elements).
+
+    Returns:
+        torch.Tensor: The fraction of covered query samples.
+    """
+    chunk_size = _chunk_size(manifold_features.shape[0], max_distance_matrix_elements)
+    covered = torch.cat(
+        [
+            (torch.cdist(query_chunk, manifold_features) <= manifold_radii).any(dim=1)
+            for query_chunk in query_features.split(chunk_size)
+        ]
+    )
+    return covered.float().mean()
+
+
+def compute_precision_recall(
+    real_features: Tensor,
+    fake_features: Tensor,
+    k: int,
+    max_distance_matrix_elements: int,
+) -> Dict[str, Tensor]:
+    """
+    Compute the improved precision and recall (Kynkäänniemi et al., 2019). The
+    manifolds of the real and generated features are estimated with the k-NN balls
+    around their samples. Precision is the fraction of the generated samples within
+    the real manifold, recall the fraction of the real samples within the generated one.
+
+    Args:
+        real_features (torch.Tensor): Features of the real images, of shape (N, d).
+        fake_features (torch.Tensor): Features of the generated images, of shape (M, d).
+        k (int): The number of nearest neighbours defining the manifolds.
+        max_distance_matrix_elements (int): The memory budget (in elements) of the
+    distance matrices computed at once.
+
+    Returns:
+        Dict[str, torch.Tensor]: The precision and recall.
+    """
+    assert (
+        real_features.shape[0] > k and fake_features.shape[0] > k
+    ), f"Precision and recall require more than k={k} real and generated samples."
+    real_features, fake_features = real_features.float(), fake_features.float()
+    real_radii = _knn_radii(real_features, k, max_distance_matrix_elements)
+    fake_radii = _knn_radii(fake_features, k, max_distance_matrix_elements)
+    return {
+        "precision": _manifold_coverage(
+            fake_features, real_features, real_radii, max_distance_matrix_elements
+        ),
+        "recall": _manifold_coverage(
+            real_features, fake_features, fake_radii, max_distance_matrix_elements
+        ),
+    }
@@ -4,14 +4,7 @@ import torch
 from torch import Tensor
 from torchmetrics.metric import Metric
 
-from .functional import (
-    lpips_compute,
-    lpips_update,
-    determine_converter,
-    modify_net_input,
-    modify_scaling_layer,
-    _NoTrainLpipsLPIPSGandlf,
-)
+from .functional import lpips_compute, lpips_update, get_lpips_backbone
 
 
 class LPIPSGandlf(Metric):
@@ -45,7 +38,8 @@ class LPIPSGandlf(Metric):
         model from the torchmetrics implementation, originally designed
         for 3-channel 2D data. Here the layers are modified, so results need
         to be interpreted with caution. For 2D 3-channel data, the results
-        are expected to be similar to the original implementation.
+        are expected to be similar to the original implementation. The scores
+        are accumulated over the batches passed to `update`.
 
         Args:
             net_type (Literal["vgg", "alex", "squeeze"]): The network type. Defaults to 'alex'.
@@ -61,11 +55,10 @@ class LPIPSGandlf(Metric):
 
         super().__init__(**kwargs)
 
-        valid_net_type = ("vgg", "alex", "squeeze")
-        assert (
-            net_type in valid_net_type
-        ), f"Invalid net_type: {net_type}, expected one of {valid_net_type}"
-        self.net = _NoTrainLpipsLPIPSGandlf(n_dim=n_dim, net=net_type)
+        # the network is shared by all the metrics with the same configuration, so
+        # it is not a submodule, moving or casting the metric must not affect it
+        self.backbone_config = (net_type, n_channels, n_dim, converter_type)
+        get_lpips_backbone(*self.backbone_config)
 
         valid_reduction = ("mean", "sum")
         assert (
@@ -80,23 +73,30 @@ class LPIPSGandlf(Metric):
 
         self.add_state("sum_scores", torch.tensor(0.0), dist_reduce_fx="sum")
         self.add_state("total", torch.tensor(0.0), dist_reduce_fx="sum")
-        if n_channels != 3:
-            modify_scaling_layer(self.net)
-            modify_net_input(self.net, net_type, n_channels)
-        if n_dim == 3:
-            modify_scaling_layer(self.net)
-            converter = determine_converter(converter_type)
-            converter(self.net)
+
+    @property
+    def net(self) -> torch.nn.Module:
+        """
+        The shared LPIPS network on the device of the metric.
+
+        Returns:
+            torch.nn.Module: The LPIPS network.
+        """
+        return get_lpips_backbone(*self.backbone_config, device=self.device)
 
     def update(self, img1: Tensor, img2: Tensor) -> None:
         """
-        Update internal states with lpips score.
+        Update internal states with lpips score. The images are processed by the
+        network on their device and in their dtype.
 
         Args:
             img1 (torch.Tensor): The first image tensor.
             img2 (torch.Tensor): The second image tensor.
         """
-        loss, total = lpips_update(img1, img2, net=self.net, normalize=self.normalize)
+        net = get_lpips_backbone(
+            *self.backbone_config, device=img1.device, dtype=img1.dtype
+        )
+        loss, total = lpips_update(img1, img2, net=net, normalize=self.normalize)
         self.sum_scores += loss.sum()
         self.total += total
 
@@ -1,6 +1,10 @@
 import os
+import gc
+import copy
+import json
 import shutil
 import pickle
+import statistics
 
 import torch
 import pandas as pd
@@ -8,6 +12,7 @@ import lightning.pytorch as pl
 
 from gandlf_synth.models.configs.config_abc import AbstractModelConfig
 from gandlf_synth.models.modules.module_factory import ModuleFactory
+from gandlf_synth.data.datasets import LatentCodesDataset
 from gandlf_synth.data.datasets_factory import DatasetFactory
 from gandlf_synth.data.dataloaders_factory import DataloaderFactory
 from gandlf_synth.utils.managers_utils import (
@@ -16,10 +21,30 @@ from gandlf_synth.utils.managers_utils import (
     prepare_transforms,
     determine_checkpoint_to_load,
 )
+from gandlf_synth.utils.checkpointing_utils import (
+    prepare_checkpoint_io,
+    prepare_checkpointing_callback,
+)
 from gandlf_synth.utils.distributed_utils import DistributedStrategyFactory
+from gandlf_synth.utils.instrumentation_utils import (
+    StepTimingCallback,
+    prepare_memory_tracking_callback,
+    prepare_profiler_callback,
+)
+from gandlf_synth.utils.tuning_utils import (
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_N_STEPS_PER_TRIAL,
+    DEFAULT_PREFETCH_FACTORS,
+    get_default_num_workers_candidates,
+    is_out_of_memory_error,
+    measure_dataloader_throughput,
+    prepare_tuning_dataloader,
+    select_dataloader_config,
+    write_tuned_config,
+)
 from gandlf_synth.metrics import get_metrics
 
-from typing import Optional, Type, Union, List
+from typing import Any, Dict, Optional, Tuple, Type, Union, List
 
 
 class TrainingManager:
@@ -95,7 +120,7 @@ class TrainingManager:
             self.test_dataloader,
         ) = self._prepare_dataloaders()
         metric_calculator = (
-            get_metrics(global_config["metrics"])
+            get_metrics(global_config["metrics"], self.model_config)
             if "metrics" in global_config
             else None
         )
@@ -111,7 +136,9 @@ class TrainingManager:
         self.module = module_factory.get_module()
         self.resume_checkpoint_path = (
             determine_checkpoint_to_load(
-                model_dir=self.output_dir, custom_checkpoint_path=custom_checkpoint_path
+                model_dir=self.output_dir,
+                custom_checkpoint_path=custom_checkpoint_path,
+                prefer_last=True,
             )
             if self.resume
             else None
@@ -188,6 +215,7 @@ class TrainingManager:
             devices=num_devices,
             num_nodes=num_nodes,
             strategy=strategy,
+            plugins=[prepare_checkpoint_io(self.global_config)],
             accumulate_grad_batches=self.model_config.accumulate_grad_batches,
             gradient_clip_algorithm=self.model_config.gradient_clip_algorithm,
             gradient_clip_val=self.model_config.gradient_clip_val,
@@ -204,7 +232,9 @@ class TrainingManager:
         """
         callbacks = []
         early_stopping_config = self.global_config.get("early_stopping_config")
-        model_save_interval = self.global_config["save_model_every_n_epochs"]
+        instrumentation_config = self.global_config["compute"].get(
+            "instrumentation", {}
+        )
         if early_stopping_config is not None:
             early_stopping = pl.callbacks.EarlyStopping(
                 monitor=early_stopping_config["monitor_value"],
@@ -213,15 +243,28 @@ class TrainingManager:
                 strict=True,  # crash the training if the metric is not found
             )
             callbacks.append(early_stopping)
-        if model_save_interval > 0:
-            model_checkpoint = pl.callbacks.ModelCheckpoint(
-                dirpath=os.path.join(self.output_dir, "checkpoints"),
-                every_n_epochs=model_save_interval,
-                save_last="link",
-                enable_version_counter=False,
-                save_top_k=-1,  # disable overwriting older checkpoints
+        checkpointing_callback = prepare_checkpointing_callback(
+            self.global_config, os.path.join(self.output_dir, "checkpoints")
+        )
+        if checkpointing_callback is not None:
+            callbacks.append(checkpointing_callback)
+        if instrumentation_config.get("step_timing", False):
+            callbacks.append(
+                StepTimingCallback(
+                    synchronize=instrumentation_config.get("synchronize", False),
+                    percentiles=instrumentation_config.get("percentiles", (50, 90, 99)),
+                )
             )
-            callbacks.append(model_checkpoint)
+        profiler_callback = prepare_profiler_callback(
+            self.global_config, self.output_dir, self.logger
+        )
+        if profiler_callback is not None:
+            callbacks.append(profiler_callback)
+        memory_tracking_callback = prepare_memory_tracking_callback(
+            self.global_config, self.logger
+        )
+        if memory_tracking_callback is not None:
+            callbacks.append(memory_tracking_callback)
         return callbacks if callbacks else None
 
     def _assert_parameter_correctness(self):
@@ -320,9 +363,29 @@ class TrainingManager:
             "train",
             self.model_config.tensor_shape,
         )
-        train_dataset = dataset_factory.get_dataset(
-            self.train_dataframe, train_transforms, self.model_config.labeling_paradigm
+        latent_codes_manifest = getattr(
+            self.model_config, "latent_codes_manifest", None
         )
+        if latent_codes_manifest is not None:
+            # latent models can be trained on the code maps cached by `encode-dataset`
+            self.logger.info(
+                f"Training on the cached latent codes from {latent_codes_manifest}."
+            )
+            train_dataset = LatentCodesDataset(latent_codes_manifest)
+            if train_dataset.manifest["model_dir"] != os.path.abspath(
+                self.model_config.vqvae_model_dir
+            ):
+                self.logger.warning(
+                    "The cached latent codes were encoded with the VQVAE from "
+                    f"{train_dataset.manifest['model_dir']}, which differs from the "
+                    f"VQVAE used by the model ({self.model_config.vqvae_model_dir})."
+                )
+        else:
+            train_dataset = dataset_factory.get_dataset(
+                self.train_dataframe,
+                train_transforms,
+                self.model_config.labeling_paradigm,
+            )
         train_dataloader = dataloader_factory.get_training_dataloader(train_dataset)
         # Here we need to consider cases where user did not specify val or test dataframes
         val_dataloader = None
@@ -354,6 +417,225 @@ class TrainingManager:
 
         return train_dataloader, val_dataloader, test_dataloader
 
+    def _run_batch_size_trial(
+        self, batch_size: int, n_steps: int, initial_state: Dict[str, Any]
+    ) -> Optional[float]:
+        """
+        Run a few training steps with the given batch size on a single device. The
+        weights of the module are restored afterwards, so every trial starts from the
+        same state.
+
+        Args:
+            batch_size (int): The batch size.
+            n_steps (int): The number of training steps, the first one is not timed.
+            initial_state (Dict[str, Any]): The initial state dict of the module.
+
+        Returns:
+            Optional[float]: The throughput of the training steps, excluding the wait
+        for the data, in samples per second. None if the batch does not fit in memory.
+        """
+        step_timing_callback = StepTimingCallback(synchronize=True)
+        trainer = pl.Trainer(
+            max_epochs=1,
+            limit_train_batches=n_steps,
+            limit_val_batches=0,
+            num_sanity_val_steps=0,
+            devices=1,
+            logger=False,
+            enable_checkpointing=False,
+            enable_progress_bar=False,
+            enable_model_summary=False,
+            callbacks=[step_timing_callback],
+            accumulate_grad_batches=self.model_config.accumulate_grad_batches,
+            gradient_clip_algorithm=self.model_config.gradient_clip_algorithm,
+            gradient_clip_val=self.model_config.gradient_clip_val,
+            precision=self.global_config["compute"].get("precision", 32),
+            default_root_dir=self.output_dir,
+        )
+        try:
+            trainer.fit(
+                self.module,
+                prepare_tuning_dataloader(
+                    self.train_dataloader.dataset,
+                    batch_size,
+                    n_steps,
+                    self.global_config["dataloader_config"]["train"],
+                ),
+            )
+        except Exception as exception:
+            if not is_out_of_memory_error(exception):
+                raise
+            return None
+        finally:
+            del trainer
+            self.module.load_state_dict(initial_state)
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        compute_time = statistics.median(
+            timings["total"] - timings["data_wait"]
+            for timings in step_timing_callback.step_timings[1:]
+        )
+        return batch_size / compute_time
+
+    def _tune_batch_size(
+        self, tuning_config: dict
+    ) -> Tuple[int, Dict[int, Optional[float]]]:
+        """
+        Find the largest batch size fitting in memory, doubling the batch size from
+        the configured one until a trial runs out of memory or the maximum is reached,
+        then binary-searching between the largest fitting and smallest failing sizes.
+
+        Args:
+            tuning_config (dict): The tuning configuration.
+
+        Returns:
+            Tuple[int, Dict[int, Optional[float]]]: The largest fitting batch size and
+        the throughput of every trial, None for the ones running out of memory.
+        """
+        max_batch_size = tuning_config.get("max_batch_size", DEFAULT_MAX_BATCH_SIZE)
+        n_steps = tuning_config.get("n_steps_per_trial", DEFAULT_N_STEPS_PER_TRIAL)
+        assert n_steps > 1, "At least 2 steps per trial are needed to time them."
+        initial_state = copy.deepcopy(self.module.state_dict())
+        trials: Dict[int, Optional[float]] = {}
+        largest_fitting, smallest_failing = 0, max_batch_size + 1
+        batch_size = min(self.global_config["batch_size"], max_batch_size)
+        while smallest_failing - largest_fitting > 1:
+            trials[batch_size] = self._run_batch_size_trial(
+                batch_size, n_steps, initial_state
+            )
+            if trials[batch_size] is None:
+                self.logger.info(f"Batch size {batch_size} does not fit in memory.")
+                smallest_failing = batch_size
+            else:
+                self.logger.info(
+                    f"Batch size {batch_size}: {trials[batch_size]:.2f} samples/s."
+                )
+                largest_fitting = batch_size
+            if smallest_failing > max_batch_size:
+                batch_size = min(batch_size * 2, max_batch_size)
+            else:
+                batch_size = (largest_fitting + smallest_failing) // 2
+        assert largest_fitting > 0, "Even a batch size of 1 does not fit in memory."
+        return largest_fitting, trials
+
+    def _tune_dataloader(
+        self, tuning_config: dict, batch_size: int, required_throughput: Optional[float]
+    ) -> Tuple[Dict[str, Any], bool, List[Dict[str, Any]]]:
+        """
+        Sweep the number of workers and the prefetch factor of the training
+        dataloader, from the cheapest configuration, until one saturates the
+        training steps.
+
+        Args:
+            tuning_config (dict): The tuning configuration.
+            batch_size (int): The batch size.
+            required_throughput (Optional[float]): The throughput of the training steps,
+        in samples per second.
+
+        Returns:
+            Tuple[Dict[str, Any], bool, List[Dict[str, Any]]]: The selected configuration,
+        whether it saturates the training steps and all the trials.
+        """
+        dataloader_params = self.global_config["dataloader_config"]["train"]
+        num_workers_candidates = tuning_config.get(
+            "num_workers", get_default_num_workers_candidates()
+        )
+        prefetch_factors = tuning_config.get(
+            "prefetch_factor", DEFAULT_PREFETCH_FACTORS
+        )
+        trials = []
+        for num_workers in sorted(num_workers_candidates):
+            for prefetch_factor in prefetch_factors if num_workers > 0 else [None]:
+                throughput = measure_dataloader_throughput(
+                    self.train_dataloader.dataset,
+                    batch_size,
+                    {
+                        **dataloader_params,
+                        "num_workers": num_workers,
+                        "prefetch_factor": prefetch_factor,
+                    },
+                )
+                self.logger.info(
+                    f"Dataloader with {num_workers} workers and prefetch factor "
+                    f"{prefetch_factor}: {throughput:.2f} samples/s."
+                )
+                trials.append(
+                    {
+                        "num_workers": num_workers,
+                        "prefetch_factor": prefetch_factor,
+                        "samples_per_second": throughput,
+                    }
+                )
+            selected_trial, saturating = select_dataloader_config(
+                trials, required_throughput
+            )
+            if saturating:
+                break
+        return selected_trial, saturating, trials
+
+    def run_tuning(self, config_path: str) -> str:
+        """
+        Tune the batch size and the training dataloader instead of training. The
+        largest batch size fitting in memory is searched with a few real training
+        steps on a single device, then the cheapest number of workers and prefetch
+        factor loading the data faster than the training steps consume it are
+        searched. The results are saved in the output directory, along with a copy
+        of the configuration file with the recommended values.
+
+        Args:
+            config_path (str): The path to the configuration file to copy.
+
+        Returns:
+            str: The path to the tuned configuration file.
+        """
+        tuning_config = self.global_config.get("tuning_config", {})
+        self.logger.info("Tuning the batch size.")
+        batch_size, batch_size_trials = self._tune_batch_size(tuning_config)
+        required_throughput = batch_size_trials[batch_size]
+        self.logger.info("Tuning the training dataloader.")
+        dataloader_trial, saturating, dataloader_trials = self._tune_dataloader(
+            tuning_config, batch_size, required_throughput
+        )
+        if not saturating:
+            self.logger.warning(
+                f"No dataloader configuration reaches the throughput of the training "
+                f"steps ({required_throughput:.2f} samples/s), the training will be "
+                "bound by the data loading."
+            )
+        tuning_results_path = os.path.join(self.output_dir, "tuning_results.json")
+        with open(tuning_results_path, "w") as tuning_results_file:
+            json.dump(
+                {
+                    "batch_size_trials": {
+                        str(trial_batch_size): throughput
+                        for trial_batch_size, throughput in batch_size_trials.items()
+                    },
+                    "dataloader_trials": dataloader_trials,
+                    "training_samples_per_second": required_throughput,
+                    "batch_size": batch_size,
+                    "num_workers": dataloader_trial["num_workers"],
+                    "prefetch_factor": dataloader_trial["prefetch_factor"],
+                },
+                tuning_results_file,
+                indent=4,
+            )
+        tuned_config_path = os.path.join(self.output_dir, "tuned_config.yaml")
+        write_tuned_config(
+            config_path,
+            tuned_config_path,
+            self.global_config["dataloader_config"]["train"],
+            batch_size,
+            dataloader_trial["num_workers"],
+            dataloader_trial["prefetch_factor"],
+        )
+        self.logger.info(
+            f"Recommended batch size {batch_size}, "
+            f"{dataloader_trial['num_workers']} workers and prefetch factor "
+            f"{dataloader_trial['prefetch_factor']}, written to {tuned_config_path}."
+        )
+        return tuned_config_path
+
     def run_training(self):
         """
         Train the model.
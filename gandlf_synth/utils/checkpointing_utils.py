@@ -0,0 +1,453 @@
+import os
+import glob
+import math
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import torch
+import lightning.pytorch as pl
+from lightning.fabric.utilities.apply_func import apply_to_collection
+from lightning.pytorch.plugins.io import TorchCheckpointIO
+
+from typing import Any, Callable, Dict, List, Optional
+
+# suffix of the files being written, renamed to their final path once complete
+TEMPORARY_FILE_SUFFIX = ".tmp"
+LAST_CHECKPOINT_FILENAME = "last.ckpt"
+BEST_CHECKPOINT_FILENAME = "best.ckpt"
+
+
+def snapshot_to_host(checkpoint: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy the tensors of a checkpoint to the host memory. Every storage is copied
+    once and the tensors sharing it (e.g. tied weights, views) are rebuilt on the
+    copy, so the snapshot is serialized to the same file as the checkpoint.
+
+    Args:
+        checkpoint (Dict[str, Any]): The checkpoint.
+
+    Returns:
+        Dict[str, Any]: The snapshot, sharing the non-tensor objects with the
+    checkpoint.
+    """
+    host_storages = {}
+
+    def copy_to_host(tensor: torch.Tensor) -> torch.Tensor:
+        tensor = tensor.detach()
+        if tensor.layout != torch.strided:
+            return tensor.to("cpu", copy=True)
+        storage = tensor.untyped_storage()
+        storage_key = (storage.device, storage.data_ptr(), storage.nbytes())
+        if storage_key not in host_storages:
+            host_storages[storage_key] = (
+                storage.clone() if storage.device.type == "cpu" else storage.cpu()
+            )
+        host_tensor = torch.empty(0, dtype=tensor.dtype)
+        host_tensor.set_(
+            host_storages[storage_key],
+            tensor.storage_offset(),
+            tensor.size(),
+            tensor.stride(),
+        )
+        return host_tensor
+
+    return apply_to_collection(checkpoint, torch.Tensor, copy_to_host)
+
+
+def _remove_path(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def write_checkpoint_atomically(checkpoint: Dict[str, Any], path: str) -> None:
+    """
+    Write a checkpoint to a temporary file next to its destination, flush it to the
+    disk and rename it to the destination. The rename is atomic on local filesystems,
+    so an interrupted write never leaves a truncated checkpoint at the destination.
+
+    Args:
+        checkpoint (Dict[str, Any]): The checkpoint.
+        path (str): The destination path.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary_path = path + TEMPORARY_FILE_SUFFIX
+    with open(temporary_path, "wb") as checkpoint_file:
+        torch.save(checkpoint, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(temporary_path, path)
+
+
+def update_checkpoint_link(target_path: str, link_path: str) -> None:
+    """
+    Atomically point a link (e.g. `last.ckpt`) to a checkpoint. A relative symbolic
+    link is created under a temporary name and renamed over the link. If symbolic
+    links are not supported, the checkpoint is copied instead.
+
+    Args:
+        target_path (str): The path to the checkpoint.
+        link_path (str): The path to the link.
+    """
+    temporary_path = link_path + TEMPORARY_FILE_SUFFIX
+    _remove_path(temporary_path)
+    try:
+        os.symlink(
+            os.path.relpath(target_path, os.path.dirname(os.path.abspath(link_path))),
+            temporary_path,
+        )
+    except OSError:
+        # e.g. Windows without the privilege to create symbolic links
+        if os.path.isdir(target_path):
+            shutil.copytree(target_path, temporary_path)
+        else:
+            shutil.copy2(target_path, temporary_path)
+    if os.path.isdir(link_path) and not os.path.islink(link_path):
+        # directories can not be replaced by a rename
+        shutil.rmtree(link_path)
+    os.replace(temporary_path, link_path)
+
+
+class SnapshotCheckpointIO(TorchCheckpointIO):
+    """
+    Checkpoint IO plugin writing the checkpoints atomically (see
+    `write_checkpoint_atomically`). If `asynchronous` is set, saving a checkpoint
+    only copies its tensors to the host memory and the snapshot is serialized by a
+    background thread, so the training resumes while the checkpoint is written.
+    Saving waits for the previous write to complete, so at most one snapshot is held
+    in memory. The removals of checkpoints and updates of the links are run by the
+    same thread, in order with the writes.
+
+    The errors raised in the background are re-raised by the next save, load or
+    `wait` call, and at the teardown of the strategy.
+    """
+
+    def __init__(self, asynchronous: bool = True) -> None:
+        """
+        Initialize the plugin.
+
+        Args:
+            asynchronous (bool, optional): Whether to write the checkpoints in the
+        background. Defaults to True.
+        """
+        super().__init__()
+        self.asynchronous = asynchronous
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: List[Future] = []
+
+    def _submit(self, function: Callable, *args: Any) -> None:
+        """
+        Run a function in the background thread, or immediately if the plugin is
+        synchronous.
+
+        Args:
+            function (Callable): The function.
+            *args (Any): The arguments of the function.
+        """
+        if not self.asynchronous:
+            function(*args)
+            return
+        if self._executor is None:
+            # a single worker runs the tasks in the order of their submission
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="checkpoint_writer"
+            )
+        self._futures.append(self._executor.submit(function, *args))
+
+    def wait(self) -> None:
+        """
+        Wait for the pending writes, removals and link updates to complete, and
+        re-raise the first error raised by them.
+        """
+        futures, self._futures = self._futures, []
+        errors = [future.exception() for future in futures]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise errors[0]
+
+    def save_checkpoint(
+        self,
+        checkpoint: Dict[str, Any],
+        path: str,
+        storage_options: Optional[Any] = None,
+    ) -> None:
+        if storage_options is not None:
+            raise TypeError(
+                "`SnapshotCheckpointIO.save_checkpoint` does not support "
+                f"`storage_options`, got {storage_options}."
+            )
+        path = os.fspath(path)
+        if self.asynchronous:
+            self.wait()
+            checkpoint = snapshot_to_host(checkpoint)
+        self._submit(write_checkpoint_atomically, checkpoint, path)
+
+    def load_checkpoint(self, path: str, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        self.wait()
+        return super().load_checkpoint(path, *args, **kwargs)
+
+    def remove_checkpoint(self, path: str) -> None:
+        self._submit(_remove_path, os.fspath(path))
+
+    def update_link(self, target_path: str, link_path: str) -> None:
+        """
+        Point a link to a checkpoint once its pending write is complete.
+
+        Args:
+            target_path (str): The path to the checkpoint.
+            link_path (str): The path to the link.
+        """
+        self._submit(update_checkpoint_link, target_path, link_path)
+
+    def teardown(self) -> None:
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+class CheckpointingCallback(pl.callbacks.Checkpoint):
+    """
+    Saves a checkpoint every `every_n_epochs` epochs, at the end of the training
+    epoch (after the validation), as `epoch=<epoch>-step=<step>.ckpt`. After every
+    save, the older checkpoints are deleted according to the retention policy: a
+    checkpoint is kept if it is among the last `keep_last` ones, if its epoch number
+    (counted from 1) is a multiple of `keep_every_n_epochs` or if it is among the
+    `keep_best` ones according to the `monitor` metric. Without `keep_last`, all the
+    checkpoints are kept.
+
+    `last.ckpt` links to the newest checkpoint and, if a metric is monitored,
+    `best.ckpt` to the best one. The links are replaced atomically, so they always
+    point to a complete checkpoint. The list of saved checkpoints is stored in the
+    checkpoints, so the policy carries over when the training is resumed.
+    """
+
+    def __init__(
+        self,
+        dirpath: str,
+        every_n_epochs: int = 1,
+        keep_last: Optional[int] = None,
+        keep_every_n_epochs: Optional[int] = None,
+        monitor: Optional[str] = None,
+        mode: str = "min",
+        keep_best: int = 1,
+    ) -> None:
+        """
+        Initialize the callback.
+
+        Args:
+            dirpath (str): The directory of the checkpoints.
+            every_n_epochs (int, optional): The number of epochs between the
+        checkpoints. Defaults to 1.
+            keep_last (Optional[int], optional): The number of most recent checkpoints
+        kept. Defaults to None, keeping all the checkpoints.
+            keep_every_n_epochs (Optional[int], optional): The interval of epochs of
+        the checkpoints kept permanently. Defaults to None.
+            monitor (Optional[str], optional): The metric the best checkpoints are
+        selected by. Defaults to None.
+            mode (str, optional): Whether the metric is minimized ("min") or maximized
+        ("max"). Defaults to "min".
+            keep_best (int, optional): The number of best checkpoints kept when a
+        metric is monitored. Defaults to 1.
+        """
+        super().__init__()
+        assert every_n_epochs > 0, "The checkpoint interval must be positive."
+        assert (
+            keep_last is None or keep_last > 0
+        ), "At least the last checkpoint must be kept."
+        assert (
+            keep_every_n_epochs is None or keep_every_n_epochs > 0
+        ), "The interval of the kept checkpoints must be positive."
+        assert mode in ("min", "max"), "The monitor mode must be 'min' or 'max'."
+        assert keep_best > 0, "At least the best checkpoint must be kept."
+        self.dirpath = dirpath
+        self.every_n_epochs = every_n_epochs
+        self.keep_last = keep_last
+        self.keep_every_n_epochs = keep_every_n_epochs
+        self.monitor = monitor
+        self.mode = mode
+        self.keep_best = keep_best
+        # records of the existing checkpoints, from the oldest
+        self._checkpoints: List[Dict[str, Any]] = []
+
+    @property
+    def best_model_path(self) -> str:
+        best_checkpoints = self._get_best_checkpoints()
+        if not best_checkpoints:
+            return ""
+        return os.path.join(self.dirpath, best_checkpoints[0]["filename"])
+
+    @property
+    def last_model_path(self) -> str:
+        if not self._checkpoints:
+            return ""
+        return os.path.join(self.dirpath, self._checkpoints[-1]["filename"])
+
+    def _get_best_checkpoints(self) -> List[Dict[str, Any]]:
+        """
+        Get the `keep_best` best checkpoints according to the monitored metric.
+
+        Returns:
+            List[Dict[str, Any]]: The records of the checkpoints, from the best.
+        """
+        if self.monitor is None:
+            return []
+        scored_checkpoints = [
+            checkpoint
+            for checkpoint in self._checkpoints
+            if checkpoint["score"] is not None and not math.isnan(checkpoint["score"])
+        ]
+        # the sort is stable, so the oldest checkpoint wins the ties
+        return sorted(
+            scored_checkpoints,
+            key=lambda checkpoint: checkpoint["score"],
+            reverse=self.mode == "max",
+        )[: self.keep_best]
+
+    def _select_checkpoints_to_remove(self) -> List[Dict[str, Any]]:
+        """
+        Select the checkpoints not retained by the retention policy.
+
+        Returns:
+            List[Dict[str, Any]]: The records of the checkpoints to remove.
+        """
+        if self.keep_last is None:
+            return []
+        retained_filenames = {
+            checkpoint["filename"]
+            for checkpoint in self._checkpoints[-self.keep_last :]
+        }
+        if self.keep_every_n_epochs is not None:
+            retained_filenames.update(
+                checkpoint["filename"]
+                for checkpoint in self._checkpoints
+                if (checkpoint["epoch"] + 1) % self.keep_every_n_epochs == 0
+            )
+        retained_filenames.update(
+            checkpoint["filename"] for checkpoint in self._get_best_checkpoints()
+        )
+        return [
+            checkpoint
+            for checkpoint in self._checkpoints
+            if checkpoint["filename"] not in retained_filenames
+        ]
+
+    def _get_score(self, trainer: "pl.Trainer") -> Optional[float]:
+        if self.monitor is None:
+            return None
+        assert self.monitor in trainer.callback_metrics, (
+            f"The monitored metric {self.monitor} is not logged, available metrics: "
+            f"{list(trainer.callback_metrics.keys())}."
+        )
+        return float(trainer.callback_metrics[self.monitor])
+
+    def _update_link(
+        self, trainer: "pl.Trainer", target_path: str, link_filename: str
+    ) -> None:
+        link_path = os.path.join(self.dirpath, link_filename)
+        checkpoint_io = trainer.strategy.checkpoint_io
+        if isinstance(checkpoint_io, SnapshotCheckpointIO):
+            checkpoint_io.update_link(target_path, link_path)
+        else:
+            update_checkpoint_link(target_path, link_path)
+
+    def setup(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule", stage: str
+    ) -> None:
+        if stage == "fit" and trainer.is_global_zero:
+            # leftovers of writes interrupted by a crash
+            for temporary_path in glob.glob(
+                os.path.join(self.dirpath, f"*{TEMPORARY_FILE_SUFFIX}")
+            ):
+                _remove_path(temporary_path)
+
+    def on_train_epoch_end(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        if trainer.sanity_checking or trainer.fast_dev_run:
+            return
+        epoch = trainer.current_epoch
+        if (epoch + 1) % self.every_n_epochs != 0:
+            return
+        filename = f"epoch={epoch}-step={trainer.global_step}.ckpt"
+        filepath = os.path.join(self.dirpath, filename)
+        # recorded before saving, so the checkpoint knows about itself
+        self._checkpoints.append(
+            {"filename": filename, "epoch": epoch, "score": self._get_score(trainer)}
+        )
+        trainer.save_checkpoint(filepath)
+        checkpoints_to_remove = self._select_checkpoints_to_remove()
+        for checkpoint in checkpoints_to_remove:
+            self._checkpoints.remove(checkpoint)
+        # the links are moved before the checkpoints they may point to are removed
+        if trainer.is_global_zero:
+            self._update_link(trainer, filepath, LAST_CHECKPOINT_FILENAME)
+            if self.best_model_path:
+                self._update_link(
+                    trainer, self.best_model_path, BEST_CHECKPOINT_FILENAME
+                )
+        for checkpoint in checkpoints_to_remove:
+            trainer.strategy.remove_checkpoint(
+                os.path.join(self.dirpath, checkpoint["filename"])
+            )
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {"checkpoints": [dict(checkpoint) for checkpoint in self._checkpoints]}
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        # the checkpoints removed after the saved one are forgotten
+        self._checkpoints = [
+            dict(checkpoint)
+            for checkpoint in state_dict.get("checkpoints", [])
+            if os.path.exists(os.path.join(self.dirpath, checkpoint["filename"]))
+        ]
+
+
+def prepare_checkpointing_callback(
+    global_config: dict, checkpoints_dir: str
+) -> Optional[CheckpointingCallback]:
+    """
+    Prepare the checkpointing callback from the `save_model_every_n_epochs` and
+    `checkpointing_config` fields of the config.
+
+    Args:
+        global_config (dict): The global configuration dictionary.
+        checkpoints_dir (str): The directory of the checkpoints.
+
+    Returns:
+        Optional[CheckpointingCallback]: The callback, None if the checkpoints are
+    not saved periodically.
+    """
+    model_save_interval = global_config["save_model_every_n_epochs"]
+    if model_save_interval <= 0:
+        return None
+    checkpointing_config = global_config.get("checkpointing_config", {})
+    return CheckpointingCallback(
+        dirpath=checkpoints_dir,
+        every_n_epochs=model_save_interval,
+        keep_last=checkpointing_config.get("keep_last"),
+        keep_every_n_epochs=checkpointing_config.get("keep_every_n_epochs"),
+        monitor=checkpointing_config.get("monitor_value"),
+        mode=checkpointing_config.get("monitor_mode", "min"),
+        keep_best=checkpointing_config.get("keep_best", 1),
+    )
+
+
+def prepare_checkpoint_io(global_config: dict) -> SnapshotCheckpointIO:
+    """
+    Prepare the checkpoint IO plugin from the `checkpointing_config` field of the
+    config.
+
+    Args:
+        global_config (dict): The global configuration dictionary.
+
+    Returns:
+        SnapshotCheckpointIO: The plugin.
+    """
+    checkpointing_config = global_config.get("checkpointing_config", {})
+    return SnapshotCheckpointIO(
+        asynchronous=checkpointing_config.get("async_save", True)
+    )
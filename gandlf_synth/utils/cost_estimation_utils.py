@@ -0,0 +1,386 @@
+from collections import defaultdict
+
+import torch
+from torch import nn
+from torch.utils.flop_counter import FlopCounterMode
+
+from gandlf_synth.models.configs.config_abc import AbstractModelConfig
+from gandlf_synth.models.modules.module_abc import SynthesisModule
+from gandlf_synth.models.modules.module_factory import ModuleFactory
+
+from typing import Any, Callable, Dict, List, Tuple, Type, Union
+
+# precisions of the compute config keeping the activations in 16 bits
+HALF_PRECISIONS = ("16", "16-mixed", "16-true", "bf16", "bf16-mixed", "bf16-true")
+# optimizer states kept per trainable parameter in the checkpoints (e.g. Adam moments)
+OPTIMIZER_STATES_PER_PARAMETER = 2
+
+
+def build_module_on_meta_device(
+    model_config: Type[AbstractModelConfig],
+) -> SynthesisModule:
+    """
+    Build the module of a model configuration on the meta device, so the shapes of
+    the weights are known without allocating them.
+
+    Args:
+        model_config (Type[AbstractModelConfig]): The model configuration class.
+
+    Returns:
+        SynthesisModule: The module, with all its tensors on the meta device.
+    """
+    with torch.device("meta"):
+        return ModuleFactory(model_config=model_config, model_dir="").get_module(
+            skip_weights_init=True
+        )
+
+
+def _get_dcgan_forward_passes(
+    module: SynthesisModule, batch_size: int
+) -> List[Tuple[str, nn.Module, Callable[[], Any]]]:
+    model_config = module.model_config
+    latent_vector = torch.empty(
+        batch_size,
+        model_config.architecture["latent_vector_size"],
+        *[1] * model_config.n_dimensions,
+        device="meta",
+    )
+    images = torch.empty(
+        batch_size, model_config.n_channels, *model_config.tensor_shape, device="meta"
+    )
+    return [
+        (
+            "generator",
+            module.model.generator,
+            lambda: module.model.generator(latent_vector),
+        ),
+        (
+            "discriminator",
+            module.model.discriminator,
+            lambda: module.model.discriminator(images),
+        ),
+    ]
+
+
+def _get_vqvae_forward_passes(
+    module: SynthesisModule, batch_size: int
+) -> List[Tuple[str, nn.Module, Callable[[], Any]]]:
+    model_config = module.model_config
+    images = torch.empty(
+        batch_size, model_config.n_channels, *model_config.tensor_shape, device="meta"
+    )
+    # the codebook updates and usage statistics of the training are left out
+    return [
+        (
+            "vqvae",
+            module.model,
+            lambda: module.model.decode_from_indices(
+                module.model.encode_to_indices(images)
+            ),
+        )
+    ]
+
+
+def _get_ddpm_forward_passes(
+    module: SynthesisModule, batch_size: int
+) -> List[Tuple[str, nn.Module, Callable[[], Any]]]:
+    samples = torch.empty(batch_size, *module._get_sample_shape(), device="meta")
+    timesteps = torch.zeros(batch_size, dtype=torch.long, device="meta")
+    return [("unet", module.model, lambda: module.model(samples, timesteps))]
+
+
+def _get_latent_ddpm_forward_passes(
+    module: SynthesisModule, batch_size: int
+) -> List[Tuple[str, nn.Module, Callable[[], Any]]]:
+    model_config = module.model_config
+    images = torch.empty(
+        batch_size, module.vqvae.n_channels, *model_config.tensor_shape, device="meta"
+    )
+    latents = torch.empty(batch_size, *module.latent_shape, device="meta")
+    return [
+        ("vqvae_encoder", module.vqvae, lambda: module.vqvae.encode(images)),
+        *_get_ddpm_forward_passes(module, batch_size),
+        ("vqvae_decoder", module.vqvae, lambda: module.vqvae.decode(latents)),
+    ]
+
+
+# the forward passes making up the cost of every model, run on the meta device, with
+# the modules the names of their layers are relative to
+FORWARD_PASSES = {
+    "dcgan": _get_dcgan_forward_passes,
+    "vqvae": _get_vqvae_forward_passes,
+    "ddpm": _get_ddpm_forward_passes,
+    "latent_ddpm": _get_latent_ddpm_forward_passes,
+}
+
+
+def _get_tensors_bytes(tensors: Any, bytes_per_element: int) -> int:
+    """
+    Get the size of all the tensors in a (possibly nested) output of a module.
+
+    Args:
+        tensors (Any): The output of the module.
+        bytes_per_element (int): The size of an element of the activations.
+
+    Returns:
+        int: The size of the tensors, in bytes.
+    """
+    if isinstance(tensors, torch.Tensor):
+        return tensors.numel() * bytes_per_element
+    if isinstance(tensors, (list, tuple)):
+        return sum(_get_tensors_bytes(tensor, bytes_per_element) for tensor in tensors)
+    if isinstance(tensors, dict):
+        return sum(
+            _get_tensors_bytes(tensor, bytes_per_element) for tensor in tensors.values()
+        )
+    return 0
+
+
+def _get_block_name(layer_name: str, root_module: nn.Module) -> str:
+    """
+    Get the name of the block a layer belongs to: its top-level submodule, or the
+    element of the top-level module list (e.g. a level of the DDPM down blocks).
+
+    Args:
+        layer_name (str): The name of the layer in the root module, empty for the
+    root module itself.
+        root_module (nn.Module): The root module.
+
+    Returns:
+        str: The name of the block.
+    """
+    if not layer_name:
+        return "(top-level)"
+    name_parts = layer_name.split(".")
+    if len(name_parts) > 1 and isinstance(
+        root_module.get_submodule(name_parts[0]), nn.ModuleList
+    ):
+        return ".".join(name_parts[:2])
+    return name_parts[0]
+
+
+def _trace_forward_pass(
+    root_module: nn.Module, forward_pass: Callable[[], Any], bytes_per_element: int
+) -> Dict[str, Dict[str, Union[str, int]]]:
+    """
+    Trace a forward pass on the meta device, recording the FLOPs and the output size
+    of every module. The FLOPs of the operations run directly by a module with
+    submodules (e.g. the attention products) are attributed to it, the ones of the
+    leaf modules to them.
+
+    Args:
+        root_module (nn.Module): The module the layer names are relative to.
+        forward_pass (Callable[[], Any]): The forward pass.
+        bytes_per_element (int): The size of an element of the activations.
+
+    Returns:
+        Dict[str, Dict[str, Union[str, int]]]: The cost of every layer run in the
+    forward pass, by layer name.
+    """
+    flop_counter = FlopCounterMode(display=False)
+    inclusive_flops: Dict[str, int] = defaultdict(int)
+    activation_bytes: Dict[str, int] = defaultdict(int)
+    start_flops: Dict[str, List[int]] = defaultdict(list)
+    # shared modules (e.g. the VQVAE full module) are named once
+    module_names = {module: name for name, module in root_module.named_modules()}
+
+    def _pre_hook(module: nn.Module, inputs: Any) -> None:
+        start_flops[module_names[module]].append(flop_counter.get_total_flops())
+
+    def _post_hook(module: nn.Module, inputs: Any, outputs: Any) -> None:
+        module_name = module_names[module]
+        inclusive_flops[module_name] += (
+            flop_counter.get_total_flops() - start_flops[module_name].pop()
+        )
+        if next(module.children(), None) is None:
+            activation_bytes[module_name] += _get_tensors_bytes(
+                outputs, bytes_per_element
+            )
+
+    hook_handles = []
+    for module in module_names:
+        hook_handles.append(module.register_forward_pre_hook(_pre_hook))
+        hook_handles.append(module.register_forward_hook(_post_hook))
+    with torch.no_grad(), flop_counter:
+        try:
+            forward_pass()
+        finally:
+            for hook_handle in hook_handles:
+                hook_handle.remove()
+        # ops run outside of the modules (e.g. in `VQVAE.encode`) count towards the root
+        inclusive_flops[""] = flop_counter.get_total_flops()
+
+    def _get_submodules_flops(module: nn.Module, seen_modules: set) -> int:
+        # containers never called themselves (e.g. module lists) are looked through
+        submodules_flops = 0
+        for child in module.children():
+            if child in seen_modules:
+                continue
+            seen_modules.add(child)
+            if module_names[child] in inclusive_flops:
+                submodules_flops += inclusive_flops[module_names[child]]
+            else:
+                submodules_flops += _get_submodules_flops(child, seen_modules)
+        return submodules_flops
+
+    layers = {}
+    for module, module_name in module_names.items():
+        if module_name not in inclusive_flops:
+            continue
+        layer_flops = inclusive_flops[module_name] - _get_submodules_flops(
+            module, set()
+        )
+        n_parameters = sum(
+            parameter.numel() for parameter in module.parameters(recurse=False)
+        )
+        if (
+            layer_flops == 0
+            and n_parameters == 0
+            and module_name not in activation_bytes
+        ):
+            continue
+        layers[module_name or f"({type(module).__name__})"] = {
+            "type": type(module).__name__,
+            "block": _get_block_name(module_name, root_module),
+            "n_parameters": n_parameters,
+            "flops": layer_flops,
+            "activation_bytes": activation_bytes.get(module_name, 0),
+        }
+    return layers
+
+
+def estimate_model_cost(
+    global_config: dict, model_config: Type[AbstractModelConfig], batch_size: int
+) -> Dict[str, Any]:
+    """
+    Estimate the cost of a model configuration without allocating its weights nor
+    reading any data: the number of parameters, the FLOPs of the forward passes, the
+    memory of the activations (the outputs of the layers, kept for the backward pass
+    in training) and the size of the checkpoints. The FLOPs count the multiply-adds
+    of the matrix products and convolutions as 2 FLOPs.
+
+    Args:
+        global_config (dict): The global configuration dictionary.
+        model_config (Type[AbstractModelConfig]): The model configuration class.
+        batch_size (int): The batch size of the forward passes.
+
+    Returns:
+        Dict[str, Any]: The estimated costs, in total, per forward pass, per block
+    and per layer.
+    """
+    module = build_module_on_meta_device(model_config).eval()
+    precision = str(global_config["compute"].get("precision", 32))
+    bytes_per_element = 2 if precision in HALF_PRECISIONS else 4
+    n_parameters = sum(parameter.numel() for parameter in module.parameters())
+    n_trainable_parameters = sum(
+        parameter.numel()
+        for parameter in module.parameters()
+        if parameter.requires_grad
+    )
+    weights_bytes = sum(
+        tensor.numel() * tensor.element_size()
+        for tensor in module.state_dict().values()
+    )
+    checkpoint_bytes = (
+        weights_bytes + OPTIMIZER_STATES_PER_PARAMETER * n_trainable_parameters * 4
+    )
+
+    forward_passes = {}
+    for pass_name, root_module, forward_pass in FORWARD_PASSES[model_config.model_name](
+        module, batch_size
+    ):
+        layers = _trace_forward_pass(root_module, forward_pass, bytes_per_element)
+        blocks: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"n_parameters": 0, "flops": 0, "activation_bytes": 0}
+        )
+        for layer in layers.values():
+            for cost_name in ("n_parameters", "flops", "activation_bytes"):
+                blocks[layer["block"]][cost_name] += layer[cost_name]
+        forward_passes[pass_name] = {
+            "flops": sum(layer["flops"] for layer in layers.values()),
+            "activation_bytes": sum(
+                layer["activation_bytes"] for layer in layers.values()
+            ),
+            "blocks": dict(blocks),
+            "layers": layers,
+        }
+    return {
+        "model_name": model_config.model_name,
+        "n_dimensions": model_config.n_dimensions,
+        "tensor_shape": list(model_config.tensor_shape),
+        "batch_size": batch_size,
+        "n_parameters": n_parameters,
+        "n_trainable_parameters": n_trainable_parameters,
+        "weights_bytes": weights_bytes,
+        "checkpoint_bytes": checkpoint_bytes,
+        "forward_passes": forward_passes,
+    }
+
+
+def _format_count(count: float) -> str:
+    """
+    Format a count with a metric suffix (e.g. 1.20G).
+
+    Args:
+        count (float): The count.
+
+    Returns:
+        str: The formatted count.
+    """
+    for suffix in ("", "K", "M", "G", "T"):
+        if abs(count) < 1000 or suffix == "T":
+            return f"{count:.0f}" if suffix == "" else f"{count:.2f}{suffix}"
+        count /= 1000
+
+
+def format_cost_table(cost_estimate: Dict[str, Any]) -> str:
+    """
+    Format the estimated costs as a table with one row per layer, grouped by forward
+    pass and block, followed by the totals.
+
+    Args:
+        cost_estimate (Dict[str, Any]): The estimated costs, as returned by
+    `estimate_model_cost`.
+
+    Returns:
+        str: The table.
+    """
+    header = f"{'Layer':<60} {'Type':<28} {'Params':>10} {'FLOPs':>10} {'Act. MB':>10}"
+    lines = [
+        f"Model: {cost_estimate['model_name']} ({cost_estimate['n_dimensions']}D), "
+        f"tensor shape {cost_estimate['tensor_shape']}, "
+        f"batch size {cost_estimate['batch_size']}"
+    ]
+    for pass_name, forward_pass in cost_estimate["forward_passes"].items():
+        lines += ["", f"Forward pass: {pass_name}", header, "-" * len(header)]
+        for block_name, block in forward_pass["blocks"].items():
+            for layer_name, layer in forward_pass["layers"].items():
+                if layer["block"] != block_name:
+                    continue
+                lines.append(
+                    f"{layer_name[-60:]:<60} {layer['type'][:28]:<28} "
+                    f"{_format_count(layer['n_parameters']):>10} "
+                    f"{_format_count(layer['flops']):>10} "
+                    f"{layer['activation_bytes'] / 2**20:>10.2f}"
+                )
+            lines.append(
+                f"{'[block] ' + block_name:<60} {'':<28} "
+                f"{_format_count(block['n_parameters']):>10} "
+                f"{_format_count(block['flops']):>10} "
+                f"{block['activation_bytes'] / 2**20:>10.2f}"
+            )
+        lines += [
+            "-" * len(header),
+            f"{'[total] ' + pass_name:<60} {'':<28} {'':>10} "
+            f"{_format_count(forward_pass['flops']):>10} "
+            f"{forward_pass['activation_bytes'] / 2**20:>10.2f}",
+        ]
+    lines += [
+        "",
+        f"Parameters: {_format_count(cost_estimate['n_parameters'])} "
+        f"({_format_count(cost_estimate['n_trainable_parameters'])} trainable)",
+        f"Weights: {cost_estimate['weights_bytes'] / 2**20:.2f} MB",
+        f"Checkpoint (with optimizer states): "
+        f"{cost_estimate['checkpoint_bytes'] / 2**20:.2f} MB",
+    ]
+    return "\n".join(lines)
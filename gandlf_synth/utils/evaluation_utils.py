@@ -0,0 +1,198 @@
+import csv
+import json
+import time
+from collections import defaultdict
+
+import torch
+import pandas as pd
+from torch.utils.data import DataLoader
+from torchmetrics import Metric
+
+from gandlf_synth.data.datasets import UnlabeledSynthesisDataset
+from gandlf_synth.utils.managers_utils import (
+    prepare_transforms,
+    get_inference_batch_size,
+)
+
+from typing import Any, Callable, Dict, Tuple
+
+# number of batches loaded in advance by each worker of the evaluation dataloaders
+EVALUATION_PREFETCH_FACTOR = 2
+
+
+def prepare_evaluation_dataloader(
+    global_config: dict,
+    model_config: Any,
+    dataframe: pd.DataFrame,
+    num_workers: int,
+    pin_memory: bool = False,
+) -> DataLoader:
+    """
+    Prepare the dataloader of a set of images to evaluate, with the inference batch
+    size and preprocessing. The labels are not used, so the images are always read as
+    unlabeled. With `num_workers` > 0, the batches are prefetched in parallel.
+
+    Args:
+        global_config (dict): The global configuration dictionary.
+        model_config (AbstractModelConfig): The model configuration class.
+        dataframe (pd.DataFrame): The dataframe with the images.
+        num_workers (int): The number of processes loading the images.
+        pin_memory (bool, optional): Whether to pin the memory of the batches.
+    Defaults to False.
+
+    Returns:
+        torch.utils.data.DataLoader: The dataloader of the images.
+    """
+    transforms = prepare_transforms(
+        augmentations_config=None,
+        preprocessing_config=global_config.get("data_preprocessing"),
+        mode="inference",
+        input_shape=model_config.tensor_shape,
+    )
+    batch_size = get_inference_batch_size(global_config)
+    parallel_loading_config = (
+        {"prefetch_factor": EVALUATION_PREFETCH_FACTOR} if num_workers > 0 else {}
+    )
+    return DataLoader(
+        dataset=UnlabeledSynthesisDataset(dataframe.reset_index(drop=True), transforms),
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+        pin_memory=pin_memory,
+        **parallel_loading_config,
+    )
+
+
+class StreamingMetricsEvaluator:
+    """
+    Accumulates the metrics between generated and real images over batches, so
+    the images never have to be held in memory at once. Per-batch metrics (functions)
+    are averaged over the samples, epoch-level metrics (`torchmetrics.Metric`) are
+    updated with every batch and computed once. The time spent in every metric is
+    measured, synchronizing the device so asynchronous kernels are accounted for.
+    """
+
+    def __init__(self, metrics: Dict[str, Callable], device: torch.device) -> None:
+        """
+        Initialize the evaluator.
+
+        Args:
+            metrics (Dict[str, Callable]): The metrics, as returned by `get_metrics`.
+            device (torch.device): The device on which the metrics are computed.
+        """
+        self.metrics = metrics
+        self.device = device
+        for metric in self.metrics.values():
+            if isinstance(metric, Metric):
+                metric.to(self.device)
+        self.reset()
+
+    def _synchronize(self) -> None:
+        """
+        Wait for the kernels running on the device, so they are timed properly.
+        """
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+
+    def reset(self) -> None:
+        """
+        Reset the accumulated values, timings and the states of the epoch-level metrics.
+        """
+        self.n_samples = 0
+        # name of the metric producing each of the result values
+        self.value_sources: Dict[str, str] = {}
+        self._batch_metric_sums: Dict[str, float] = defaultdict(float)
+        self.timings: Dict[str, float] = defaultdict(float)
+        for metric in self.metrics.values():
+            if isinstance(metric, Metric):
+                metric.reset()
+
+    def update(self, generated_images: torch.Tensor, real_images: torch.Tensor) -> None:
+        """
+        Update the metrics with a batch of generated and real images.
+
+        Args:
+            generated_images (torch.Tensor): The generated images.
+            real_images (torch.Tensor): The real images.
+        """
+        generated_images = generated_images.to(self.device, non_blocking=True)
+        real_images = real_images.to(self.device, non_blocking=True)
+        batch_size = generated_images.shape[0]
+        for metric_name, metric in self.metrics.items():
+            start_time = time.perf_counter()
+            if isinstance(metric, Metric):
+                metric.update(generated_images, real_images)
+            else:
+                # same order of the arguments as in the training modules
+                metric_value = metric(real_images, generated_images)
+                self._batch_metric_sums[metric_name] += float(metric_value) * batch_size
+            self._synchronize()
+            self.timings[metric_name] += time.perf_counter() - start_time
+        self.n_samples += batch_size
+
+    def compute(self) -> Dict[str, float]:
+        """
+        Compute the final values of the metrics. Metrics returning multiple
+        values (e.g. KID) are reported under the names of the values.
+
+        Returns:
+            Dict[str, float]: The metric results.
+        """
+        assert self.n_samples > 0, "No images were passed to the metrics."
+        results = {}
+        for metric_name, metric in self.metrics.items():
+            if not isinstance(metric, Metric):
+                results[metric_name] = (
+                    self._batch_metric_sums[metric_name] / self.n_samples
+                )
+                self.value_sources[metric_name] = metric_name
+                continue
+            start_time = time.perf_counter()
+            metric_result = metric.compute()
+            self._synchronize()
+            self.timings[metric_name] += time.perf_counter() - start_time
+            if not isinstance(metric_result, dict):
+                metric_result = {metric_name: metric_result}
+            for value_name, value in metric_result.items():
+                results[value_name] = float(value)
+                self.value_sources[value_name] = metric_name
+        return results
+
+
+def save_evaluation_report(
+    report_path_stem: str,
+    results: Dict[str, float],
+    timings: Dict[str, float],
+    value_sources: Dict[str, str],
+    **report_info: Any,
+) -> Tuple[str, str]:
+    """
+    Save the evaluation report, both as a JSON file with all the information and as
+    a CSV file with one row per metric value. The timings are given per metric,
+    a metric returning multiple values has its timing on all of its rows.
+
+    Args:
+        report_path_stem (str): The path of the report without extension.
+        results (Dict[str, float]): The metric results.
+        timings (Dict[str, float]): The time spent in every metric, in seconds.
+        value_sources (Dict[str, str]): The name of the metric producing each value.
+        **report_info: Additional information stored in the JSON report
+    (e.g. the number of samples).
+
+    Returns:
+        Tuple[str, str]: The paths to the JSON and CSV reports.
+    """
+    json_path, csv_path = f"{report_path_stem}.json", f"{report_path_stem}.csv"
+    with open(json_path, "w") as json_file:
+        json.dump(
+            {**report_info, "metrics": results, "timings_seconds": dict(timings)},
+            json_file,
+            indent=4,
+        )
+    with open(csv_path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["metric", "value_name", "value", "time_seconds"])
+        for value_name, value in results.items():
+            metric_name = value_sources[value_name]
+            writer.writerow([metric_name, value_name, value, timings[metric_name]])
+    return json_path, csv_path
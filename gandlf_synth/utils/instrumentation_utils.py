@@ -0,0 +1,865 @@
+import os
+import time
+import bisect
+import logging
+import warnings
+import functools
+from collections import defaultdict
+
+import torch
+import psutil
+import numpy as np
+import lightning.pytorch as pl
+from torch.profiler import ProfilerActivity, record_function
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class StepTimingCallback(pl.Callback):
+    """
+    Records the duration of the stages of every training step: the wait for the
+    data, the forward passes, the backward passes, the optimizer steps and the
+    logging. The remaining time of the step (e.g. gradient clipping, value
+    tracking) is recorded as `other`, and the whole duration as `total`. Modules
+    with multiple optimizers (e.g. DCGAN) have the durations of their passes summed.
+    The stages are delimited by the batch and backward hooks of the module, the
+    step hooks of the optimizers and the calls to the loggers. The checkpoint writes
+    are timed separately, as they do not belong to a step.
+
+    At the end of every epoch, the percentiles of the stage durations over the
+    steps of the epoch are sent to the loggers as `step_timing_<stage>_p<percentile>`,
+    and every checkpoint write as `checkpoint_write_seconds`. If `synchronize` is set,
+    the device is synchronized at every stage boundary, so the asynchronous kernels
+    are accounted for in their stage, at the cost of stalling the host.
+    """
+
+    STAGES = ("data_wait", "forward", "backward", "optimizer", "other", "logging")
+
+    def __init__(
+        self, synchronize: bool = False, percentiles: Sequence[float] = (50, 90, 99)
+    ) -> None:
+        """
+        Initialize the callback.
+
+        Args:
+            synchronize (bool, optional): Whether to synchronize the device at the
+        stage boundaries. Defaults to False.
+            percentiles (Sequence[float], optional): The percentiles of the stage
+        durations logged at the end of every epoch. Defaults to (50, 90, 99).
+        """
+        super().__init__()
+        self.synchronize = synchronize
+        self.percentiles = percentiles
+        # timings of the steps of the current epoch
+        self.step_timings: List[Dict[str, float]] = []
+        self.checkpoint_timings: List[float] = []
+        self._device = torch.device("cpu")
+        self._optimizer_hook_handles = []
+        self._wrapped_methods: List[tuple] = []
+        self._current_timings: Dict[str, float] = defaultdict(float)
+        self._step_start_time = 0.0
+        self._stage_start_time = 0.0
+        self._last_step_end_time = 0.0
+        # time spent in the loggers since the end of the last step
+        self._logging_time = 0.0
+
+    def _synchronize(self) -> None:
+        """
+        Wait for the kernels running on the device, if the synchronization is enabled.
+        """
+        if self.synchronize and self._device.type == "cuda":
+            torch.cuda.synchronize(self._device)
+
+    def _lap(self, stage: str) -> None:
+        """
+        Attribute the time elapsed since the previous stage boundary to the stage.
+
+        Args:
+            stage (str): The stage that just ended.
+        """
+        self._synchronize()
+        now = time.perf_counter()
+        self._current_timings[stage] += now - self._stage_start_time
+        self._stage_start_time = now
+
+    def _wrap_method(self, owner: Any, method_name: str, on_duration: Callable) -> None:
+        """
+        Replace a method of an object with a wrapper measuring its duration. The
+        original method is restored at the end of the training.
+
+        Args:
+            owner (Any): The object owning the method.
+            method_name (str): The name of the method.
+            on_duration (Callable): The function called with the duration of every call.
+        """
+        original_method = getattr(owner, method_name)
+
+        @functools.wraps(original_method)
+        def timed_method(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return original_method(*args, **kwargs)
+            finally:
+                on_duration(time.perf_counter() - start_time)
+
+        setattr(owner, method_name, timed_method)
+        self._wrapped_methods.append((owner, method_name))
+
+    def _add_logging_time(self, duration: float) -> None:
+        self._logging_time += duration
+
+    def _log_checkpoint_time(self, trainer: "pl.Trainer", duration: float) -> None:
+        """
+        Record the duration of a checkpoint write and send it to the loggers.
+
+        Args:
+            trainer (pl.Trainer): The trainer.
+            duration (float): The duration of the checkpoint write.
+        """
+        self.checkpoint_timings.append(duration)
+        self._log_metrics(trainer, {"checkpoint_write_seconds": duration})
+
+    @staticmethod
+    def _log_metrics(trainer: "pl.Trainer", metrics: Dict[str, float]) -> None:
+        """
+        Send the metrics directly to the loggers, as callbacks cannot log values in
+        all of the hooks.
+
+        Args:
+            trainer (pl.Trainer): The trainer.
+            metrics (Dict[str, float]): The metrics to log.
+        """
+        # the last completed step, as used for the values logged at the end of the epoch
+        step = max(trainer.fit_loop.epoch_loop._batches_that_stepped - 1, 0)
+        for logger in trainer.loggers:
+            logger.log_metrics({**metrics, "epoch": trainer.current_epoch}, step=step)
+
+    def summarize(self) -> Dict[str, float]:
+        """
+        Compute the percentiles of the durations of every stage over the steps of
+        the current epoch.
+
+        Returns:
+            Dict[str, float]: The percentiles, in seconds.
+        """
+        summary = {}
+        if not self.step_timings:
+            return summary
+        for stage in self.STAGES + ("total",):
+            stage_durations = [
+                step_timings[stage] for step_timings in self.step_timings
+            ]
+            for percentile, value in zip(
+                self.percentiles, np.percentile(stage_durations, self.percentiles)
+            ):
+                summary[f"step_timing_{stage}_p{percentile:g}"] = float(value)
+        return summary
+
+    def on_train_start(self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"):
+        self._device = pl_module.device
+        for optimizer in trainer.optimizers:
+            self._optimizer_hook_handles.extend(
+                [
+                    optimizer.register_step_pre_hook(
+                        lambda *args, **kwargs: self._lap("other")
+                    ),
+                    optimizer.register_step_post_hook(
+                        lambda *args, **kwargs: self._lap("optimizer")
+                    ),
+                ]
+            )
+        for logger in trainer.loggers:
+            self._wrap_method(logger, "log_metrics", self._add_logging_time)
+        self._wrap_method(
+            trainer,
+            "save_checkpoint",
+            functools.partial(self._log_checkpoint_time, trainer),
+        )
+
+    def on_train_end(self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"):
+        for hook_handle in self._optimizer_hook_handles:
+            hook_handle.remove()
+        self._optimizer_hook_handles.clear()
+        for owner, method_name in self._wrapped_methods:
+            # removing the instance attribute exposes the method of the class again
+            delattr(owner, method_name)
+        self._wrapped_methods.clear()
+
+    def on_train_epoch_start(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self.step_timings = []
+        self._synchronize()
+        self._last_step_end_time = time.perf_counter()
+        self._logging_time = 0.0
+
+    def on_train_batch_start(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        batch: Any,
+        batch_idx: int,
+    ) -> None:
+        self._synchronize()
+        now = time.perf_counter()
+        self._close_previous_step()
+        self._current_timings = defaultdict(float)
+        # the time since the previous step not spent in the loggers is the data wait
+        self._current_timings["data_wait"] = max(
+            0.0, now - self._last_step_end_time - self._logging_time
+        )
+        self._logging_time = 0.0
+        self._step_start_time = self._stage_start_time = now
+
+    def on_before_backward(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule", loss: torch.Tensor
+    ) -> None:
+        self._lap("forward")
+
+    def on_after_backward(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._lap("backward")
+
+    def on_train_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+    ) -> None:
+        self._lap("other")
+        step_timings = {stage: self._current_timings[stage] for stage in self.STAGES}
+        self.step_timings.append(step_timings)
+        self._last_step_end_time = self._stage_start_time
+
+    def _close_previous_step(self) -> None:
+        """
+        Complete the timings of the previous step with the time spent in the
+        loggers after it ended.
+        """
+        if self.step_timings and "total" not in self.step_timings[-1]:
+            step_timings = self.step_timings[-1]
+            step_timings["logging"] += self._logging_time
+            step_timings["total"] = sum(step_timings[stage] for stage in self.STAGES)
+
+    def on_validation_epoch_start(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        # the logging of the validation does not belong to the last training step
+        self._close_previous_step()
+        self._logging_time = 0.0
+
+    def on_validation_epoch_end(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        # the validation is not waited for by the next training step
+        self._synchronize()
+        self._last_step_end_time = time.perf_counter()
+
+    def on_train_epoch_end(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._close_previous_step()
+        summary = self.summarize()
+        if summary:
+            self._log_metrics(trainer, summary)
+
+
+class ProfilerCallback(pl.Callback):
+    """
+    Attaches `torch.profiler` to the training, validation, test and predict steps,
+    following a wait/warmup/active/repeat schedule over the steps of all the phases.
+    Every step is recorded as a range named after the step type of the module
+    (e.g. `training_step`), so the operators can be attributed to the step types.
+    Every recorded cycle is exported as a Chrome trace (and as stacks, if captured)
+    to the output directory. At the end of every stage, a table of the operators
+    with the largest self CPU time is saved per step type and written to the log.
+    """
+
+    STEP_TYPES = {
+        "train": "training_step",
+        "validation": "validation_step",
+        "test": "test_step",
+        "predict": "predict_step",
+    }
+
+    def __init__(
+        self,
+        output_dir: str,
+        wait: int = 1,
+        warmup: int = 1,
+        active: int = 3,
+        repeat: int = 1,
+        record_shapes: bool = False,
+        profile_memory: bool = False,
+        with_stack: bool = False,
+        row_limit: int = 20,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        """
+        Initialize the callback.
+
+        Args:
+            output_dir (str): The directory where the traces and summaries are saved.
+            wait (int, optional): The number of steps skipped at the beginning of
+        every cycle. Defaults to 1.
+            warmup (int, optional): The number of steps profiled but discarded before
+        the recorded ones. Defaults to 1.
+            active (int, optional): The number of recorded steps. Defaults to 3.
+            repeat (int, optional): The number of cycles, 0 to repeat them until the
+        end. Defaults to 1.
+            record_shapes (bool, optional): Whether to record the input shapes of the
+        operators. Defaults to False.
+            profile_memory (bool, optional): Whether to record the memory allocated
+        by the operators. Defaults to False.
+            with_stack (bool, optional): Whether to record the source locations of
+        the operators. Defaults to False.
+            row_limit (int, optional): The number of operators in the summary tables.
+        Defaults to 20.
+            logger (Optional[logging.Logger], optional): The logger the summary tables
+        are written to. Defaults to None.
+        """
+        super().__init__()
+        self.output_dir = output_dir
+        self.schedule = torch.profiler.schedule(
+            wait=wait, warmup=warmup, active=active, repeat=repeat
+        )
+        self.record_shapes = record_shapes
+        self.profile_memory = profile_memory
+        self.with_stack = with_stack
+        self.row_limit = row_limit
+        self.logger = logger
+        # per step type, the total self CPU time (us), number of calls and self
+        # CPU memory (bytes) of every operator over the recorded steps
+        self.step_statistics: Dict[str, Dict[str, List[float]]] = defaultdict(
+            lambda: defaultdict(lambda: [0.0, 0, 0])
+        )
+        self._profiler: Optional[torch.profiler.profile] = None
+        self._step_range: Optional[record_function] = None
+        self._n_traces = 0
+        self._rank = 0
+        # step types recorded since the start of the current stage
+        self._stage_step_types = set()
+
+    def _on_trace_ready(self, profiler: torch.profiler.profile) -> None:
+        """
+        Export the trace of a recorded cycle and accumulate the self CPU time of its
+        operators per step type. The operators are attributed to the step whose range
+        contains them, also when they run in other threads (e.g. the backward pass).
+
+        Args:
+            profiler (torch.profiler.profile): The profiler with the recorded cycle.
+        """
+        self._n_traces += 1
+        trace_name = f"rank_{self._rank}_trace_{self._n_traces}"
+        profiler.export_chrome_trace(
+            os.path.join(self.output_dir, f"{trace_name}.json")
+        )
+        if self.with_stack:
+            profiler.export_stacks(
+                os.path.join(self.output_dir, f"{trace_name}_stacks.txt"),
+                "self_cpu_time_total",
+            )
+        step_names = set(self.STEP_TYPES.values())
+        events = profiler.events()
+        step_ranges = sorted(
+            (event.time_range.start, event.time_range.end, event.name)
+            for event in events
+            if event.name in step_names
+        )
+        range_starts = [step_range[0] for step_range in step_ranges]
+        for event in events:
+            if event.name in step_names or event.name.startswith("ProfilerStep"):
+                continue
+            range_idx = bisect.bisect_right(range_starts, event.time_range.start) - 1
+            if range_idx < 0 or event.time_range.end > step_ranges[range_idx][1]:
+                continue
+            step_type = step_ranges[range_idx][2]
+            self._stage_step_types.add(step_type)
+            operator_statistics = self.step_statistics[step_type][event.name]
+            operator_statistics[0] += event.self_cpu_time_total
+            operator_statistics[1] += 1
+            operator_statistics[2] += event.self_cpu_memory_usage
+
+    def summary_table(self, step_type: str) -> str:
+        """
+        Format the table of the operators with the largest self CPU time in the
+        recorded steps of the given type.
+
+        Args:
+            step_type (str): The step type (e.g. `training_step`).
+
+        Returns:
+            str: The table.
+        """
+        operator_statistics = self.step_statistics[step_type]
+        total_self_cpu_time = sum(values[0] for values in operator_statistics.values())
+        top_operators = sorted(
+            operator_statistics.items(), key=lambda item: item[1][0], reverse=True
+        )[: self.row_limit]
+        name_width = max([len("Name")] + [len(name) for name, _ in top_operators])
+        header = f"{'Name':<{name_width}}  {'Self CPU (ms)':>14}  {'Self CPU %':>10}  {'Calls':>8}"
+        if self.profile_memory:
+            header += f"  {'Self CPU Mem (MB)':>17}"
+        rows = [f"{step_type}: top operators by self CPU time", header]
+        for name, (self_cpu_time, n_calls, self_cpu_memory) in top_operators:
+            row = (
+                f"{name:<{name_width}}  {self_cpu_time / 1e3:>14.3f}  "
+                f"{100 * self_cpu_time / max(total_self_cpu_time, 1e-9):>10.2f}  "
+                f"{n_calls:>8d}"
+            )
+            if self.profile_memory:
+                row += f"  {self_cpu_memory / 2**20:>17.3f}"
+            rows.append(row)
+        return "\n".join(rows)
+
+    def _start_step(self, step_type: str) -> None:
+        if self._profiler is None:
+            return
+        self._step_range = record_function(step_type)
+        self._step_range.__enter__()
+
+    def _end_step(self) -> None:
+        if self._profiler is None:
+            return
+        if self._step_range is not None:
+            self._step_range.__exit__(None, None, None)
+            self._step_range = None
+        self._profiler.step()
+
+    def setup(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule", stage: str
+    ) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._rank = trainer.global_rank
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        self._profiler = torch.profiler.profile(
+            activities=activities,
+            schedule=self.schedule,
+            on_trace_ready=self._on_trace_ready,
+            record_shapes=self.record_shapes,
+            profile_memory=self.profile_memory,
+            with_stack=self.with_stack,
+        )
+        self._stage_step_types = set()
+        self._profiler.start()
+
+    def teardown(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule", stage: str
+    ) -> None:
+        if self._profiler is None:
+            return
+        if self._step_range is not None:
+            self._step_range.__exit__(None, None, None)
+            self._step_range = None
+        self._profiler.stop()
+        self._profiler = None
+        for step_type in sorted(self._stage_step_types):
+            summary_table = self.summary_table(step_type)
+            with open(
+                os.path.join(
+                    self.output_dir, f"rank_{self._rank}_summary_{step_type}.txt"
+                ),
+                "w",
+            ) as summary_file:
+                summary_file.write(summary_table + "\n")
+            if self.logger is not None:
+                self.logger.info("\n" + summary_table)
+
+    def on_train_batch_start(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        batch: Any,
+        batch_idx: int,
+    ) -> None:
+        self._start_step(self.STEP_TYPES["train"])
+
+    def on_train_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+    ) -> None:
+        self._end_step()
+
+    def on_validation_batch_start(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._start_step(self.STEP_TYPES["validation"])
+
+    def on_validation_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._end_step()
+
+    def on_test_batch_start(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._start_step(self.STEP_TYPES["test"])
+
+    def on_test_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._end_step()
+
+    def on_predict_batch_start(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._start_step(self.STEP_TYPES["predict"])
+
+    def on_predict_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._end_step()
+
+
+def prepare_profiler_callback(
+    global_config: dict, output_dir: str, logger: Optional[logging.Logger] = None
+) -> Optional[ProfilerCallback]:
+    """
+    Prepare the profiler callback from the `profiler` field of the `compute` config,
+    saving the traces to the `profiles` subdirectory of the output directory.
+
+    Args:
+        global_config (dict): The global configuration dictionary.
+        output_dir (str): The output directory of the manager.
+        logger (Optional[logging.Logger], optional): The logger of the manager.
+
+    Returns:
+        Optional[ProfilerCallback]: The callback, None if the profiler is not configured.
+    """
+    profiler_config = global_config.get("compute", {}).get("profiler")
+    if profiler_config is None:
+        return None
+    return ProfilerCallback(
+        output_dir=os.path.join(output_dir, "profiles"),
+        logger=logger,
+        **profiler_config,
+    )
+
+
+class MemoryTrackingCallback(pl.Callback):
+    """
+    Tracks the memory high-water marks of the training, validation, test and
+    predict phases: the resident set size (RSS) of the main process, the total RSS
+    of its child processes (e.g. the dataloader workers) and, on GPU, the peaks of
+    the memory allocated and reserved by the caching allocator. The RSS values are
+    sampled every `sampling_interval` steps, while the allocator peaks are exact.
+
+    At the end of every epoch of the training, validation and test, the peaks are
+    logged as `<phase>_peak_<value>_mb` along with the losses, reduced with the
+    maximum across processes. The peaks of the inference are written to the log.
+    Whenever a sample exceeds a soft limit, a warning is emitted once per phase
+    and epoch, before the job possibly runs out of memory.
+    """
+
+    PHASES = ("train", "val", "test", "predict")
+
+    def __init__(
+        self,
+        sampling_interval: int = 1,
+        host_soft_limit_mb: Optional[float] = None,
+        gpu_soft_limit_mb: Optional[float] = None,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        """
+        Initialize the callback.
+
+        Args:
+            sampling_interval (int, optional): The number of steps between the samples
+        of the RSS. Defaults to 1.
+            host_soft_limit_mb (Optional[float], optional): The soft limit of the total
+        RSS of the main process and its children, in MB. Defaults to None.
+            gpu_soft_limit_mb (Optional[float], optional): The soft limit of the memory
+        reserved by the allocator, in MB. Defaults to None.
+            logger (Optional[logging.Logger], optional): The logger the warnings and
+        the peaks of the inference are written to. Defaults to None.
+        """
+        super().__init__()
+        assert sampling_interval > 0, "The sampling interval must be positive."
+        self.sampling_interval = sampling_interval
+        self.host_soft_limit_mb = host_soft_limit_mb
+        self.gpu_soft_limit_mb = gpu_soft_limit_mb
+        self.logger = logger
+        self._process = psutil.Process()
+        self._device = torch.device("cpu")
+        self._peaks: Dict[str, Dict[str, float]] = {}
+        self._warned_phases = set()
+
+    def _warn(self, message: str) -> None:
+        """
+        Emit a warning, also writing it to the log if a logger is given.
+
+        Args:
+            message (str): The warning message.
+        """
+        warnings.warn(message, UserWarning)
+        if self.logger is not None:
+            self.logger.warning(message)
+
+    def _update_allocator_peaks(self, phases: Sequence[str]) -> None:
+        """
+        Update the allocator high-water marks of the phases with the peaks reached
+        since the last reset of the allocator statistics.
+
+        Args:
+            phases (Sequence[str]): The phases.
+        """
+        if self._device.type != "cuda":
+            return
+        allocated_mb = torch.cuda.max_memory_allocated(self._device) / 2**20
+        reserved_mb = torch.cuda.max_memory_reserved(self._device) / 2**20
+        for phase in phases:
+            peaks = self._peaks[phase]
+            peaks["allocated"] = max(peaks["allocated"], allocated_mb)
+            peaks["reserved"] = max(peaks["reserved"], reserved_mb)
+
+    def _start_phase(self, phase: str, pl_module: "pl.LightningModule") -> None:
+        """
+        Reset the high-water marks of the phase. The phases still running (e.g. the
+        training, when the validation starts before the end of its epoch) first keep
+        the allocator peaks they reached, as the allocator statistics are reset.
+
+        Args:
+            phase (str): The phase.
+            pl_module (pl.LightningModule): The module.
+        """
+        self._device = pl_module.device
+        self._update_allocator_peaks(list(self._peaks))
+        self._peaks[phase] = defaultdict(float)
+        self._warned_phases.discard(phase)
+        if self._device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(self._device)
+        self._sample(phase)
+
+    def _sample(self, phase: str) -> None:
+        """
+        Sample the RSS of the main process and its children, update the high-water
+        marks of the phase and check the soft limits.
+
+        Args:
+            phase (str): The phase.
+        """
+        peaks = self._peaks[phase]
+        rss_mb = self._process.memory_info().rss / 2**20
+        children_rss_mb = 0.0
+        for child in self._process.children(recursive=True):
+            try:
+                children_rss_mb += child.memory_info().rss / 2**20
+            except psutil.Error:
+                # the child exited in the meantime
+                continue
+        peaks["rss"] = max(peaks["rss"], rss_mb)
+        peaks["workers_rss"] = max(peaks["workers_rss"], children_rss_mb)
+        if phase in self._warned_phases:
+            return
+        host_memory_mb = rss_mb + children_rss_mb
+        if (
+            self.host_soft_limit_mb is not None
+            and host_memory_mb > self.host_soft_limit_mb
+        ):
+            self._warned_phases.add(phase)
+            self._warn(
+                f"The {phase} phase uses {host_memory_mb:.0f} MB of host memory "
+                f"(main process and children), above the soft limit of "
+                f"{self.host_soft_limit_mb:.0f} MB."
+            )
+        if self._device.type == "cuda" and self.gpu_soft_limit_mb is not None:
+            reserved_mb = torch.cuda.memory_reserved(self._device) / 2**20
+            if reserved_mb > self.gpu_soft_limit_mb:
+                self._warned_phases.add(phase)
+                self._warn(
+                    f"The {phase} phase reserves {reserved_mb:.0f} MB of GPU memory, "
+                    f"above the soft limit of {self.gpu_soft_limit_mb:.0f} MB."
+                )
+
+    def _end_phase(self, phase: str) -> Dict[str, float]:
+        """
+        Take the last sample of the phase and collect its high-water marks. If other
+        phases are still running, the allocator statistics are reset, so the peaks
+        of the phase are not attributed to them.
+
+        Args:
+            phase (str): The phase.
+
+        Returns:
+            Dict[str, float]: The high-water marks, in MB.
+        """
+        self._sample(phase)
+        self._update_allocator_peaks([phase])
+        peaks = self._peaks.pop(phase)
+        if self._peaks and self._device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(self._device)
+        return {
+            f"{phase}_peak_{value_name}_mb": value
+            for value_name, value in peaks.items()
+        }
+
+    def _log_phase(self, phase: str, pl_module: "pl.LightningModule") -> None:
+        pl_module.log_dict(
+            self._end_phase(phase),
+            on_step=False,
+            on_epoch=True,
+            logger=True,
+            sync_dist=True,
+            reduce_fx="max",
+        )
+
+    def _sample_step(self, phase: str, batch_idx: int) -> None:
+        if phase in self._peaks and (batch_idx + 1) % self.sampling_interval == 0:
+            self._sample(phase)
+
+    def on_train_epoch_start(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._start_phase("train", pl_module)
+
+    def on_train_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+    ) -> None:
+        self._sample_step("train", batch_idx)
+
+    def on_train_epoch_end(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._log_phase("train", pl_module)
+
+    def on_validation_epoch_start(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._start_phase("val", pl_module)
+
+    def on_validation_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._sample_step("val", batch_idx)
+
+    def on_validation_epoch_end(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._log_phase("val", pl_module)
+
+    def on_test_epoch_start(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._start_phase("test", pl_module)
+
+    def on_test_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._sample_step("test", batch_idx)
+
+    def on_test_epoch_end(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._log_phase("test", pl_module)
+
+    def on_predict_epoch_start(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        self._start_phase("predict", pl_module)
+
+    def on_predict_batch_end(
+        self,
+        trainer: "pl.Trainer",
+        pl_module: "pl.LightningModule",
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int = 0,
+    ) -> None:
+        self._sample_step("predict", batch_idx)
+
+    def on_predict_epoch_end(
+        self, trainer: "pl.Trainer", pl_module: "pl.LightningModule"
+    ) -> None:
+        # values cannot be logged by the module in the inference
+        peaks = self._end_phase("predict")
+        if self.logger is not None:
+            self.logger.info(
+                "Memory high-water marks: "
+                + ", ".join(f"{name}: {value:.1f}" for name, value in peaks.items())
+            )
+
+
+def prepare_memory_tracking_callback(
+    global_config: dict, logger: Optional[logging.Logger] = None
+) -> Optional[MemoryTrackingCallback]:
+    """
+    Prepare the memory tracking callback from the `instrumentation` field of the
+    `compute` config.
+
+    Args:
+        global_config (dict): The global configuration dictionary.
+        logger (Optional[logging.Logger], optional): The logger of the manager.
+
+    Returns:
+        Optional[MemoryTrackingCallback]: The callback, None if the memory tracking
+    is not enabled.
+    """
+    instrumentation_config = global_config.get("compute", {}).get("instrumentation", {})
+    if not instrumentation_config.get("memory_tracking", False):
+        return None
+    return MemoryTrackingCallback(
+        sampling_interval=instrumentation_config.get("memory_sampling_interval", 1),
+        host_soft_limit_mb=instrumentation_config.get("host_memory_soft_limit_mb"),
+        gpu_soft_limit_mb=instrumentation_config.get("gpu_memory_soft_limit_mb"),
+        logger=logger,
+    )
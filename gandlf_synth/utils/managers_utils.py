@@ -1,5 +1,9 @@
 import os
 import logging
+from itertools import chain
+
+import torch
+from torch import nn
 from torchio.transforms import Compose
 
 from GANDLF.data.augmentation import get_augmentation_transforms
@@ -92,8 +96,25 @@ def prepare_transforms(
         return Compose(transforms_list)
 
 
+def get_inference_batch_size(global_config: dict) -> int:
+    """
+    Get the batch size used to process the data outside of the training, i.e. the
+    `batch_size` of the inference parameters if given, else the global batch size.
+
+    Args:
+        global_config (dict): The global config.
+
+    Returns:
+        int: The batch size.
+    """
+    inference_parameters = global_config.get("inference_parameters")
+    if inference_parameters is not None and "batch_size" in inference_parameters:
+        return inference_parameters["batch_size"]
+    return global_config["batch_size"]
+
+
 def determine_checkpoint_to_load(
-    model_dir: str, custom_checkpoint_path: Optional[str]
+    model_dir: str, custom_checkpoint_path: Optional[str], prefer_last: bool = False
 ) -> Union[str, None]:
     """
     Determine the checkpoint to load for the inference process. Used in training
@@ -106,15 +127,57 @@ def determine_checkpoint_to_load(
     Args:
         model_dir (str): The model directory path.
         custom_checkpoint_path (Optional[str]): The custom checkpoint path.
+        prefer_last (bool, optional): Whether to look for the last checkpoint before
+    the best one, e.g. to resume the training. Defaults to False.
 
     Returns:
         Union[str, None]: The checkpoint path to load.
     """
     if custom_checkpoint_path is not None:
         return custom_checkpoint_path
-    best_checkpoint_path = os.path.join(model_dir, "checkpoints", "best.ckpt")
-    if os.path.exists(best_checkpoint_path):
-        return best_checkpoint_path
-    last_checkpoint_path = os.path.join(model_dir, "checkpoints", "last.ckpt")
-    if os.path.exists(last_checkpoint_path):
-        return last_checkpoint_path
+    checkpoint_filenames = ["best.ckpt", "last.ckpt"]
+    if prefer_last:
+        checkpoint_filenames.reverse()
+    for checkpoint_filename in checkpoint_filenames:
+        checkpoint_path = os.path.join(model_dir, "checkpoints", checkpoint_filename)
+        if os.path.exists(checkpoint_path):
+            return checkpoint_path
+
+
+def load_weights_from_checkpoint(
+    module: nn.Module, checkpoint_path: str, prefix: str = ""
+) -> None:
+    """
+    Load the weights of a module from a checkpoint. The checkpoint file is memory-mapped,
+    so its tensors are read from the disk only when accessed. If the module is built on
+    the meta device (e.g. a synthesis module with `skip_weights_init`), the checkpoint
+    tensors are assigned to it instead of copied, so the weights are materialized once.
+
+    Args:
+        module (torch.nn.Module): The module to load the weights into.
+        checkpoint_path (str): The path to the checkpoint.
+        prefix (str, optional): The prefix of the keys of the module weights in the state
+    dict of the checkpoint, which is stripped. Defaults to "", loading the whole state dict.
+    """
+    state_dict = torch.load(checkpoint_path, map_location="cpu", mmap=True)[
+        "state_dict"
+    ]
+    if prefix:
+        state_dict = {
+            key[len(prefix) :]: value
+            for key, value in state_dict.items()
+            if key.startswith(prefix)
+        }
+    assign = any(
+        tensor.is_meta for tensor in chain(module.parameters(), module.buffers())
+    )
+    module.load_state_dict(state_dict, assign=assign)
+    if assign:
+        not_restored = [
+            name
+            for name, tensor in chain(module.named_parameters(), module.named_buffers())
+            if tensor.is_meta
+        ]
+        assert (
+            len(not_restored) == 0
+        ), f"Tensors {not_restored} are not restored from {checkpoint_path}."
@@ -0,0 +1,193 @@
+import os
+import copy
+import time
+
+import yaml
+import torch
+from torch.utils.data import DataLoader, Dataset, RandomSampler
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# largest batch size tried by default by the batch size search
+DEFAULT_MAX_BATCH_SIZE = 256
+# number of training steps of every batch size trial, the first one is not timed
+DEFAULT_N_STEPS_PER_TRIAL = 3
+# prefetch factors tried by default for every number of workers
+DEFAULT_PREFETCH_FACTORS = (2, 4)
+# number of batches timed for every dataloader configuration
+DEFAULT_N_TIMED_BATCHES = 10
+# ratio between the dataloader and training step throughputs considered as saturating
+DATALOADER_THROUGHPUT_HEADROOM = 1.2
+
+
+def get_default_num_workers_candidates() -> List[int]:
+    """
+    Get the numbers of dataloader workers tried by default: no workers and the
+    powers of 2 up to the number of available CPUs.
+
+    Returns:
+        List[int]: The numbers of workers.
+    """
+    n_cpus = (
+        len(os.sched_getaffinity(0))
+        if hasattr(os, "sched_getaffinity")
+        else os.cpu_count() or 1
+    )
+    num_workers_candidates, num_workers = [0], 1
+    while num_workers <= n_cpus:
+        num_workers_candidates.append(num_workers)
+        num_workers *= 2
+    return num_workers_candidates
+
+
+def is_out_of_memory_error(exception: BaseException) -> bool:
+    """
+    Check whether an exception is raised because the memory of the device (or of the
+    host) is exhausted.
+
+    Args:
+        exception (BaseException): The exception.
+
+    Returns:
+        bool: Whether the exception is an out of memory error.
+    """
+    if isinstance(exception, torch.cuda.OutOfMemoryError):
+        return True
+    message = str(exception)
+    return isinstance(exception, RuntimeError) and (
+        "out of memory" in message or "can't allocate memory" in message
+    )
+
+
+def prepare_tuning_dataloader(
+    dataset: Dataset, batch_size: int, n_batches: int, dataloader_params: Dict[str, Any]
+) -> DataLoader:
+    """
+    Prepare a dataloader yielding a fixed number of full batches, sampling the
+    dataset with replacement so datasets smaller than the batches can be used.
+
+    Args:
+        dataset (torch.utils.data.Dataset): The training dataset.
+        batch_size (int): The batch size.
+        n_batches (int): The number of batches.
+        dataloader_params (Dict[str, Any]): The parameters of the training dataloader,
+    the batch size and shuffling are overridden.
+
+    Returns:
+        torch.utils.data.DataLoader: The dataloader.
+    """
+    dataloader_params = {
+        key: value
+        for key, value in dataloader_params.items()
+        if key not in ("batch_size", "shuffle", "sampler", "drop_last")
+    }
+    if dataloader_params.get("num_workers", 0) == 0:
+        dataloader_params.pop("prefetch_factor", None)
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        sampler=RandomSampler(
+            dataset, replacement=True, num_samples=batch_size * n_batches
+        ),
+        **dataloader_params,
+    )
+
+
+def measure_dataloader_throughput(
+    dataset: Dataset,
+    batch_size: int,
+    dataloader_params: Dict[str, Any],
+    n_timed_batches: int = DEFAULT_N_TIMED_BATCHES,
+) -> float:
+    """
+    Measure the steady throughput of a dataloader configuration. The first round of
+    batches, one per worker, includes the startup of the workers and is not timed.
+
+    Args:
+        dataset (torch.utils.data.Dataset): The training dataset.
+        batch_size (int): The batch size.
+        dataloader_params (Dict[str, Any]): The parameters of the dataloader.
+        n_timed_batches (int, optional): The number of timed batches.
+    Defaults to DEFAULT_N_TIMED_BATCHES.
+
+    Returns:
+        float: The throughput, in samples per second.
+    """
+    n_untimed_batches = max(dataloader_params.get("num_workers", 0), 1)
+    dataloader = prepare_tuning_dataloader(
+        dataset, batch_size, n_untimed_batches + n_timed_batches, dataloader_params
+    )
+    batches = iter(dataloader)
+    for _ in range(n_untimed_batches):
+        next(batches)
+    start_time = time.perf_counter()
+    for _ in batches:
+        pass
+    return batch_size * n_timed_batches / (time.perf_counter() - start_time)
+
+
+def select_dataloader_config(
+    trials: List[Dict[str, Any]], required_throughput: Optional[float]
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Select the cheapest dataloader configuration saturating the training steps, i.e.
+    whose throughput exceeds the one of the training steps with some headroom. If none
+    does, the fastest configuration is selected.
+
+    Args:
+        trials (List[Dict[str, Any]]): The trials, sorted from the cheapest, with the
+    `samples_per_second` of every configuration.
+        required_throughput (Optional[float]): The throughput of the training steps,
+    in samples per second.
+
+    Returns:
+        Tuple[Dict[str, Any], bool]: The selected trial and whether it saturates the
+    training steps.
+    """
+    if required_throughput is not None:
+        for trial in trials:
+            if (
+                trial["samples_per_second"]
+                >= required_throughput * DATALOADER_THROUGHPUT_HEADROOM
+            ):
+                return trial, True
+    return max(trials, key=lambda trial: trial["samples_per_second"]), False
+
+
+def write_tuned_config(
+    config_path: str,
+    tuned_config_path: str,
+    train_dataloader_config: Dict[str, Any],
+    batch_size: int,
+    num_workers: int,
+    prefetch_factor: Optional[int],
+) -> None:
+    """
+    Write a copy of the configuration file with the recommended batch size and
+    training dataloader parameters.
+
+    Args:
+        config_path (str): The path to the original configuration file.
+        tuned_config_path (str): The path to the tuned configuration file.
+        train_dataloader_config (Dict[str, Any]): The training dataloader parameters
+    in use, completed with the defaults.
+        batch_size (int): The recommended batch size.
+        num_workers (int): The recommended number of workers.
+        prefetch_factor (Optional[int]): The recommended prefetch factor, None
+    without workers.
+    """
+    with open(config_path, "r") as config_file:
+        config = yaml.safe_load(config_file)
+    train_dataloader_config = copy.deepcopy(train_dataloader_config)
+    train_dataloader_config["num_workers"] = num_workers
+    if prefetch_factor is None:
+        train_dataloader_config.pop("prefetch_factor", None)
+    else:
+        train_dataloader_config["prefetch_factor"] = prefetch_factor
+    config["batch_size"] = batch_size
+    # the batch size of the dataloader, if any, overrides the global one
+    if "batch_size" in train_dataloader_config:
+        train_dataloader_config["batch_size"] = batch_size
+    config.setdefault("dataloader_config", {})["train"] = train_dataloader_config
+    with open(tuned_config_path, "w") as tuned_config_file:
+        yaml.safe_dump(config, tuned_config_file, sort_keys=False)
@@ -37,6 +37,7 @@ requirements = [
     "lightning==2.4.0",
     "monai-generative==0.2.3",
     "deepspeed==0.15.1",
+    "psutil",
 ]
 if __name__ == "__main__":
     setup(
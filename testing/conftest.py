@@ -8,6 +8,28 @@ def pytest_addoption(parser):
     parser.addoption(
         "--device", action="store", default="cpu", help="device option: cpu or cuda"
     )
+    parser.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="run the wall-clock timing tests marked as benchmark",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: wall-clock timing test, run only with --benchmark"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    # timings are unreliable on shared runners, so they are opt-in
+    if config.getoption("--benchmark"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="timing test, run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
 
 
 @fixture()
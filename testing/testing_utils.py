@@ -4,6 +4,8 @@ import zipfile
 import gdown
 import subprocess
 from datetime import datetime
+import torch
+from torch import nn
 from gandlf_synth.models.modules.module_abc import SynthesisModule
 from gandlf_synth.data.extractors_factory import DataExtractorFactory
 
@@ -226,3 +228,34 @@ def create_csv_modality_labeling_type_path(
         main_data_dir, modality, f"{modality}_{labeling_type}_data.csv"
     )
     return csv_path
+
+
+class StubFeatureExtractor(nn.Module):
+    """
+    Feature extractor standing in for InceptionV3 in the tests, so that its weights
+    are not downloaded. It projects the average pooled images with a fixed random
+    matrix and counts the images it extracted the features of.
+    """
+
+    num_features = 8
+
+    def __init__(self, n_channels: int):
+        """
+        Initialize the stub feature extractor.
+
+        Args:
+            n_channels (int): The number of channels of the images.
+        """
+        super().__init__()
+        generator = torch.Generator().manual_seed(0)
+        self.projection = nn.Linear(n_channels * 16, self.num_features)
+        self.projection.weight.data = torch.randn(
+            self.num_features, n_channels * 16, generator=generator
+        )
+        self.projection.requires_grad_(False)
+        self.n_extracted_images = 0
+
+    def forward(self, images: torch.Tensor) -> torch.Tensor:
+        self.n_extracted_images += images.shape[0]
+        pooled = nn.functional.adaptive_avg_pool2d(images.float() / 255, 4)
+        return self.projection(pooled.flatten(start_dim=1))
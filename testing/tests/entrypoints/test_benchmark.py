@@ -0,0 +1,69 @@
+import os
+import pytest
+from click.testing import CliRunner
+
+from gandlf_synth.entrypoints.benchmark import benchmark
+from . import CliCase, run_test_case, TmpFile, TmpNoEx
+
+# Mock path for the main_benchmark function
+MOCK_PATH = "gandlf_synth.entrypoints.benchmark.main_benchmark"
+
+# Temporary file system setup
+test_file_system = [
+    TmpFile("config_dcgan.yaml", content="config content"),
+    TmpFile("config_ddpm.yaml", content="config content"),
+    TmpNoEx("benchmark/"),
+    TmpNoEx("config_na.yaml"),
+]
+
+test_cases = [
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config_dcgan.yaml --output-dir benchmark",
+            "-c config_dcgan.yaml -o benchmark",
+        ],
+        expected_args={
+            "config_paths": ["config_dcgan.yaml"],
+            "output_dir": os.path.normpath("benchmark"),
+            "n_samples": 32,
+            "n_steps": 20,
+            "n_warmup_steps": 3,
+            "image_shape": None,
+        },
+    ),
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config_dcgan.yaml --config config_ddpm.yaml --output-dir benchmark "
+            "--n-samples 8 --n-steps 5 --n-warmup-steps 0 --image-shape 128 --image-shape 96",
+            "-c config_dcgan.yaml -c config_ddpm.yaml -o benchmark -ns 8 -st 5 -ws 0 -is 128 -is 96",
+        ],
+        expected_args={
+            "config_paths": ["config_dcgan.yaml", "config_ddpm.yaml"],
+            "output_dir": os.path.normpath("benchmark"),
+            "n_samples": 8,
+            "n_steps": 5,
+            "n_warmup_steps": 0,
+            "image_shape": [128, 96],
+        },
+    ),
+    # number of timed steps has to be positive
+    CliCase(
+        should_succeed=False, command_lines=["-c config_dcgan.yaml -o benchmark -st 0"]
+    ),
+    # config has to exist
+    CliCase(should_succeed=False, command_lines=["-c config_na.yaml -o benchmark"]),
+]
+
+
+@pytest.mark.parametrize("case", test_cases)
+def test_case_benchmark(cli_runner: CliRunner, case: CliCase):
+    run_test_case(
+        case=case,
+        cli_runner=cli_runner,
+        file_system_config=test_file_system,
+        real_code_function_path=MOCK_PATH,
+        cli_command=benchmark,
+        patched_return_value=None,
+    )
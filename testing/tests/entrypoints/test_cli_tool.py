@@ -1,10 +1,89 @@
+import os
+import sys
+import time
+import importlib
+import subprocess
+from pathlib import Path
+
+import pytest
 from click.testing import CliRunner
 from gandlf_synth.entrypoints.cli_tool import gandlf_synth
 from gandlf_synth.version import __version__
 
+# dependencies imported only by the subcommands (and models) using them
+HEAVY_MODULES = (
+    "torch",
+    "lightning",
+    "GANDLF",
+    "generative",
+    "torchvision",
+    "SimpleITK",
+    "pandas",
+)
+# startup budget of a lightweight subcommand, including the interpreter startup,
+# checked only with --benchmark
+CLI_STARTUP_BUDGET_SECONDS = 1.0
+
+
+def _run_python(*args: str) -> str:
+    """
+    Run a fresh interpreter with the given arguments, so no module is imported
+    beforehand, and return its standard output.
+    """
+    package_parent_dir = Path(importlib.import_module("gandlf_synth").__file__).parents[
+        1
+    ]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(package_parent_dir), env.get("PYTHONPATH", "")]
+    )
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True, env=env
+    ).stdout
+
 
 def test_version_command():
     runner = CliRunner()
     result = runner.invoke(gandlf_synth, ["--version"])
     assert result.exit_code == 0
     assert __version__ in result.output
+
+
+def test_cli_does_not_import_heavy_dependencies():
+    output = _run_python(
+        "-c",
+        "import sys; import gandlf_synth.entrypoints.cli_tool; "
+        f"print([name for name in {HEAVY_MODULES} if name in sys.modules])",
+    )
+    imported_modules = output.splitlines()[-1]
+    assert imported_modules == "[]", f"The CLI imports {imported_modules}."
+
+
+def test_module_factory_imports_selected_module_only():
+    model_modules = [
+        f"gandlf_synth.models.modules.{model_name}_module"
+        for model_name in ("dcgan", "vqvae", "ddpm", "latent_ddpm")
+    ]
+    output = _run_python(
+        "-c",
+        "import sys; import gandlf_synth.models.modules.module_factory; "
+        f"print([name for name in {model_modules} if name in sys.modules])",
+    )
+    imported_modules = output.splitlines()[-1]
+    assert imported_modules == "[]", f"The module factory imports {imported_modules}."
+
+
+@pytest.mark.benchmark
+def test_construct_csv_startup_time():
+    # the best of a few runs, not to fail on a single slow start
+    startup_times = []
+    for _ in range(3):
+        start_time = time.perf_counter()
+        _run_python(
+            "-m", "gandlf_synth.entrypoints.cli_tool", "construct-csv", "--help"
+        )
+        startup_times.append(time.perf_counter() - start_time)
+    assert min(startup_times) < CLI_STARTUP_BUDGET_SECONDS, (
+        f"construct-csv starts in {min(startup_times):.2f}s, above the budget of "
+        f"{CLI_STARTUP_BUDGET_SECONDS}s."
+    )
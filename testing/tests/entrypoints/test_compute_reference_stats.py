@@ -0,0 +1,70 @@
+import os
+import pytest
+from click.testing import CliRunner
+
+from gandlf_synth.entrypoints.compute_reference_stats import compute_reference_stats
+from . import CliCase, run_test_case, TmpFile, TmpNoEx
+
+# Mock path for the main_compute_reference_stats function
+MOCK_PATH = (
+    "gandlf_synth.entrypoints.compute_reference_stats.main_compute_reference_stats"
+)
+
+# Temporary file system setup
+test_file_system = [
+    TmpFile("config.yaml", content="config content"),
+    TmpFile("main_data.csv", content="main data"),
+    TmpNoEx("reference_stats/"),
+    TmpNoEx("main_data_na.csv"),
+]
+
+test_cases = [
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config.yaml --main-data-csv-path main_data.csv --output-dir reference_stats",
+            "-c config.yaml -dt main_data.csv -o reference_stats",
+        ],
+        expected_args={
+            "config_path": "config.yaml",
+            "main_data_csv_path": "main_data.csv",
+            "output_dir": os.path.normpath("reference_stats"),
+            "features_size": 2048,
+        },
+    ),
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config.yaml --main-data-csv-path main_data.csv --output-dir reference_stats --features-size 64",
+            "-c config.yaml -dt main_data.csv -o reference_stats -fs 64",
+        ],
+        expected_args={
+            "config_path": "config.yaml",
+            "main_data_csv_path": "main_data.csv",
+            "output_dir": os.path.normpath("reference_stats"),
+            "features_size": 64,
+        },
+    ),
+    # features size has to be one of the InceptionV3 feature layers
+    CliCase(
+        should_succeed=False,
+        command_lines=["-c config.yaml -dt main_data.csv -o reference_stats -fs 100"],
+    ),
+    # data csv has to exist
+    CliCase(
+        should_succeed=False,
+        command_lines=["-c config.yaml -dt main_data_na.csv -o reference_stats"],
+    ),
+]
+
+
+@pytest.mark.parametrize("case", test_cases)
+def test_case_compute_reference_stats(cli_runner: CliRunner, case: CliCase):
+    run_test_case(
+        case=case,
+        cli_runner=cli_runner,
+        file_system_config=test_file_system,
+        real_code_function_path=MOCK_PATH,
+        cli_command=compute_reference_stats,
+        patched_return_value=None,
+    )
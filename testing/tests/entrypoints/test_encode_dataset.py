@@ -0,0 +1,70 @@
+import os
+import pytest
+from click.testing import CliRunner
+
+from gandlf_synth.entrypoints.encode_dataset import encode_dataset
+from . import CliCase, run_test_case, TmpDire, TmpFile, TmpNoEx
+
+# Mock path for the main_encode_dataset function
+MOCK_PATH = "gandlf_synth.entrypoints.encode_dataset.main_encode_dataset"
+
+# Temporary file system setup
+test_file_system = [
+    TmpFile("config.yaml", content="config content"),
+    TmpFile("main_data.csv", content="main data"),
+    TmpDire("model_dir/"),
+    TmpNoEx("latent_codes/"),
+    TmpNoEx("model_dir_na/"),
+    TmpFile("custom_checkpoint.ckpt", content="checkpoint data"),
+]
+
+test_cases = [
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config.yaml --main-data-csv-path main_data.csv --model-dir model_dir --output-dir latent_codes",
+            "-c config.yaml -dt main_data.csv -m-dir model_dir -o latent_codes",
+        ],
+        expected_args={
+            "config_path": "config.yaml",
+            "main_data_csv_path": "main_data.csv",
+            "model_dir": os.path.normpath("model_dir"),
+            "output_dir": os.path.normpath("latent_codes"),
+            "custom_checkpoint_path": None,
+        },
+    ),
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config.yaml --main-data-csv-path main_data.csv --model-dir model_dir --output-dir latent_codes --custom-checkpoint-path custom_checkpoint.ckpt",
+            "-c config.yaml -dt main_data.csv -m-dir model_dir -o latent_codes -ckpt-path custom_checkpoint.ckpt",
+        ],
+        expected_args={
+            "config_path": "config.yaml",
+            "main_data_csv_path": "main_data.csv",
+            "model_dir": os.path.normpath("model_dir"),
+            "output_dir": os.path.normpath("latent_codes"),
+            "custom_checkpoint_path": "custom_checkpoint.ckpt",
+        },
+    ),
+    # model dir has to exist
+    CliCase(
+        should_succeed=False,
+        command_lines=[
+            "--config config.yaml --main-data-csv-path main_data.csv --model-dir model_dir_na --output-dir latent_codes",
+            "-c config.yaml -dt main_data.csv -m-dir model_dir_na -o latent_codes",
+        ],
+    ),
+]
+
+
+@pytest.mark.parametrize("case", test_cases)
+def test_case_encode_dataset(cli_runner: CliRunner, case: CliCase):
+    run_test_case(
+        case=case,
+        cli_runner=cli_runner,
+        file_system_config=test_file_system,
+        real_code_function_path=MOCK_PATH,
+        cli_command=encode_dataset,
+        patched_return_value=None,
+    )
@@ -0,0 +1,55 @@
+import pytest
+from click.testing import CliRunner
+
+from gandlf_synth.entrypoints.estimate import estimate
+from . import CliCase, run_test_case, TmpFile, TmpNoEx
+
+# Mock path for the main_estimate function
+MOCK_PATH = "gandlf_synth.entrypoints.estimate.main_estimate"
+
+# Temporary file system setup
+test_file_system = [
+    TmpFile("config.yaml", content="config content"),
+    TmpNoEx("estimate.json"),
+    TmpNoEx("config_na.yaml"),
+]
+
+test_cases = [
+    CliCase(
+        should_succeed=True,
+        command_lines=["--config config.yaml", "-c config.yaml"],
+        expected_args={
+            "config_path": "config.yaml",
+            "batch_size": None,
+            "output_path": None,
+        },
+    ),
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config.yaml --batch-size 4 --output-path estimate.json",
+            "-c config.yaml -bs 4 -o estimate.json",
+        ],
+        expected_args={
+            "config_path": "config.yaml",
+            "batch_size": 4,
+            "output_path": "estimate.json",
+        },
+    ),
+    # batch size has to be positive
+    CliCase(should_succeed=False, command_lines=["-c config.yaml -bs 0"]),
+    # config has to exist
+    CliCase(should_succeed=False, command_lines=["-c config_na.yaml"]),
+]
+
+
+@pytest.mark.parametrize("case", test_cases)
+def test_case_estimate(cli_runner: CliRunner, case: CliCase):
+    run_test_case(
+        case=case,
+        cli_runner=cli_runner,
+        file_system_config=test_file_system,
+        real_code_function_path=MOCK_PATH,
+        cli_command=estimate,
+        patched_return_value=None,
+    )
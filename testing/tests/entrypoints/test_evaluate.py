@@ -0,0 +1,75 @@
+import os
+import pytest
+from click.testing import CliRunner
+
+from gandlf_synth.entrypoints.evaluate import evaluate
+from . import CliCase, run_test_case, TmpFile, TmpDire, TmpNoEx
+
+# Mock path for the main_evaluate function
+MOCK_PATH = "gandlf_synth.entrypoints.evaluate.main_evaluate"
+
+# Temporary file system setup
+test_file_system = [
+    TmpFile("config.yaml", content="config content"),
+    TmpFile("main_data.csv", content="main data"),
+    TmpDire("generated/"),
+    TmpNoEx("evaluation/"),
+    TmpNoEx("generated_na/"),
+]
+
+test_cases = [
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config.yaml --generated-images-dir generated --main-data-csv-path main_data.csv --output-dir evaluation",
+            "-c config.yaml -g generated -dt main_data.csv -o evaluation",
+        ],
+        expected_args={
+            "config_path": "config.yaml",
+            "generated_images_dir": os.path.normpath("generated"),
+            "main_data_csv_path": "main_data.csv",
+            "output_dir": os.path.normpath("evaluation"),
+            "num_workers": 4,
+        },
+    ),
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config.yaml --generated-images-dir generated --main-data-csv-path main_data.csv --output-dir evaluation --num-workers 0",
+            "-c config.yaml -g generated -dt main_data.csv -o evaluation -nw 0",
+        ],
+        expected_args={
+            "config_path": "config.yaml",
+            "generated_images_dir": os.path.normpath("generated"),
+            "main_data_csv_path": "main_data.csv",
+            "output_dir": os.path.normpath("evaluation"),
+            "num_workers": 0,
+        },
+    ),
+    # number of workers cannot be negative
+    CliCase(
+        should_succeed=False,
+        command_lines=[
+            "-c config.yaml -g generated -dt main_data.csv -o evaluation -nw -1"
+        ],
+    ),
+    # generated images directory has to exist
+    CliCase(
+        should_succeed=False,
+        command_lines=[
+            "-c config.yaml -g generated_na -dt main_data.csv -o evaluation"
+        ],
+    ),
+]
+
+
+@pytest.mark.parametrize("case", test_cases)
+def test_case_evaluate(cli_runner: CliRunner, case: CliCase):
+    run_test_case(
+        case=case,
+        cli_runner=cli_runner,
+        file_system_config=test_file_system,
+        real_code_function_path=MOCK_PATH,
+        cli_command=evaluate,
+        patched_return_value=None,
+    )
@@ -40,6 +40,9 @@ test_cases = [
             "test_ratio": 0.0,
             "inference_output_dir": None,
             "custom_checkpoint_path": None,
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": False,
         },
     ),
     # Basic inference case
@@ -62,6 +65,9 @@ test_cases = [
             "test_ratio": 0.0,
             "inference_output_dir": "inference_output",
             "custom_checkpoint_path": None,
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": False,
         },
     ),
     # test-val from dataframe during training
@@ -84,6 +90,9 @@ test_cases = [
             "test_ratio": 0.0,
             "inference_output_dir": None,
             "custom_checkpoint_path": None,
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": False,
         },
     ),
     # test-val from ratio during training
@@ -106,6 +115,9 @@ test_cases = [
             "test_ratio": 0.1,
             "inference_output_dir": None,
             "custom_checkpoint_path": None,
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": False,
         },
     ),
     # test-val both from ratio and dataframe during training
@@ -128,6 +140,9 @@ test_cases = [
             "test_ratio": 0.1,
             "inference_output_dir": None,
             "custom_checkpoint_path": None,
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": False,
         },
     ),
     # inference with custom checkpoint
@@ -150,6 +165,34 @@ test_cases = [
             "test_ratio": 0.0,
             "inference_output_dir": "inference_output",
             "custom_checkpoint_path": "custom_checkpoint.pth",
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": False,
+        },
+    ),
+    # evaluation-only inference over all the checkpoints
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config.yaml --model-dir model_dir --inference-output-dir inference_output --evaluation-csv-path test_data.csv --sweep-checkpoints",
+            "-c config.yaml -m-dir model_dir -i-dir inference_output -e-csv test_data.csv -sweep",
+        ],
+        expected_args={
+            "config_path": "config.yaml",
+            "main_data_csv_path": None,
+            "output_dir": os.path.normpath("model_dir"),
+            "training": False,
+            "resume": False,
+            "reset": False,
+            "val_csv_path": None,
+            "test_csv_path": None,
+            "val_ratio": 0.0,
+            "test_ratio": 0.0,
+            "inference_output_dir": "inference_output",
+            "custom_checkpoint_path": None,
+            "evaluation_csv_path": "test_data.csv",
+            "sweep_checkpoints": True,
+            "tune": False,
         },
     ),
     # resume training with custom checkpoint
@@ -172,6 +215,9 @@ test_cases = [
             "test_ratio": 0.0,
             "inference_output_dir": None,
             "custom_checkpoint_path": "custom_checkpoint.pth",
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": False,
         },
     ),
     # reset training
@@ -194,6 +240,34 @@ test_cases = [
             "test_ratio": 0.0,
             "inference_output_dir": None,
             "custom_checkpoint_path": None,
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": False,
+        },
+    ),
+    # tuning of the batch size and dataloader instead of training
+    CliCase(
+        should_succeed=True,
+        command_lines=[
+            "--config config.yaml --main-data-csv-path main_data.csv --model-dir model_dir --training --tune",
+            "-c config.yaml -dt main_data.csv -m-dir model_dir -t -tune",
+        ],
+        expected_args={
+            "config_path": "config.yaml",
+            "main_data_csv_path": "main_data.csv",
+            "output_dir": os.path.normpath("model_dir"),
+            "training": True,
+            "resume": False,
+            "reset": False,
+            "val_csv_path": None,
+            "test_csv_path": None,
+            "val_ratio": 0.0,
+            "test_ratio": 0.0,
+            "inference_output_dir": None,
+            "custom_checkpoint_path": None,
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": True,
         },
     ),
     # both reset and resume training - resume takes precedence
@@ -216,6 +290,9 @@ test_cases = [
             "test_ratio": 0.0,
             "inference_output_dir": None,
             "custom_checkpoint_path": None,
+            "evaluation_csv_path": None,
+            "sweep_checkpoints": False,
+            "tune": False,
         },
     ),
 ]
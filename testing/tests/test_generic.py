@@ -1,8 +1,12 @@
 import os
+import copy
 import inspect
 import logging
 from pathlib import Path
+from types import SimpleNamespace
 
+import torch
+import pytest
 import pandas as pd
 from gandlf_synth.config_manager import ConfigManager
 from gandlf_synth.training_manager import TrainingManager
@@ -195,3 +199,229 @@ def test_training_manager_reset_resume():
             reset=False,
         )
         training_manager.run_training()
+
+
+def test_training_manager_checkpoint_retention():
+    """
+    Test the retention policy of the checkpoints and the links to the last and best ones.
+    """
+    test_name = inspect.currentframe().f_code.co_name
+    with ContextManagerTests(
+        test_dir=TEST_DIR, test_name=test_name, output_dir=OUTPUT_DIR
+    ):
+        global_config = copy.deepcopy(GLOBAL_CONFIG)
+        global_config["num_epochs"] = 4
+        global_config["checkpointing_config"] = {
+            "keep_last": 1,
+            "keep_every_n_epochs": 2,
+            "monitor_value": "reconstruction_loss",
+            "monitor_mode": "min",
+        }
+        training_manager = TrainingManager(
+            train_dataframe=EXAMPLE_DATAFRAME,
+            output_dir=OUTPUT_DIR,
+            global_config=global_config,
+            model_config=MODEL_CONFIG,
+            resume=False,
+            reset=True,
+        )
+        training_manager.run_training()
+        checkpoints_dir = os.path.join(OUTPUT_DIR, "checkpoints")
+        checkpoint_callback = training_manager.trainer.checkpoint_callback
+        checkpoint_filenames = set(os.listdir(checkpoints_dir))
+        retained_filenames = {"epoch=1-step=8.ckpt", "epoch=3-step=16.ckpt"}
+        best_filename = os.path.basename(checkpoint_callback.best_model_path)
+        retained_filenames.add(best_filename)
+        assert checkpoint_filenames == retained_filenames | {"last.ckpt", "best.ckpt"}
+        assert os.path.realpath(
+            os.path.join(checkpoints_dir, "last.ckpt")
+        ) == os.path.realpath(os.path.join(checkpoints_dir, "epoch=3-step=16.ckpt"))
+        assert os.path.realpath(
+            os.path.join(checkpoints_dir, "best.ckpt")
+        ) == os.path.realpath(os.path.join(checkpoints_dir, best_filename))
+
+
+def test_benchmark_manager_report(tmp_path):
+    """
+    Test the keys of the benchmark report written for a configuration.
+    """
+    import json
+    from gandlf_synth.cli.main_benchmark import main_benchmark
+    from gandlf_synth.utils.instrumentation_utils import StepTimingCallback
+
+    results_path = main_benchmark(
+        config_paths=[CONFIG_PATH],
+        output_dir=str(tmp_path),
+        n_samples=4,
+        n_steps=2,
+        n_warmup_steps=1,
+    )
+    with open(results_path, "r") as results_file:
+        results = json.load(results_file)
+
+    assert set(results) == {"environment", "benchmarks"}
+    assert len(results["benchmarks"]) == 1
+    benchmark = results["benchmarks"][0]
+    duration_keys = {"mean_seconds", "median_seconds", "min_seconds", "max_seconds"}
+    assert set(benchmark) == {
+        "config_path",
+        "model_name",
+        "n_dimensions",
+        "n_channels",
+        "tensor_shape",
+        "image_shape",
+        "n_samples",
+        "device",
+        "module_construction_seconds",
+        "dataloader",
+        "training_step",
+        "predict_step",
+        "image_writing",
+    }
+    assert set(benchmark["dataloader"]) == {
+        "n_batches",
+        "first_batch_seconds",
+        "samples_per_second",
+    }
+    assert set(benchmark["training_step"]) == {"n_steps", "batch_size"} | set(
+        StepTimingCallback.STAGES + ("total",)
+    )
+    assert benchmark["training_step"]["n_steps"] == 2
+    for stage in StepTimingCallback.STAGES + ("total",):
+        assert set(benchmark["training_step"][stage]) == duration_keys
+    assert (
+        set(benchmark["predict_step"])
+        == {"n_batches", "batch_size", "images_per_second"} | duration_keys
+    )
+    assert benchmark["predict_step"]["images_per_second"] > 0
+    assert set(benchmark["image_writing"]) == {
+        "n_images",
+        "images_per_second",
+        "megabytes_per_second",
+    }
+    assert benchmark["image_writing"]["n_images"] == 4
+
+
+def test_benchmark_manager_empty_prediction(tmp_path, monkeypatch):
+    """
+    Test the predict step results when the inference dataloader yields no batches.
+    """
+    from gandlf_synth import benchmark_manager
+    from gandlf_synth.models.modules.module_factory import ModuleFactory
+
+    monkeypatch.setattr(
+        benchmark_manager.InferenceDatasetFactory,
+        "get_inference_dataset",
+        lambda self: torch.utils.data.TensorDataset(torch.empty(0)),
+    )
+    manager = benchmark_manager.BenchmarkManager(
+        global_config=GLOBAL_CONFIG,
+        model_config=MODEL_CONFIG,
+        output_dir=str(tmp_path),
+        n_warmup_steps=0,
+    )
+    module = ModuleFactory(
+        model_config=MODEL_CONFIG, model_dir=str(tmp_path)
+    ).get_module()
+
+    prediction_results = manager._benchmark_prediction(
+        module, EXAMPLE_DATAFRAME, str(tmp_path)
+    )
+    assert prediction_results["n_batches"] == 0
+    assert prediction_results["images_per_second"] is None
+    assert prediction_results["median_seconds"] is None
+
+
+def _batch_size_tuning_manager(batch_size: int, out_of_memory_threshold: int):
+    """
+    Stand-in for the training manager, whose batch size trials run out of memory
+    above the threshold.
+    """
+    tried_batch_sizes = []
+
+    def run_batch_size_trial(trial_batch_size, n_steps, initial_state):
+        tried_batch_sizes.append(trial_batch_size)
+        if trial_batch_size > out_of_memory_threshold:
+            return None
+        return float(trial_batch_size)
+
+    training_manager = SimpleNamespace(
+        global_config={"batch_size": batch_size},
+        module=torch.nn.Linear(2, 2),
+        logger=LOGGER_OBJECT,
+        _run_batch_size_trial=run_batch_size_trial,
+    )
+    return training_manager, tried_batch_sizes
+
+
+def test_training_manager_tune_batch_size():
+    """
+    Test the doubling and the binary search of the batch size tuning.
+    """
+    training_manager, tried_batch_sizes = _batch_size_tuning_manager(4, 37)
+    batch_size, trials = TrainingManager._tune_batch_size(training_manager, {})
+    assert batch_size == 37
+    assert tried_batch_sizes == [4, 8, 16, 32, 64, 48, 40, 36, 38, 37]
+    assert trials == {
+        size: (float(size) if size <= 37 else None) for size in tried_batch_sizes
+    }
+
+    # the search stops at the maximum batch size, also above the configured one
+    for configured_batch_size in (4, 100):
+        training_manager, tried_batch_sizes = _batch_size_tuning_manager(
+            configured_batch_size, 1000
+        )
+        batch_size, _ = TrainingManager._tune_batch_size(
+            training_manager, {"max_batch_size": 50}
+        )
+        assert batch_size == 50
+        assert max(tried_batch_sizes) == 50
+
+    training_manager, tried_batch_sizes = _batch_size_tuning_manager(4, 0)
+    with pytest.raises(AssertionError, match="Even a batch size of 1"):
+        TrainingManager._tune_batch_size(training_manager, {})
+    assert tried_batch_sizes == [4, 2, 1]
+    with pytest.raises(AssertionError, match="At least 2 steps"):
+        TrainingManager._tune_batch_size(training_manager, {"n_steps_per_trial": 1})
+
+
+def test_training_manager_tune_dataloader(monkeypatch):
+    """
+    Test the sweep of the dataloader workers, stopping at the cheapest configuration
+    saturating the training steps.
+    """
+    from gandlf_synth import training_manager as training_manager_module
+
+    measured_configs = []
+
+    def measure_dataloader_throughput(dataset, batch_size, dataloader_params):
+        measured_configs.append(
+            (dataloader_params["num_workers"], dataloader_params["prefetch_factor"])
+        )
+        return 10.0 + 50.0 * dataloader_params["num_workers"]
+
+    monkeypatch.setattr(
+        training_manager_module,
+        "measure_dataloader_throughput",
+        measure_dataloader_throughput,
+    )
+    training_manager = SimpleNamespace(
+        global_config={"dataloader_config": {"train": {"shuffle": True}}},
+        train_dataloader=SimpleNamespace(dataset=None),
+        logger=LOGGER_OBJECT,
+    )
+    tuning_config = {"num_workers": [4, 0, 1, 2], "prefetch_factor": [2, 4]}
+
+    selected_trial, saturating, trials = TrainingManager._tune_dataloader(
+        training_manager, tuning_config, 8, 80.0
+    )
+    assert saturating
+    assert selected_trial["num_workers"] == 2
+    assert measured_configs == [(0, None), (1, 2), (1, 4), (2, 2), (2, 4)]
+    assert len(trials) == len(measured_configs)
+
+    selected_trial, saturating, _ = TrainingManager._tune_dataloader(
+        training_manager, tuning_config, 8, 1000.0
+    )
+    assert not saturating
+    assert selected_trial["num_workers"] == 4
@@ -0,0 +1,384 @@
+import pytest
+import torch
+from copy import deepcopy
+from torch import nn
+
+from gandlf_synth.to_port_to_gandlf_core.metrics import synthesis
+from gandlf_synth.to_port_to_gandlf_core.metrics.synthesis import (
+    StreamingFrechetInceptionDistance,
+    StreamingKernelInceptionDistance,
+    StreamingPrecisionRecall,
+    StreamingStructuralSimilarity,
+    StreamingMultiScaleStructuralSimilarity,
+)
+from gandlf_synth.to_port_to_gandlf_core.metrics.utils.functional.ssim import (
+    structural_similarity,
+    multiscale_structural_similarity,
+)
+from gandlf_synth.to_port_to_gandlf_core.metrics.utils.inception_features import (
+    compute_kid,
+    compute_precision_recall,
+)
+
+from testing.testing_utils import StubFeatureExtractor
+
+N_CHANNELS = 1
+FEATURES_SIZE = 64
+
+
+@pytest.fixture
+def stub_feature_extractor(monkeypatch):
+    feature_extractor = StubFeatureExtractor(N_CHANNELS)
+    monkeypatch.setitem(
+        synthesis._INCEPTION_FEATURE_EXTRACTORS,
+        (FEATURES_SIZE, N_CHANNELS),
+        feature_extractor,
+    )
+    return feature_extractor
+
+
+def _features_metric_params(metric_name: str, **metric_config) -> dict:
+    return {
+        "model": {"dimension": 2, "num_channels": N_CHANNELS},
+        "metrics_config": {
+            metric_name: {"features_size": FEATURES_SIZE, **metric_config}
+        },
+    }
+
+
+def _random_images(n_images: int, seed: int, size: int = 32) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(seed)
+    return torch.rand(n_images, N_CHANNELS, size, size, generator=generator)
+
+
+def test_streaming_fid_matches_single_batch(stub_feature_extractor):
+    generated_images, real_images = _random_images(24, 1), _random_images(24, 2)
+    streaming_fid = StreamingFrechetInceptionDistance(_features_metric_params("fid"))
+    for generated_batch, real_batch in zip(
+        generated_images.split(5), real_images.split(5)
+    ):
+        streaming_fid.update(generated_batch, real_batch)
+    single_batch_fid = StreamingFrechetInceptionDistance(_features_metric_params("fid"))
+    single_batch_fid.update(generated_images, real_images)
+
+    assert torch.allclose(streaming_fid.compute(), single_batch_fid.compute())
+
+
+@pytest.mark.parametrize(
+    "metric_class, metric_name",
+    [
+        (StreamingFrechetInceptionDistance, "fid"),
+        (StreamingKernelInceptionDistance, "kid"),
+        (StreamingPrecisionRecall, "precision_recall"),
+    ],
+)
+def test_reference_features_skip_real_images(
+    stub_feature_extractor, metric_class, metric_name
+):
+    generated_images, real_images = _random_images(24, 1), _random_images(24, 2)
+    params = _features_metric_params(metric_name, subsets=10, subset_size=8)
+    metric = metric_class(params)
+    metric.update(generated_images, real_images)
+    expected = metric.compute()
+
+    reference_metric = metric_class(params)
+    reference_metric.set_reference_features(
+        stub_feature_extractor((real_images * 255).byte())
+    )
+    for _ in range(2):
+        # the reference features must survive the reset between epochs
+        reference_metric.reset()
+        stub_feature_extractor.n_extracted_images = 0
+        reference_metric.update(generated_images, torch.zeros_like(real_images))
+        assert stub_feature_extractor.n_extracted_images == len(generated_images)
+        result = reference_metric.compute()
+        if isinstance(expected, dict):
+            for name, value in expected.items():
+                assert torch.allclose(result[name], value)
+        else:
+            assert torch.allclose(result, expected)
+
+
+def test_identical_features_kid_and_precision_recall():
+    features = torch.randn(400, 8, generator=torch.Generator().manual_seed(0))
+    kid = compute_kid(
+        features,
+        features.clone(),
+        subsets=20,
+        subset_size=200,
+        max_kernel_matrix_elements=2**24,
+        generator=torch.Generator().manual_seed(0),
+    )
+    different_kid = compute_kid(
+        features,
+        features + 1,
+        subsets=20,
+        subset_size=200,
+        max_kernel_matrix_elements=2**24,
+        generator=torch.Generator().manual_seed(0),
+    )
+    precision_recall = compute_precision_recall(
+        features, features.clone(), k=3, max_distance_matrix_elements=2**24
+    )
+
+    assert kid["kid_mean"].abs() < 0.05 * different_kid["kid_mean"]
+    assert precision_recall["precision"] == 1
+    assert precision_recall["recall"] == 1
+
+
+def test_chunked_kid_and_precision_recall_match_unchunked():
+    generator = torch.Generator().manual_seed(0)
+    real_features = torch.randn(60, 8, generator=generator)
+    fake_features = torch.randn(50, 8, generator=generator) * 1.5 + 0.3
+    kid, chunked_kid = [
+        compute_kid(
+            real_features,
+            fake_features,
+            subsets=12,
+            subset_size=20,
+            max_kernel_matrix_elements=max_elements,
+            generator=torch.Generator().manual_seed(42),
+        )
+        # a single subset per batch of kernel matrices for the chunked version
+        for max_elements in (2**24, 3 * 20**2)
+    ]
+    precision_recall, chunked_precision_recall = [
+        compute_precision_recall(
+            real_features, fake_features, k=3, max_distance_matrix_elements=max_elements
+        )
+        # a few rows of the distance matrices at once for the chunked version
+        for max_elements in (2**24, 7 * 60)
+    ]
+
+    for name in ("kid_mean", "kid_std"):
+        assert torch.allclose(kid[name], chunked_kid[name])
+    for name in ("precision", "recall"):
+        assert precision_recall[name] == chunked_precision_recall[name]
+    assert 0 < precision_recall["precision"] < 1
+
+
+def test_kid_single_subset_std():
+    generator = torch.Generator().manual_seed(0)
+    real_features = torch.randn(30, 8, generator=generator)
+    fake_features = torch.randn(30, 8, generator=generator) + 0.5
+    kid = compute_kid(
+        real_features,
+        fake_features,
+        subsets=1,
+        subset_size=20,
+        max_kernel_matrix_elements=2**24,
+        generator=torch.Generator().manual_seed(0),
+    )
+
+    assert torch.isfinite(kid["kid_mean"])
+    assert kid["kid_std"] == 0
+
+
+@pytest.fixture
+def random_lpips_backbones(monkeypatch):
+    """
+    Builds the LPIPS networks with randomly initialized backbones, so the
+    pretrained weights are not downloaded.
+    """
+    from functools import partial
+    from gandlf_synth.to_port_to_gandlf_core.metrics.utils.functional import lpips
+
+    torch.manual_seed(0)
+    monkeypatch.setattr(lpips, "_LPIPS_BACKBONES", {})
+    monkeypatch.setattr(
+        lpips,
+        "_NoTrainLpipsLPIPSGandlf",
+        partial(lpips._NoTrainLpipsLPIPSGandlf, pnet_rand=True),
+    )
+    return lpips
+
+
+def _two_pass_lpips(net: nn.Module, img1: torch.Tensor, img2: torch.Tensor):
+    """
+    Reference LPIPS forward passing each input through the backbone separately.
+    """
+    from gandlf_synth.to_port_to_gandlf_core.metrics.utils.functional.lpips import (
+        _normalize_tensor,
+        _spatial_average,
+    )
+
+    outs1 = net.net(net.scaling_layer(2 * img1 - 1))
+    outs2 = net.net(net.scaling_layer(2 * img2 - 1))
+    return sum(
+        _spatial_average(
+            net.lins[kk](
+                (_normalize_tensor(outs1[kk]) - _normalize_tensor(outs2[kk])) ** 2
+            ),
+            n_dims=net.n_dim,
+            keep_dim=True,
+        )
+        for kk in range(net.L)
+    )
+
+
+def test_lpips_single_pass_matches_two_passes(random_lpips_backbones):
+    img1, img2 = _random_images(4, 1, size=64), _random_images(4, 2, size=64)
+    net = random_lpips_backbones.get_lpips_backbone("alex", N_CHANNELS, 2)
+
+    with torch.no_grad():
+        assert torch.allclose(
+            net(img1, img2, normalize=True), _two_pass_lpips(net, img1, img2), atol=1e-6
+        )
+
+
+def test_lpips_streaming_matches_single_call(random_lpips_backbones):
+    from gandlf_synth.to_port_to_gandlf_core.metrics.utils.lpip import LPIPSGandlf
+
+    img1, img2 = _random_images(10, 1, size=64), _random_images(10, 2, size=64)
+    metric = LPIPSGandlf(n_channels=N_CHANNELS, normalize=True)
+    for batch1, batch2 in zip(img1.split(3), img2.split(3)):
+        metric.update(batch1, batch2)
+    single_call = random_lpips_backbones.learned_perceptual_image_patch_similarity(
+        img1, img2, normalize=True, n_channels=N_CHANNELS
+    )
+
+    assert torch.allclose(metric.compute(), single_call, atol=1e-6)
+
+
+def test_lpips_shared_backbone_not_cast_by_callers(random_lpips_backbones):
+    from gandlf_synth.to_port_to_gandlf_core.metrics.utils.lpip import LPIPSGandlf
+
+    img1, img2 = _random_images(2, 1, size=64), _random_images(2, 2, size=64)
+    metric = LPIPSGandlf(n_channels=N_CHANNELS, normalize=True)
+    double_score = random_lpips_backbones.learned_perceptual_image_patch_similarity(
+        img1.double(), img2.double(), normalize=True, n_channels=N_CHANNELS
+    )
+    metric.to(torch.float64)
+    metric.update(img1, img2)
+
+    assert double_score.dtype == torch.float64
+    assert all(param.dtype == torch.float32 for param in metric.net.parameters())
+    assert torch.allclose(metric.compute().double(), double_score, atol=1e-5)
+
+
+@pytest.mark.parametrize("net_type", ["alex", "vgg", "squeeze"])
+def test_lpips_input_layer_from_rgb_filters(random_lpips_backbones, net_type):
+    net = random_lpips_backbones._NoTrainLpipsLPIPSGandlf(n_dim=2, net=net_type)
+    gray_images = _random_images(2, 1, size=64)
+    with torch.no_grad():
+        rgb_features = net.net(gray_images.expand(-1, 3, -1, -1))
+    nets = [net, deepcopy(net)]
+    # the input layer does not depend on the random state
+    for seed, modified_net in enumerate(nets):
+        torch.manual_seed(seed)
+        random_lpips_backbones.modify_net_input(modified_net, net_type, 1)
+
+    for parameter, other_parameter in zip(nets[0].parameters(), nets[1].parameters()):
+        assert torch.equal(parameter, other_parameter)
+    with torch.no_grad():
+        features = net.net(gray_images)
+    for feature, rgb_feature in zip(features, rgb_features):
+        assert torch.allclose(feature, rgb_feature, atol=1e-5)
+
+
+def _ssim_image_pair(shape: tuple, seed: int = 0) -> tuple:
+    generator = torch.Generator().manual_seed(seed)
+    target = torch.rand(shape, generator=generator)
+    preds = (target + 0.1 * torch.randn(shape, generator=generator)).clamp(0, 1)
+    return preds, target
+
+
+def test_ssim_matches_torchmetrics():
+    from torchmetrics.functional.image import (
+        structural_similarity_index_measure,
+        multiscale_structural_similarity_index_measure,
+    )
+
+    preds, target = _ssim_image_pair((3, 2, 48, 48))
+    ms_preds, ms_target = _ssim_image_pair((2, 1, 176, 176))
+
+    assert torch.allclose(
+        structural_similarity(preds, target, data_range=1.0),
+        structural_similarity_index_measure(preds, target, data_range=1.0),
+        atol=1e-5,
+    )
+    assert torch.allclose(
+        multiscale_structural_similarity(ms_preds, ms_target, data_range=1.0),
+        multiscale_structural_similarity_index_measure(
+            ms_preds, ms_target, data_range=1.0, normalize="relu"
+        ),
+        atol=1e-5,
+    )
+
+
+def test_ssim_identical_3d_images():
+    images = torch.rand(2, 1, 24, 24, 24, generator=torch.Generator().manual_seed(0))
+
+    assert torch.allclose(
+        structural_similarity(images, images.clone(), reduction="none"),
+        torch.ones(2),
+        atol=1e-5,
+    )
+    # two scales, so the images are large enough
+    assert torch.allclose(
+        multiscale_structural_similarity(
+            images, images.clone(), betas=(0.5, 0.5), reduction="none"
+        ),
+        torch.ones(2),
+        atol=1e-5,
+    )
+
+
+@pytest.mark.parametrize(
+    "ssim_function, image_size",
+    [(structural_similarity, 32), (multiscale_structural_similarity, 176)],
+)
+def test_ssim_reductions(ssim_function, image_size):
+    preds, target = _ssim_image_pair((4, 1, image_size, image_size))
+    scores = ssim_function(preds, target, data_range=1.0, reduction="none")
+
+    assert scores.shape == (4,)
+    assert torch.allclose(
+        ssim_function(preds, target, data_range=1.0, reduction="sum"), scores.sum()
+    )
+    assert torch.allclose(
+        ssim_function(preds, target, data_range=1.0, reduction="elementwise_mean"),
+        scores.mean(),
+    )
+    with pytest.raises(AssertionError, match="Invalid reduction"):
+        ssim_function(preds, target, reduction="max")
+    with pytest.raises(AssertionError, match="Invalid reduction"):
+        StreamingStructuralSimilarity(
+            {"metrics_config": {"ssim": {"reduction": "none"}}}
+        )
+
+
+def test_ssim_minimum_image_size():
+    preds, target = _ssim_image_pair((1, 1, 10, 10))
+    with pytest.raises(AssertionError, match="at least 11 voxels"):
+        structural_similarity(preds, target)
+    preds, target = _ssim_image_pair((1, 1, 160, 160))
+    with pytest.raises(AssertionError, match="at least 161 voxels"):
+        multiscale_structural_similarity(preds, target)
+    # the minimum size depends on the number of scales
+    multiscale_structural_similarity(preds, target, betas=(0.5, 0.5))
+
+
+@pytest.mark.parametrize(
+    "metric_class, image_size",
+    [
+        (StreamingStructuralSimilarity, 32),
+        (StreamingMultiScaleStructuralSimilarity, 176),
+    ],
+)
+@pytest.mark.parametrize("reduction", ["elementwise_mean", "sum"])
+def test_streaming_ssim_matches_single_batch(metric_class, image_size, reduction):
+    preds, target = _ssim_image_pair((7, 1, image_size, image_size))
+    # a fixed data range, otherwise it depends on the images of every batch
+    params = {
+        "metrics_config": {
+            metric_class.metric_name: {"data_range": 1.0, "reduction": reduction}
+        }
+    }
+    streaming_metric = metric_class(params)
+    for preds_batch, target_batch in zip(preds.split(3), target.split(3)):
+        streaming_metric.update(preds_batch, target_batch)
+    single_batch_metric = metric_class(params)
+    single_batch_metric.update(preds, target)
+
+    assert torch.allclose(streaming_metric.compute(), single_batch_metric.compute())
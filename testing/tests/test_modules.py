@@ -1,17 +1,26 @@
 import os
+import time
+import pickle
 import inspect
 import logging
 from pathlib import Path
+import yaml
+import torch
 import pytest
 import pandas as pd
+from typing import Optional
+from torch.utils._pytree import tree_flatten
+from torch.utils._python_dispatch import TorchDispatchMode
 from gandlf_synth.config_manager import ConfigManager
 from gandlf_synth.training_manager import TrainingManager
 from gandlf_synth.inference_manager import InferenceManager
+from gandlf_synth.models.modules.module_factory import ModuleFactory
 from testing.testing_utils import (
     ContextManagerTests,
     set_3d_dataloader_resize,
     set_input_tensor_shapes_to_3d,
     create_csv_modality_labeling_type_path,
+    StubFeatureExtractor,
 )
 
 TEST_DIR = Path(__file__).parent.absolute().__str__()
@@ -121,3 +130,465 @@ def test_module_config_pairs():
         assert (
             config in available_modules
         ), f"Config {config} does not have a corresponding module"
+
+
+def _train_vqvae_for_latent_models(vqvae_dir: str, modality: str) -> None:
+    config_path = os.path.join(TEST_DIR, "../configs/module_config_vqvae.yaml")
+    global_config, model_config = ConfigManager(config_path).prepare_configs()
+    csv_dataframe = create_csv_modality_labeling_type_path(
+        GENERAL_DATA_DIR, modality, "unlabeled"
+    )
+    training_manager = TrainingManager(
+        train_dataframe=pd.read_csv(csv_dataframe),
+        output_dir=vqvae_dir,
+        global_config=global_config,
+        model_config=model_config,
+        resume=False,
+        reset=False,
+    )
+    training_manager.run_training()
+
+
+def _prepare_latent_ddpm_config(
+    vqvae_dir: str, config_dir: str, latent_codes_manifest: Optional[str] = None
+) -> str:
+    config_path = os.path.join(TEST_DIR, "../configs/module_config_latent_ddpm.yaml")
+    with open(config_path, "r") as config_file:
+        config = yaml.safe_load(config_file)
+    config["model_config"]["vqvae_model_dir"] = vqvae_dir
+    config["model_config"]["latent_codes_manifest"] = latent_codes_manifest
+    latent_config_path = os.path.join(config_dir, "module_config_latent_ddpm.yaml")
+    with open(latent_config_path, "w") as config_file:
+        yaml.dump(config, config_file)
+    return latent_config_path
+
+
+def test_latent_ddpm_module(tmp_path):
+    vqvae_dir = str(tmp_path / "vqvae_run")
+    _train_vqvae_for_latent_models(vqvae_dir, "2d_rad")
+    latent_config_path = _prepare_latent_ddpm_config(vqvae_dir, str(tmp_path))
+    run_test(latent_config_path, "2d_rad", 2, "unlabeled")
+
+
+def test_latent_ddpm_module_from_latent_codes_manifest(tmp_path):
+    from gandlf_synth.encoding_manager import LatentEncodingManager
+    from gandlf_synth.data.datasets import LatentCodesDataset
+
+    vqvae_dir = str(tmp_path / "vqvae_run")
+    _train_vqvae_for_latent_models(vqvae_dir, "2d_rad")
+    global_config, vqvae_model_config = ConfigManager(
+        os.path.join(TEST_DIR, "../configs/module_config_vqvae.yaml")
+    ).prepare_configs()
+    dataframe = pd.read_csv(
+        create_csv_modality_labeling_type_path(GENERAL_DATA_DIR, "2d_rad", "unlabeled")
+    )
+    manifest_path = LatentEncodingManager(
+        global_config=global_config,
+        model_config=vqvae_model_config,
+        model_dir=vqvae_dir,
+        output_dir=str(tmp_path / "latent_codes"),
+        dataframe=dataframe,
+    ).run_encoding()
+    latent_config_path = _prepare_latent_ddpm_config(
+        vqvae_dir, str(tmp_path), latent_codes_manifest=manifest_path
+    )
+    global_config, model_config = ConfigManager(latent_config_path).prepare_configs()
+    global_config["num_epochs"] = 1
+    output_dir = str(tmp_path / "latent_ddpm_run")
+
+    training_manager = TrainingManager(
+        train_dataframe=dataframe,
+        output_dir=output_dir,
+        global_config=global_config,
+        model_config=model_config,
+        resume=False,
+        reset=False,
+    )
+    assert isinstance(training_manager.train_dataloader.dataset, LatentCodesDataset)
+    training_manager.run_training()
+    assert training_manager.trainer.global_step > 0
+    assert os.path.exists(os.path.join(output_dir, "checkpoints", "last.ckpt"))
+
+
+@pytest.mark.benchmark
+def test_latent_ddpm_throughput(tmp_path):
+    """
+    Compare the throughput of a single noise prediction training step of the
+    pixel-space DDPM and the latent DDPM on the same batch of images.
+    """
+    vqvae_dir = str(tmp_path / "vqvae_run")
+    _train_vqvae_for_latent_models(vqvae_dir, "2d_rad")
+    config_paths = {
+        "pixel": os.path.join(TEST_DIR, "../configs/module_config_ddpm.yaml"),
+        "latent": _prepare_latent_ddpm_config(vqvae_dir, str(tmp_path)),
+    }
+    n_repeats = 3
+    images = torch.randn(2, 2, 64, 64)
+    step_times = {}
+    for name, config_path in config_paths.items():
+        _, model_config = ConfigManager(config_path).prepare_configs()
+        module = ModuleFactory(
+            model_config=model_config, model_dir=str(tmp_path)
+        ).get_module()
+        module.train()
+        x = module._prepare_diffusion_inputs(images)
+        timesteps = torch.zeros(x.shape[0], dtype=torch.long)
+        start = time.perf_counter()
+        for _ in range(n_repeats):
+            noise = torch.randn_like(x)
+            noise_pred = module.inferer(
+                inputs=x, diffusion_model=module.model, noise=noise, timesteps=timesteps
+            )
+            module.losses(noise_pred, noise).backward()
+        step_times[name] = (time.perf_counter() - start) / n_repeats
+        assert noise_pred.shape == x.shape
+    LOGGER_OBJECT.info(
+        f"DDPM training step time, pixel space: {step_times['pixel']:.4f}s, "
+        f"latent space: {step_times['latent']:.4f}s, "
+        f"speedup: {step_times['pixel'] / step_times['latent']:.2f}x"
+    )
+
+
+def _save_module_checkpoint(module: torch.nn.Module, model_dir: str) -> str:
+    checkpoints_dir = os.path.join(model_dir, "checkpoints")
+    os.makedirs(checkpoints_dir, exist_ok=True)
+    checkpoint_path = os.path.join(checkpoints_dir, "best.ckpt")
+    torch.save({"state_dict": module.state_dict()}, checkpoint_path)
+    return checkpoint_path
+
+
+def test_encode_dataset_latent_codes(tmp_path):
+    from gandlf_synth.encoding_manager import LatentEncodingManager
+    from gandlf_synth.data.datasets import LatentCodesDataset
+
+    config_path = os.path.join(TEST_DIR, "../configs/module_config_vqvae.yaml")
+    global_config, model_config = ConfigManager(config_path).prepare_configs()
+    model_dir = str(tmp_path / "vqvae_run")
+    module = ModuleFactory(model_config=model_config, model_dir=model_dir).get_module()
+    _save_module_checkpoint(module, model_dir)
+    dataframe = pd.read_csv(
+        create_csv_modality_labeling_type_path(GENERAL_DATA_DIR, "2d_rad", "unlabeled")
+    )
+
+    encoding_manager = LatentEncodingManager(
+        global_config=global_config,
+        model_config=model_config,
+        model_dir=model_dir,
+        output_dir=str(tmp_path / "latent_codes"),
+        dataframe=dataframe,
+    )
+    manifest_path = encoding_manager.run_encoding()
+    dataset = LatentCodesDataset(manifest_path)
+    embeddings_dataset = LatentCodesDataset(
+        manifest_path, return_embeddings=True, preload=False
+    )
+
+    assert len(dataset) == len(dataframe)
+    codes = torch.stack([dataset[index] for index in range(len(dataset))])
+    assert codes.dtype == torch.long
+    assert list(codes.shape[1:]) == dataset.manifest["latent_shape"]
+    with torch.no_grad():
+        images = torch.cat(list(encoding_manager.dataloader))
+        expected_codes = module.eval().model.encode_to_indices(images)
+    assert torch.equal(codes, expected_codes)
+    assert torch.equal(
+        embeddings_dataset[0], module.model.quantizer.embed(expected_codes[:1])[0]
+    )
+
+
+def test_ddpm_timesteps_per_sample():
+    from unittest.mock import patch
+
+    config_path = os.path.join(TEST_DIR, "../configs/module_config_ddpm.yaml")
+    _, model_config = ConfigManager(config_path).prepare_configs()
+    model_config.timesteps_per_sample = 3
+    module = ModuleFactory(model_config=model_config, model_dir=OUTPUT_DIR).get_module()
+    unet_inputs = []
+    module.model.register_forward_pre_hook(
+        lambda model, args, kwargs: unet_inputs.append(kwargs), with_kwargs=True
+    )
+    batch = torch.randn(2, *module._get_sample_shape())
+
+    with patch.object(module, "_step_log"):
+        module.on_train_epoch_start()
+        loss = module.training_step(batch, 0)
+        assert set(module._running_means["train"]) == {"loss"}
+        module.training_step(batch, 1)
+        assert set(module._running_means["train"]) == {
+            "loss",
+            "loaded_samples_per_second",
+            "unet_samples_per_second",
+        }
+        # the first step of the next epoch is not compared with the last one
+        module._running_means.clear()
+        module.on_train_epoch_start()
+        module.training_step(batch, 0)
+        assert set(module._running_means["train"]) == {"loss"}
+
+    assert torch.isfinite(loss)
+    # every loaded sample is diffused with 3 timesteps
+    assert len(unet_inputs) == 3
+    for unet_kwargs in unet_inputs:
+        assert unet_kwargs["x"].shape == (6, *batch.shape[1:])
+        assert unet_kwargs["timesteps"].shape == (6,)
+
+
+def test_module_tracked_values_epoch_log():
+    import lightning.pytorch as pl
+    from unittest.mock import patch
+
+    config_path = os.path.join(TEST_DIR, "../configs/module_config_vqvae.yaml")
+    _, model_config = ConfigManager(config_path).prepare_configs()
+    model_config.log_every_n_steps = 2
+    module = ModuleFactory(model_config=model_config, model_dir=OUTPUT_DIR).get_module()
+    module.trainer = pl.Trainer(
+        accelerator="cpu", logger=False, enable_progress_bar=False
+    )
+    step_losses = {
+        "train": [1.0, 2.0, 3.0, 6.0, 8.0],
+        "val": [torch.tensor([0.5, 1.5]), torch.tensor(4.0)],
+    }
+
+    with patch.object(module, "_step_log") as step_log:
+        for phase, losses in step_losses.items():
+            for batch_idx, loss in enumerate(losses):
+                module._track_values({f"{phase}_loss": loss}, phase, batch_idx)
+    assert [call.args[0] for call in step_log.call_args_list] == [
+        {"train_loss": 1.0},
+        {"train_loss": 3.0},
+        {"train_loss": 8.0},
+        {"val_loss": step_losses["val"][0]},
+    ]
+
+    with patch.object(module, "log_dict") as log_dict:
+        module._epoch_log("train")
+        assert set(module._running_means.keys()) == {"val"}
+        module._epoch_log("val")
+        assert module._running_means == {}
+        module._epoch_log("train")
+    assert log_dict.call_count == 2
+    train_means, val_means = [call.args[0] for call in log_dict.call_args_list]
+    assert train_means == {"train_loss": torch.tensor(4.0)}
+    assert val_means == {"val_loss": torch.tensor(2.0)}
+
+
+def test_evaluation_checkpoints_order(tmp_path):
+    from types import SimpleNamespace
+
+    checkpoints_dir = tmp_path / "checkpoints"
+    checkpoints_dir.mkdir()
+    for epoch in (2, 10, 1):
+        (checkpoints_dir / f"epoch={epoch}.ckpt").touch()
+    os.symlink("epoch=10.ckpt", checkpoints_dir / "last.ckpt")
+    os.symlink("epoch=2.ckpt", checkpoints_dir / "best.ckpt")
+    (checkpoints_dir / "checkpoint.ckpt.tmp").touch()
+    inference_manager = SimpleNamespace(sweep_checkpoints=True, model_dir=str(tmp_path))
+
+    assert InferenceManager._get_checkpoints_to_evaluate(inference_manager) == [
+        str(checkpoints_dir / f"epoch={epoch}.ckpt") for epoch in (1, 2, 10)
+    ]
+
+
+def test_evaluation_checkpoint_sweep(tmp_path, monkeypatch):
+    from gandlf_synth.to_port_to_gandlf_core.metrics import synthesis
+
+    config_path = os.path.join(TEST_DIR, "../configs/module_config_dcgan.yaml")
+    global_config, model_config = ConfigManager(config_path).prepare_configs()
+    global_config["metrics"] = ["mean_squared_error", "fid"]
+    feature_extractor = StubFeatureExtractor(model_config.n_channels)
+    # the reference features are extracted with the size of the stub features
+    for features_size in (2048, feature_extractor.num_features):
+        monkeypatch.setitem(
+            synthesis._INCEPTION_FEATURE_EXTRACTORS,
+            (features_size, model_config.n_channels),
+            feature_extractor,
+        )
+    model_dir = str(tmp_path / "dcgan_run")
+    module = ModuleFactory(model_config=model_config, model_dir=model_dir).get_module()
+    checkpoint_path = _save_module_checkpoint(module, model_dir)
+    for epoch in (1, 2):
+        os.link(
+            checkpoint_path,
+            os.path.join(model_dir, "checkpoints", f"epoch={epoch}.ckpt"),
+        )
+    os.remove(checkpoint_path)
+    os.symlink("epoch=2.ckpt", os.path.join(model_dir, "checkpoints", "last.ckpt"))
+    dataframe = pd.read_csv(
+        create_csv_modality_labeling_type_path(GENERAL_DATA_DIR, "2d_rad", "unlabeled")
+    )
+
+    inference_manager = InferenceManager(
+        global_config=global_config,
+        model_config=model_config,
+        model_dir=model_dir,
+        output_dir=str(tmp_path / "inference"),
+        evaluation_dataframe=dataframe,
+        sweep_checkpoints=True,
+    )
+    # the reference features are extracted once, before the sweep
+    assert feature_extractor.n_extracted_images == len(dataframe)
+    inference_manager.run_inference()
+
+    fid = inference_manager.evaluator.metrics["fid"]
+    assert fid.reference_features is not None
+    assert feature_extractor.n_extracted_images == len(dataframe) + 2 * len(dataframe)
+    output_files = set(os.listdir(inference_manager.output_dir))
+    for checkpoint_name in ("epoch=1", "epoch=2"):
+        assert f"evaluation_report_{checkpoint_name}.json" in output_files
+        assert f"evaluation_report_{checkpoint_name}.csv" in output_files
+    checkpoints_evaluation = pd.read_csv(
+        os.path.join(inference_manager.output_dir, "checkpoints_evaluation.csv")
+    )
+    assert list(checkpoints_evaluation["checkpoint"]) == ["epoch=1", "epoch=2"]
+    assert {"mean_squared_error", "fid"} <= set(checkpoints_evaluation.columns)
+
+
+def _save_untrained_vqvae_run(vqvae_dir: str) -> None:
+    config_path = os.path.join(TEST_DIR, "../configs/module_config_vqvae.yaml")
+    global_config, model_config = ConfigManager(config_path).prepare_configs()
+    module = ModuleFactory(model_config=model_config, model_dir=vqvae_dir).get_module()
+    _save_module_checkpoint(module, vqvae_dir)
+    with open(os.path.join(vqvae_dir, "parameters.pkl"), "wb") as pickle_file:
+        pickle.dump(
+            {"global_config": global_config, "model_config": model_config}, pickle_file
+        )
+
+
+class _RealTensorsRecorder(TorchDispatchMode):
+    """
+    Records the operators producing tensors outside of the meta device.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.real_tensor_operators = []
+
+    def __torch_dispatch__(self, func, types, args=(), kwargs=None):
+        outputs = func(*args, **(kwargs or {}))
+        if any(
+            isinstance(output, torch.Tensor) and not output.is_meta
+            for output in tree_flatten(outputs)[0]
+        ):
+            self.real_tensor_operators.append(str(func))
+        return outputs
+
+
+@pytest.mark.parametrize("config_name", ["dcgan", "vqvae", "ddpm", "latent_ddpm"])
+def test_estimate_model_cost(config_name, tmp_path):
+    from gandlf_synth.utils.cost_estimation_utils import estimate_model_cost
+
+    if config_name == "latent_ddpm":
+        vqvae_dir = str(tmp_path / "vqvae_run")
+        _save_untrained_vqvae_run(vqvae_dir)
+        config_path = _prepare_latent_ddpm_config(vqvae_dir, str(tmp_path))
+    else:
+        config_path = os.path.join(
+            TEST_DIR, f"../configs/module_config_{config_name}.yaml"
+        )
+    global_config, model_config = ConfigManager(config_path).prepare_configs()
+
+    recorder = _RealTensorsRecorder()
+    with recorder:
+        cost_estimate = estimate_model_cost(global_config, model_config, batch_size=2)
+
+    assert recorder.real_tensor_operators == []
+    module = ModuleFactory(
+        model_config=model_config, model_dir=str(tmp_path)
+    ).get_module()
+    assert cost_estimate["n_parameters"] == sum(
+        parameter.numel() for parameter in module.parameters()
+    )
+    assert len(cost_estimate["forward_passes"]) > 0
+    for pass_name, forward_pass in cost_estimate["forward_passes"].items():
+        assert forward_pass["flops"] > 0, pass_name
+        assert forward_pass["activation_bytes"] > 0, pass_name
+        for block_name, block in forward_pass["blocks"].items():
+            assert block["flops"] > 0, f"{pass_name}: {block_name}"
+
+
+def _module_test_outputs(module: torch.nn.Module) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(0)
+    module.eval()
+    with torch.no_grad():
+        if hasattr(module, "fixed_latent_vector"):
+            return module(module.fixed_latent_vector)
+        if hasattr(module, "inferer"):
+            samples = torch.randn(2, *module._get_sample_shape(), generator=generator)
+            return module.model(samples, timesteps=torch.full((2,), 10))
+        model_config = module.model_config
+        images = torch.randn(
+            2, model_config.n_channels, *model_config.tensor_shape, generator=generator
+        )
+        return module(images)[0]
+
+
+@pytest.mark.parametrize("config_name", ["dcgan", "vqvae", "ddpm", "latent_ddpm"])
+def test_module_restored_on_meta_device(config_name, tmp_path):
+    from itertools import chain
+    from gandlf_synth.utils.managers_utils import load_weights_from_checkpoint
+
+    if config_name == "latent_ddpm":
+        vqvae_dir = str(tmp_path / "vqvae_run")
+        _save_untrained_vqvae_run(vqvae_dir)
+        config_path = _prepare_latent_ddpm_config(vqvae_dir, str(tmp_path))
+    else:
+        config_path = os.path.join(
+            TEST_DIR, f"../configs/module_config_{config_name}.yaml"
+        )
+    _, model_config = ConfigManager(config_path).prepare_configs()
+    model_dir = str(tmp_path / f"{config_name}_run")
+    module = ModuleFactory(model_config=model_config, model_dir=model_dir).get_module()
+    checkpoint_path = _save_module_checkpoint(module, model_dir)
+
+    restored_module = ModuleFactory(
+        model_config=model_config, model_dir=model_dir
+    ).get_module(skip_weights_init=True)
+    assert all(parameter.is_meta for parameter in restored_module.model.parameters())
+    load_weights_from_checkpoint(restored_module, checkpoint_path)
+
+    assert not any(
+        tensor.is_meta
+        for tensor in chain(restored_module.parameters(), restored_module.buffers())
+    )
+    state_dict, restored_state_dict = module.state_dict(), restored_module.state_dict()
+    assert state_dict.keys() == restored_state_dict.keys()
+    for key, value in state_dict.items():
+        assert torch.equal(value, restored_state_dict[key]), key
+    assert torch.equal(
+        _module_test_outputs(module), _module_test_outputs(restored_module)
+    )
+
+
+def test_load_weights_from_checkpoint_prefix_and_not_restored(tmp_path):
+    from gandlf_synth.models.architectures.vqvae import VQVAE
+    from gandlf_synth.utils.managers_utils import load_weights_from_checkpoint
+
+    config_path = os.path.join(TEST_DIR, "../configs/module_config_vqvae.yaml")
+    _, model_config = ConfigManager(config_path).prepare_configs()
+    model_dir = str(tmp_path / "vqvae_run")
+    module = ModuleFactory(model_config=model_config, model_dir=model_dir).get_module()
+    checkpoint_path = _save_module_checkpoint(module, model_dir)
+    # the module stores the architecture under the `model` attribute
+    with torch.device("meta"):
+        vqvae = VQVAE(model_config)
+    load_weights_from_checkpoint(vqvae, checkpoint_path, prefix="model.")
+    model_state_dict = module.model.state_dict()
+    assert vqvae.state_dict().keys() == model_state_dict.keys()
+    for key, value in vqvae.state_dict().items():
+        assert torch.equal(value, model_state_dict[key]), key
+
+    # the non-persistent buffers are not saved in the checkpoints
+    class _ModelWithNonPersistentBuffer(torch.nn.Module):
+        def __init__(self) -> None:
+            super().__init__()
+            self.layer = torch.nn.Linear(2, 2)
+            self.register_buffer("scale", torch.ones(2), persistent=False)
+
+    checkpoint_path = str(tmp_path / "non_persistent_buffer.ckpt")
+    torch.save(
+        {"state_dict": _ModelWithNonPersistentBuffer().state_dict()}, checkpoint_path
+    )
+    with torch.device("meta"):
+        model = _ModelWithNonPersistentBuffer()
+    with pytest.raises(AssertionError, match=r"\['scale'\] are not restored"):
+        load_weights_from_checkpoint(model, checkpoint_path)
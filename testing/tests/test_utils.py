@@ -0,0 +1,309 @@
+import os
+import copy
+import time
+import warnings
+from unittest.mock import MagicMock
+
+import yaml
+import torch
+import pytest
+import lightning.pytorch as pl
+from lightning.pytorch.loggers import Logger
+from torch.utils.data import DataLoader, TensorDataset
+
+from gandlf_synth.utils.instrumentation_utils import (
+    MemoryTrackingCallback,
+    StepTimingCallback,
+    prepare_profiler_callback,
+)
+from gandlf_synth.utils.tuning_utils import (
+    get_default_num_workers_candidates,
+    select_dataloader_config,
+    write_tuned_config,
+)
+
+
+class _TinyModule(pl.LightningModule):
+    def __init__(self) -> None:
+        super().__init__()
+        self.layer = torch.nn.Linear(4, 1)
+
+    def training_step(self, batch, batch_idx):
+        loss = self.layer(batch[0]).pow(2).mean()
+        self.log("train_loss", loss, on_step=True, on_epoch=True)
+        return loss
+
+    def validation_step(self, batch, batch_idx):
+        self.log("val_loss", self.layer(batch[0]).pow(2).mean())
+
+    def configure_optimizers(self):
+        return torch.optim.SGD(self.parameters(), lr=0.1)
+
+
+def _tiny_dataloader(n_batches: int) -> DataLoader:
+    inputs = torch.randn(2 * n_batches, 4, generator=torch.Generator().manual_seed(0))
+    return DataLoader(TensorDataset(inputs), batch_size=2)
+
+
+class _RecordingLogger(Logger):
+    """
+    Records the logged metrics. Takes `val_logging_seconds` to log the values of
+    the validation.
+    """
+
+    def __init__(self, val_logging_seconds: float = 0.0) -> None:
+        super().__init__()
+        self.val_logging_seconds = val_logging_seconds
+        self.logged_metrics = []
+
+    @property
+    def name(self) -> str:
+        return "recording"
+
+    @property
+    def version(self) -> int:
+        return 0
+
+    def log_hyperparams(self, params, *args, **kwargs) -> None:
+        pass
+
+    def log_metrics(self, metrics, step=None) -> None:
+        if "val_loss" in metrics:
+            time.sleep(self.val_logging_seconds)
+        self.logged_metrics.append(metrics)
+
+
+def test_step_timing_callback(tmp_path):
+    callback = StepTimingCallback(percentiles=(50, 90))
+    logger = _RecordingLogger(val_logging_seconds=0.2)
+    trainer = pl.Trainer(
+        default_root_dir=tmp_path,
+        max_epochs=2,
+        accelerator="cpu",
+        logger=logger,
+        callbacks=[callback],
+        log_every_n_steps=1,
+        num_sanity_val_steps=0,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+    )
+    trainer.fit(_TinyModule(), _tiny_dataloader(4), _tiny_dataloader(2))
+
+    # the timings of the last epoch
+    assert len(callback.step_timings) == 4
+    for step_timings in callback.step_timings:
+        assert set(step_timings) == set(StepTimingCallback.STAGES) | {"total"}
+        assert step_timings["total"] == pytest.approx(
+            sum(step_timings[stage] for stage in StepTimingCallback.STAGES)
+        )
+    # the logging of the validation is not attributed to the last training step
+    assert callback.step_timings[-1]["logging"] < 0.2
+    logged_keys = set().union(*logger.logged_metrics)
+    for stage in StepTimingCallback.STAGES + ("total",):
+        for percentile in (50, 90):
+            assert f"step_timing_{stage}_p{percentile}" in logged_keys
+    assert "checkpoint_write_seconds" in logged_keys
+    # the timed methods are restored
+    assert "log_metrics" not in vars(logger)
+    assert "save_checkpoint" not in vars(trainer)
+    assert len(callback._wrapped_methods) == 0
+
+
+def test_profiler_callback(tmp_path):
+    assert prepare_profiler_callback({}, str(tmp_path)) is None
+    callback = prepare_profiler_callback(
+        {"compute": {"profiler": {"wait": 1, "warmup": 1, "active": 3}}}, str(tmp_path)
+    )
+    trainer = pl.Trainer(
+        default_root_dir=tmp_path,
+        max_epochs=1,
+        accelerator="cpu",
+        logger=False,
+        callbacks=[callback],
+        enable_checkpointing=False,
+        num_sanity_val_steps=0,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+    )
+    # the steps of all the phases follow the schedule, the recorded steps are
+    # the last two training steps and the first validation step
+    trainer.fit(_TinyModule(), _tiny_dataloader(4), _tiny_dataloader(2))
+
+    profiles_dir = os.path.join(tmp_path, "profiles")
+    output_files = set(os.listdir(profiles_dir))
+    assert "rank_0_trace_1.json" in output_files
+    assert "rank_0_summary_training_step.txt" in output_files
+    assert "rank_0_summary_validation_step.txt" in output_files
+    training_operators = callback.step_statistics["training_step"]
+    validation_operators = callback.step_statistics["validation_step"]
+    assert set(callback.step_statistics) == {"training_step", "validation_step"}
+    assert "aten::addmm" in training_operators
+    assert "aten::addmm" in validation_operators
+    # the backward pass and the optimizer step only run in the training steps
+    assert any(name.startswith("Optimizer.step") for name in training_operators)
+    assert not any(name.startswith("Optimizer.step") for name in validation_operators)
+    with open(os.path.join(profiles_dir, "rank_0_summary_training_step.txt")) as f:
+        assert "aten::addmm" in f.read()
+
+
+class _FakeAllocator:
+    """
+    Stands in for the CUDA caching allocator statistics, so the memory tracking
+    can be tested on CPU. The peak is the largest allocation since the last reset.
+    """
+
+    def __init__(self) -> None:
+        self.peak_mb = 0.0
+
+    def allocate(self, size_mb: float) -> None:
+        self.peak_mb = max(self.peak_mb, size_mb)
+
+    def reset_peak_memory_stats(self, device=None) -> None:
+        self.peak_mb = 0.0
+
+    def max_memory(self, device=None) -> int:
+        return int(self.peak_mb * 2**20)
+
+
+@pytest.fixture
+def fake_allocator(monkeypatch):
+    allocator = _FakeAllocator()
+    monkeypatch.setattr(
+        torch.cuda, "reset_peak_memory_stats", allocator.reset_peak_memory_stats
+    )
+    monkeypatch.setattr(torch.cuda, "max_memory_allocated", allocator.max_memory)
+    monkeypatch.setattr(torch.cuda, "max_memory_reserved", allocator.max_memory)
+    monkeypatch.setattr(torch.cuda, "memory_reserved", allocator.max_memory)
+    return allocator
+
+
+def _logged_peaks(pl_module: MagicMock) -> dict:
+    return pl_module.log_dict.call_args.args[0]
+
+
+def test_memory_tracking_phase_peaks(fake_allocator):
+    callback = MemoryTrackingCallback()
+    pl_module = MagicMock(device=torch.device("cuda", 0))
+    trainer = MagicMock()
+
+    # the validation runs before the end of the training epoch
+    callback.on_train_epoch_start(trainer, pl_module)
+    fake_allocator.allocate(300.0)
+    callback.on_train_batch_end(trainer, pl_module, None, None, 0)
+    callback.on_validation_epoch_start(trainer, pl_module)
+    fake_allocator.allocate(100.0)
+    callback.on_validation_batch_end(trainer, pl_module, None, None, 0)
+    callback.on_validation_epoch_end(trainer, pl_module)
+    val_peaks = _logged_peaks(pl_module)
+    fake_allocator.allocate(200.0)
+    callback.on_train_epoch_end(trainer, pl_module)
+    train_peaks = _logged_peaks(pl_module)
+
+    assert val_peaks["val_peak_allocated_mb"] == 100.0
+    assert val_peaks["val_peak_reserved_mb"] == 100.0
+    assert train_peaks["train_peak_allocated_mb"] == 300.0
+    assert train_peaks["train_peak_reserved_mb"] == 300.0
+    for phase, peaks in (("train", train_peaks), ("val", val_peaks)):
+        assert peaks[f"{phase}_peak_rss_mb"] > 0
+        assert peaks[f"{phase}_peak_workers_rss_mb"] >= 0
+
+
+def test_memory_tracking_soft_limit_warning(fake_allocator):
+    callback = MemoryTrackingCallback(gpu_soft_limit_mb=50.0)
+    pl_module = MagicMock(device=torch.device("cuda", 0))
+    trainer = MagicMock()
+
+    callback.on_train_epoch_start(trainer, pl_module)
+    fake_allocator.allocate(10.0)
+    callback.on_train_batch_end(trainer, pl_module, None, None, 0)
+    fake_allocator.allocate(100.0)
+    with pytest.warns(UserWarning, match="above the soft limit of 50 MB"):
+        callback.on_train_batch_end(trainer, pl_module, None, None, 1)
+    # warned once per phase and epoch
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        callback.on_train_batch_end(trainer, pl_module, None, None, 2)
+        callback.on_train_epoch_end(trainer, pl_module)
+
+    host_callback = MemoryTrackingCallback(host_soft_limit_mb=1.0)
+    with pytest.warns(UserWarning, match="MB of host memory"):
+        host_callback.on_validation_epoch_start(
+            trainer, MagicMock(device=torch.device("cpu"))
+        )
+
+
+def test_default_num_workers_candidates(monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(6)), False)
+    assert get_default_num_workers_candidates() == [0, 1, 2, 4]
+    monkeypatch.delattr(os, "sched_getaffinity", raising=False)
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    assert get_default_num_workers_candidates() == [0, 1, 2, 4, 8]
+
+
+def test_select_dataloader_config():
+    trials = [
+        {"num_workers": 0, "prefetch_factor": None, "samples_per_second": 50.0},
+        {"num_workers": 1, "prefetch_factor": 2, "samples_per_second": 110.0},
+        {"num_workers": 2, "prefetch_factor": 2, "samples_per_second": 130.0},
+        {"num_workers": 4, "prefetch_factor": 2, "samples_per_second": 200.0},
+    ]
+    # the cheapest configuration with enough headroom over the training steps
+    assert select_dataloader_config(trials, 100.0) == (trials[2], True)
+    # the fastest configuration if none saturates the training steps
+    assert select_dataloader_config(trials, 500.0) == (trials[3], False)
+    assert select_dataloader_config(trials, None) == (trials[3], False)
+
+
+@pytest.mark.parametrize(
+    "train_dataloader_config, prefetch_factor",
+    [
+        ({"shuffle": True, "num_workers": 0}, 4),
+        ({"shuffle": True, "num_workers": 2, "prefetch_factor": 2}, None),
+        ({"shuffle": True, "batch_size": 2, "num_workers": 0}, 2),
+    ],
+)
+def test_write_tuned_config(tmp_path, train_dataloader_config, prefetch_factor):
+    config_path = str(tmp_path / "config.yaml")
+    config = {
+        "batch_size": 2,
+        "num_epochs": 1,
+        "dataloader_config": {
+            "train": {"shuffle": True},
+            "val": {"shuffle": False, "num_workers": 3},
+        },
+    }
+    with open(config_path, "w") as config_file:
+        yaml.safe_dump(config, config_file)
+    tuned_config_path = str(tmp_path / "tuned_config.yaml")
+    original_train_dataloader_config = copy.deepcopy(train_dataloader_config)
+
+    write_tuned_config(
+        config_path,
+        tuned_config_path,
+        train_dataloader_config,
+        batch_size=16,
+        num_workers=4 if prefetch_factor is not None else 0,
+        prefetch_factor=prefetch_factor,
+    )
+    with open(tuned_config_path, "r") as tuned_config_file:
+        tuned_config = yaml.safe_load(tuned_config_file)
+
+    tuned_train_config = tuned_config["dataloader_config"].pop("train")
+    assert tuned_config["batch_size"] == 16
+    assert tuned_config["num_epochs"] == 1
+    assert tuned_config["dataloader_config"] == {
+        "val": config["dataloader_config"]["val"]
+    }
+    assert tuned_train_config["shuffle"] is True
+    if prefetch_factor is None:
+        assert tuned_train_config["num_workers"] == 0
+        assert "prefetch_factor" not in tuned_train_config
+    else:
+        assert tuned_train_config["num_workers"] == 4
+        assert tuned_train_config["prefetch_factor"] == prefetch_factor
+    if "batch_size" in train_dataloader_config:
+        assert tuned_train_config["batch_size"] == 16
+    else:
+        assert "batch_size" not in tuned_train_config
+    # the configuration in use is left untouched
+    assert train_dataloader_config == original_train_dataloader_config